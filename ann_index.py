@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+In-process approximate nearest neighbour index (IVF-Flat) over a vector store.
+
+Vectors are clustered with spherical k-means into `n_lists` inverted lists.
+A query scores the centroids, scans only the `nprobe` closest lists, and
+returns the top-k rows. `nprobe` trades recall for latency per query:
+nprobe == n_lists is an exact search.
+
+The index is saved next to the store it was built from (ivf/ inside the
+store directory) as plain .npy files, so it is memory-mapped at startup.
+Rows appended to the store after the build are searched exactly. The list
+vectors can be kept in float16 or int8 (quantization.py); a search can then
+rescore its best candidates against the store's float32 vectors.
+
+Usage:
+  python ann_index.py build --store static/vectorstore [--lists N] [--precision float32|float16|int8]
+  python ann_index.py build --store static/vectorstore --from-supabase
+  python ann_index.py eval --store static/vectorstore --nprobe 1,4,16
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from quantization import PRECISIONS, QuantizedMatrix, matrix_precision, quantize_rows, rescore as rescore_candidates
+from vector_search import normalize_rows, top_k_indices, VectorSearchEngine
+from vector_store import VectorStore, write_store
+
+INDEX_DIR = 'ivf'
+DEFAULT_NPROBE = 8
+
+def default_n_lists(count):
+    """About sqrt(N) lists, the usual IVF sizing for up to a few million rows."""
+    return max(1, min(count, int(round(np.sqrt(count)))))
+
+def spherical_kmeans(vectors, n_clusters, n_iter=20, sample_size=None, seed=0):
+    """
+    Clusters L2-normalized vectors by cosine similarity.
+
+    Args:
+        vectors (np.ndarray): Normalized float32 matrix
+        n_clusters (int): Number of centroids
+        n_iter (int): Lloyd iterations
+        sample_size (int): Train on a random sample of this many rows
+
+    Returns:
+        np.ndarray: Normalized float32 centroids of shape (n_clusters, dim)
+    """
+    rng = np.random.default_rng(seed)
+    if sample_size and vectors.shape[0] > sample_size:
+        vectors = vectors[np.sort(rng.choice(vectors.shape[0], sample_size, replace=False))]
+    centroids = vectors[rng.choice(vectors.shape[0], n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # Re-seed empty clusters with random points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(vectors.shape[0], int(empty.sum()))]
+        centroids = normalize_rows(sums.astype(np.float32))
+    return centroids
+
+def assign_lists(vectors, centroids, block=65536):
+    """Index of the most similar centroid for each vector."""
+    assignments = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], block):
+        assignments[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+    return assignments
+
+def save_arrays(path, arrays, meta):
+    """Writes named arrays as .npy files plus meta.json, atomically replacing `path`."""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    if os.path.exists(path):
+        old_path = f"{path}.old-{os.getpid()}"
+        os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        for name in os.listdir(old_path):
+            os.remove(os.path.join(old_path, name))
+        os.rmdir(old_path)
+    else:
+        os.rename(tmp_path, path)
+
+def load_arrays(path, names):
+    """Memory-maps arrays written by `save_arrays`; returns (arrays, meta)."""
+    arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in names]
+    with open(os.path.join(path, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    return arrays, meta
+
+ARRAY_NAMES = ('centroids', 'list_offsets', 'list_ids', 'list_vectors')
+
+class IVFIndex:
+    """Inverted-file index with each list's vectors stored contiguously."""
+
+    def __init__(self, centroids, list_offsets, list_ids, list_vectors, meta=None):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.list_vectors = list_vectors
+        self.meta = meta or {}
+
+    @property
+    def n_lists(self):
+        return self.centroids.shape[0]
+
+    def __len__(self):
+        return self.list_ids.shape[0]
+
+    @property
+    def precision(self):
+        return matrix_precision(self.list_vectors)
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, n_iter=20, seed=0, precision='float32'):
+        """
+        Builds an index over raw (unnormalized) vectors.
+
+        Args:
+            vectors: array-like of shape (n, dim)
+            n_lists (int): Number of inverted lists (default about sqrt(n))
+            precision (str): Storage of the list vectors: 'float32',
+                'float16' or 'int8'
+        """
+        matrix = normalize_rows(np.array(vectors, dtype=np.float32, copy=True))
+        count = matrix.shape[0]
+        n_lists = min(n_lists or default_n_lists(count), count)
+        centroids = spherical_kmeans(matrix, n_lists, n_iter=n_iter, sample_size=256 * n_lists, seed=seed)
+        assignments = assign_lists(matrix, centroids)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=n_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        list_vectors = matrix[order]
+        if precision != 'float32':
+            list_vectors = quantize_rows(list_vectors, precision, normalize=False)
+        return cls(centroids, list_offsets, order.astype(np.int64), list_vectors)
+
+    def search(self, query_vector, top_k=10, nprobe=DEFAULT_NPROBE, source=None, rescore=0):
+        """
+        Approximate top-k search.
+
+        Args:
+            query_vector: The query embedding
+            top_k (int): Number of results
+            nprobe (int): Number of inverted lists to scan
+            source: Full-precision vectors by row id (e.g. the store's);
+                with `rescore`, the best `top_k * rescore` candidates of a
+                reduced-precision index are rescored against them
+
+        Returns:
+            list[tuple[int, float]]: (row id, similarity) pairs, best first
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or len(self) == 0:
+            return []
+        query = query / norm
+        probes = top_k_indices(self.centroids @ query, min(max(1, nprobe), self.n_lists))
+        candidate_ids = []
+        candidate_scores = []
+        for list_id in probes:
+            start, end = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+            if start == end:
+                continue
+            candidate_ids.append(self.list_ids[start:end])
+            candidate_scores.append(self.list_vectors[start:end] @ query)
+        if not candidate_ids:
+            return []
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        if rescore and source is not None and self.precision != 'float32':
+            return rescore_candidates(ids[top_k_indices(scores, top_k * rescore)], query, source, top_k)
+        best = top_k_indices(scores, top_k)
+        return [(int(ids[i]), float(scores[i])) for i in best]
+
+    def save(self, path, meta=None):
+        """Writes the index as .npy files (atomically replacing `path`)."""
+        self.meta = dict(meta or {}, n_lists=self.n_lists, count=len(self), precision=self.precision)
+        arrays = {name: getattr(self, name) for name in ARRAY_NAMES}
+        if self.precision != 'float32':
+            arrays['list_vectors'] = self.list_vectors.codes
+            if self.list_vectors.scales is not None:
+                arrays['list_scales'] = self.list_vectors.scales
+        save_arrays(path, arrays, self.meta)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a saved index."""
+        arrays, meta = load_arrays(path, ARRAY_NAMES)
+        precision = meta.get('precision', 'float32')
+        if precision != 'float32':
+            scales = load_arrays(path, ['list_scales'])[0][0] if precision == 'int8' else None
+            arrays[3] = QuantizedMatrix(arrays[3], scales)
+        return cls(*arrays, meta=meta)
+
+class StoreANNSearcher:
+    """
+    Serves ANN search over a vector store: the IVF index covers the base
+    segment it was built from, and any rows added since are scanned exactly.
+    """
+
+    def __init__(self, store, index, rescore=0):
+        """
+        Args:
+            store (VectorStore): The store the index was built from
+            index (IVFIndex): Its index
+            rescore (int): Default rescoring factor for a reduced-precision
+                index (0: approximate scores)
+        """
+        self.store = store
+        self.index = index
+        self.indexed_count = len(index)
+        self.rescore = rescore
+        self._tail_engine = None
+
+    @classmethod
+    def load(cls, store_path):
+        """
+        Opens a store and its index, or returns None if the index is missing.
+
+        Compaction keeps base row ids stable, so an index stays valid for the
+        rows it covers; re-importing the store replaces the directory and
+        drops the index with it.
+        """
+        if not os.path.isdir(os.path.join(store_path, INDEX_DIR)):
+            return None
+        return cls.for_store(VectorStore.open(store_path))
+
+    @classmethod
+    def for_store(cls, store, rescore=0):
+        """Like `load`, for a store that is already open."""
+        index_path = os.path.join(store.path, INDEX_DIR)
+        if not os.path.isdir(index_path):
+            return None
+        index = IVFIndex.load(index_path)
+        if len(index) > len(store):
+            print(f"ANN index in {index_path} covers {len(index)} rows but the store has "
+                  f"{len(store)}; rebuild it with ann_index.py build")
+            return None
+        return cls(store, index, rescore)
+
+    def tail_engine(self):
+        """Exact engine over rows appended after the index was built."""
+        if self._tail_engine is None or len(self._tail_engine) != len(self.store) - self.indexed_count:
+            self._tail_engine = VectorSearchEngine(
+                self.store.vectors_for(range(self.indexed_count, len(self.store))))
+        return self._tail_engine
+
+    def search(self, query_vector, top_k=10, nprobe=DEFAULT_NPROBE, threshold=None, rescore=None):
+        """Returns (row id, similarity) pairs, best first."""
+        rescore = self.rescore if rescore is None else rescore
+        # Indexed rows all lie in the base segment, so rescoring reads the mapped matrix
+        results = self.index.search(query_vector, top_k, nprobe, self.store.base_vectors, rescore)
+        if len(self.store) > self.indexed_count:
+            results += [(self.indexed_count + i, s) for i, s in self.tail_engine().search(query_vector, top_k)]
+            results.sort(key=lambda x: x[1], reverse=True)
+            results = results[:top_k]
+        if threshold is not None:
+            results = [(i, s) for i, s in results if s > threshold]
+        return results
+
+    def search_records(self, query_vector, top_k=10, nprobe=DEFAULT_NPROBE, threshold=None, rescore=None):
+        """Like `search`, but returns dicts with id, text, author_ids and similarity."""
+        results = []
+        for index, similarity in self.search(query_vector, top_k, nprobe, threshold, rescore):
+            item = self.store[index]
+            results.append({
+                'id': index,
+                'text': item['text'],
+                'similarity': similarity,
+                'author_ids': item['author_ids']
+            })
+        return results
+
+def build_store_index(store_path, n_lists=None, precision='float32'):
+    """Builds and saves the IVF index for a store's base segment."""
+    store = VectorStore.open(store_path)
+    if store.base_count < len(store):
+        print("Compacting pending log entries into the base segment first...")
+        store.compact()
+    print(f"Building {precision} IVF index over {store.base_count} vectors...")
+    started = time.perf_counter()
+    index = IVFIndex.build(store.base_vectors, n_lists, precision=precision)
+    index.save(os.path.join(store_path, INDEX_DIR), meta={'base': store.base_name})
+    print(f"Built {index.n_lists} lists ({index.list_vectors.nbytes / 2 ** 20:.1f} MB of list vectors) "
+          f"in {time.perf_counter() - started:.1f}s")
+    return index
+
+def fetch_supabase_rows(page_size=500):
+    """Yields every embeddings row from Supabase as a store record."""
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    if os.path.exists('config.env'):
+        load_dotenv('config.env')
+    client = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY'))
+    start = 0
+    while True:
+        response = client.table('embeddings').select('id, text, author_ids, embedding').order('id').range(start, start + page_size - 1).execute()
+        for row in response.data:
+            # PostgREST returns pgvector values as '[x,y,...]' strings
+            vector = row['embedding']
+            if isinstance(vector, str):
+                vector = json.loads(vector)
+            yield {'text': row['text'], 'vector': vector, 'author_ids': row['author_ids']}
+        if len(response.data) < page_size:
+            return
+        start += page_size
+
+def evaluate(store_path, nprobes, top_k=10, n_queries=200, seed=0):
+    """Prints recall@k and latency of the saved index against exact search."""
+    searcher = StoreANNSearcher.load(store_path)
+    if searcher is None:
+        print("No usable index; build one first.")
+        return
+    indexed = searcher.store.base_vectors[:searcher.indexed_count]
+    exact = VectorSearchEngine(indexed)
+    rng = np.random.default_rng(seed)
+    queries = indexed[rng.choice(len(exact), min(n_queries, len(exact)), replace=False)]
+    truth = [set(i for i, _ in exact.search(q, top_k)) for q in queries]
+    print(f"{len(queries)} queries, recall@{top_k}, {searcher.index.n_lists} lists")
+    for nprobe in nprobes:
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            found = searcher.index.search(query, top_k, nprobe)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(expected & set(i for i, _ in found))
+        print(f"  nprobe={nprobe:<4} recall={hits / (len(queries) * top_k):.3f} "
+              f"p50={np.percentile(latencies, 50):.2f}ms p99={np.percentile(latencies, 99):.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and evaluate the in-process ANN index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build the IVF index for a store')
+    build_parser.add_argument('--store', required=True, help='Vector store directory')
+    build_parser.add_argument('--lists', type=int, default=None, help='Number of inverted lists')
+    build_parser.add_argument('--precision', choices=PRECISIONS, default='float32',
+                              help='Storage of the list vectors (see quantization.py report)')
+    build_parser.add_argument('--from-supabase', action='store_true',
+                              help='(Re)create the store from the Supabase embeddings table first')
+
+    eval_parser = subparsers.add_parser('eval', help='Measure recall and latency against exact search')
+    eval_parser.add_argument('--store', required=True)
+    eval_parser.add_argument('--nprobe', default='1,2,4,8,16,32')
+    eval_parser.add_argument('--k', type=int, default=10)
+    eval_parser.add_argument('--queries', type=int, default=200)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        if args.from_supabase:
+            count = write_store(args.store, fetch_supabase_rows())
+            print(f"Downloaded {count} rows from Supabase into {args.store}")
+        build_store_index(args.store, args.lists, args.precision)
+    elif args.command == 'eval':
+        evaluate(args.store, [int(n) for n in args.nprobe.split(',')], args.k, args.queries)
+
+if __name__ == "__main__":
+    main()
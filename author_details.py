@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+# --- Author detail store ---
+#
+# The graph payload only carries what the 3D view draws; names, levels, paper
+# counts and top papers for the cards are served on demand by /authors from
+# this SQLite file, which convert_author_abstracts_4_to_graph.py builds next
+# to the graph. Each row keeps a digest of its JSON so responses get a stable
+# ETag without reading anything else.
+
+DEFAULT_DETAILS_PATH = 'author_details.sqlite3'
+DEFAULT_TOP_PAPERS = 3
+
+def detail_digest(payload):
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def write_author_details(path, authors):
+    """
+    Builds the store from scratch.
+
+    Args:
+        path (str): SQLite file to (re)create
+        authors (iterable[dict]): author_id, name, level, paper_count and papers
+
+    Returns:
+        int: Number of authors written
+    """
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("""
+        CREATE TABLE authors (
+            author_id TEXT PRIMARY KEY,
+            detail TEXT NOT NULL,
+            digest TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    rows = []
+    for author in authors:
+        payload = json.dumps({
+            'author_id': author['author_id'],
+            'name': author.get('name', ''),
+            'level': author.get('level', 'unknown'),
+            'paper_count': author.get('paper_count', 0),
+            'papers': author.get('papers', [])
+        }, separators=(',', ':'), ensure_ascii=False)
+        rows.append((author['author_id'], payload, detail_digest(payload)))
+    conn.executemany('INSERT OR REPLACE INTO authors VALUES (?, ?, ?)', rows)
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+    # Readers keep serving the old file until the rename
+    os.replace(tmp_path, path)
+    return len(rows)
+
+class AuthorDetailsStore:
+    """Read-only lookups of author details by id, several at a time."""
+
+    def __init__(self, path=DEFAULT_DETAILS_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        # Deployed read-only (e.g. on Vercel), so never try to write or journal
+        self.conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro&immutable=1", uri=True,
+                                    check_same_thread=False)
+
+    def get_many(self, author_ids):
+        """
+        Returns:
+            dict: author_id -> (detail JSON string, digest) for the ids found
+        """
+        found = {}
+        author_ids = list(dict.fromkeys(author_ids))
+        with self.lock:
+            for start in range(0, len(author_ids), 500):
+                chunk = author_ids[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT author_id, detail, digest FROM authors "
+                    f"WHERE author_id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update((author_id, (detail, digest)) for author_id, detail, digest in rows)
+        return found
+
+    def get(self, author_id):
+        """Returns (detail JSON string, digest), or None for an unknown author."""
+        return self.get_many([author_id]).get(author_id)
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM authors').fetchone()[0]
+
+def open_default_store():
+    """
+    Opens the store at AUTHOR_DETAILS_PATH.
+
+    Returns:
+        AuthorDetailsStore: The store, or None if it has not been built
+    """
+    path = os.getenv('AUTHOR_DETAILS_PATH', DEFAULT_DETAILS_PATH)
+    if not path or not os.path.exists(path):
+        print(f"Author details unavailable: {path or 'AUTHOR_DETAILS_PATH'} not found")
+        return None
+    return AuthorDetailsStore(path)
+
+def batch_payload(found, author_ids):
+    """
+    JSON body and ETag for a batch lookup, built from the stored JSON without
+    re-encoding it.
+
+    Returns:
+        tuple: (body str, etag str)
+    """
+    author_ids = list(dict.fromkeys(author_ids))
+    present = [author_id for author_id in author_ids if author_id in found]
+    missing = [author_id for author_id in author_ids if author_id not in found]
+    body = ('{"authors":[' + ','.join(found[author_id][0] for author_id in present) +
+            '],"missing":' + json.dumps(missing) + '}')
+    etag = detail_digest(','.join(found[author_id][1] for author_id in present) + '|' + ','.join(missing))
+    return body, etag
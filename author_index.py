@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Author profile index for two-stage author search.
+
+The UI ranks professors but the chunk index ranks paper chunks, so grouping
+the top 200 chunks by author both over-fetches and silently drops authors
+whose best chunk falls just outside the cut. This index keeps a profile per
+author (the normalized mean of their chunk vectors, or a few spherical
+k-means centroids) and searches authors directly:
+
+  1. score every author profile and keep the best candidates
+  2. optionally rerank the candidates by their best matching chunk, which
+     also picks the snippet shown on the result card
+
+Profiles are saved next to the store they were built from (authors/ inside
+the store directory). `update` recomputes only the authors of rows appended
+since the last build; run `build` after author ids are added to old rows.
+
+Usage:
+  python author_index.py build --store static/vectorstore [--centroids 3]
+  python author_index.py update --store static/vectorstore
+  python author_index.py eval --store static/vectorstore --k 20
+  python author_index.py refresh-supabase [--full]
+
+For the pgvector backend the profiles live in the author_profiles table and
+are refreshed inside Postgres (refresh_author_profiles in supabase_schema.sql).
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from vector_search import normalize_rows, top_k_indices, VectorSearchEngine
+from vector_store import VectorStore
+from ann_index import spherical_kmeans, save_arrays, load_arrays
+
+AUTHOR_INDEX_DIR = 'authors'
+DEFAULT_CENTROIDS = 1
+DEFAULT_AUTHOR_COUNT = 100
+DEFAULT_CANDIDATE_FACTOR = 3  # Stage-one candidates per requested author when reranking
+
+def author_profile(vectors, n_centroids=DEFAULT_CENTROIDS, seed=0):
+    """
+    Profile vectors for one author.
+
+    Args:
+        vectors (np.ndarray): The author's L2-normalized chunk vectors
+        n_centroids (int): 1 for the mean vector, more for k-means centroids
+
+    Returns:
+        np.ndarray: Normalized float32 profiles of shape (<= n_centroids, dim)
+    """
+    if n_centroids <= 1 or vectors.shape[0] <= 1:
+        return normalize_rows(vectors.mean(axis=0, keepdims=True))
+    return spherical_kmeans(vectors, min(n_centroids, vectors.shape[0]), n_iter=10, seed=seed)
+
+class AuthorIndex:
+    """Author profiles stored contiguously; author i owns profiles[offsets[i]:offsets[i + 1]]."""
+
+    def __init__(self, author_ids, offsets, profiles, meta=None):
+        self.author_ids = author_ids
+        self.offsets = offsets
+        self.profiles = profiles
+        self.meta = meta or {}
+        self.positions = {author_id: i for i, author_id in enumerate(author_ids)}
+
+    def __len__(self):
+        return len(self.author_ids)
+
+    @property
+    def indexed_count(self):
+        """Number of store rows the profiles were computed from."""
+        return self.meta.get('indexed_count', 0)
+
+    def profiles_for(self, author_id):
+        i = self.positions[author_id]
+        return np.asarray(self.profiles[self.offsets[i]:self.offsets[i + 1]])
+
+    @classmethod
+    def build(cls, store, n_centroids=DEFAULT_CENTROIDS, previous=None):
+        """
+        Builds profiles for every author in a store.
+
+        Args:
+            store (VectorStore): The store
+            n_centroids (int): Profiles per author
+            previous (AuthorIndex): Index built from an earlier state of the
+                same store; only authors of rows appended since are recomputed
+
+        Returns:
+            AuthorIndex: The new index
+        """
+        author_rows = store.author_rows()
+        touched = None
+        if (previous is not None and previous.meta.get('centroids') == n_centroids
+                and previous.indexed_count <= len(store)):
+            touched = {author_id for author_id, rows in author_rows.items()
+                       if rows[-1] >= previous.indexed_count}
+
+        author_ids = sorted(author_rows)
+        blocks = []
+        offsets = [0]
+        recomputed = 0
+        for author_id in author_ids:
+            if touched is not None and author_id not in touched and author_id in previous.positions:
+                block = previous.profiles_for(author_id)
+            else:
+                rows = author_rows[author_id]
+                block = author_profile(normalize_rows(np.array(store.vectors_for(rows), dtype=np.float32)), n_centroids)
+                recomputed += 1
+            blocks.append(block)
+            offsets.append(offsets[-1] + block.shape[0])
+
+        profiles = np.concatenate(blocks) if blocks else np.zeros((0, store.dim), dtype=np.float32)
+        meta = {
+            'indexed_count': len(store),
+            'centroids': n_centroids,
+            'authors': len(author_ids),
+            'profiles': int(profiles.shape[0]),
+            'recomputed': recomputed
+        }
+        return cls(author_ids, np.array(offsets, dtype=np.int64), profiles.astype(np.float32), meta)
+
+    def search(self, query_vector, top_k=DEFAULT_AUTHOR_COUNT):
+        """Returns (author_id, profile similarity) pairs, best first."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or len(self) == 0:
+            return []
+        scores = self.profiles @ (query / norm)
+        # Best centroid per author
+        author_scores = np.maximum.reduceat(scores, self.offsets[:-1])
+        return [(self.author_ids[i], float(author_scores[i])) for i in top_k_indices(author_scores, top_k)]
+
+    def save(self, path):
+        """Writes the index as .npy files plus the author id list."""
+        save_arrays(path, {'offsets': self.offsets, 'profiles': self.profiles},
+                    dict(self.meta, author_ids=self.author_ids))
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a saved index."""
+        (offsets, profiles), meta = load_arrays(path, ('offsets', 'profiles'))
+        return cls(meta.pop('author_ids'), offsets, profiles, meta)
+
+    @classmethod
+    def for_store(cls, store):
+        """Loads the index saved in a store directory, or None if missing or stale."""
+        index_path = os.path.join(store.path, AUTHOR_INDEX_DIR)
+        if not os.path.isdir(index_path):
+            return None
+        index = cls.load(index_path)
+        if index.indexed_count > len(store):
+            print(f"Author index in {index_path} covers {index.indexed_count} rows but the store has "
+                  f"{len(store)}; rebuild it with author_index.py build")
+            return None
+        return index
+
+class AuthorSearcher:
+    """
+    Two-stage author search over a store and its author index.
+
+    Rows appended after the index was built are scanned exactly, and their
+    authors join the stage-one candidates with their best chunk score.
+    """
+
+    def __init__(self, store, index, author_rows=None):
+        """
+        Args:
+            store (VectorStore): The store the index was built from
+            index (AuthorIndex): Its author index
+            author_rows (callable): Returns the current author_id -> rows map
+                (default: built once from the store)
+        """
+        self.store = store
+        self.index = index
+        self._author_rows = author_rows
+        self._tail_engine = None
+
+    def author_rows(self):
+        if self._author_rows is None:
+            rows = self.store.author_rows()
+            self._author_rows = lambda: rows
+        return self._author_rows()
+
+    def tail_engine(self):
+        """Exact engine over rows appended after the index was built."""
+        tail_count = len(self.store) - self.index.indexed_count
+        if self._tail_engine is None or len(self._tail_engine) != tail_count:
+            self._tail_engine = VectorSearchEngine(
+                self.store.vectors_for(range(self.index.indexed_count, len(self.store))))
+        return self._tail_engine
+
+    def candidates(self, query_vector, count):
+        """Stage one: author_id -> best profile (or new-row) similarity."""
+        candidates = dict(self.index.search(query_vector, count))
+        if len(self.store) > self.index.indexed_count:
+            for row, similarity in self.tail_engine().search(query_vector, count):
+                for author_id in self.store[self.index.indexed_count + row]['author_ids']:
+                    if similarity > candidates.get(author_id, -np.inf):
+                        candidates[author_id] = similarity
+        return candidates
+
+    def search(self, query_vector, author_count=DEFAULT_AUTHOR_COUNT, threshold=None, rerank=True,
+               candidate_factor=DEFAULT_CANDIDATE_FACTOR):
+        """
+        Finds the authors most similar to a query.
+
+        Args:
+            query_vector: The query embedding
+            author_count (int): Number of authors to return
+            threshold (float): Optional minimum similarity
+            rerank (bool): Rank candidates by their best chunk rather than
+                their profile, drawing `candidate_factor` times more candidates
+            candidate_factor (int): Over-fetch factor for reranking
+
+        Returns:
+            list[dict]: {'author_id', 'similarity', 'text'} best first; text
+                is the author's best matching chunk (not truncated)
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+        candidates = self.candidates(query, author_count * candidate_factor if rerank else author_count)
+        author_rows = self.author_rows()
+        results = []
+        for author_id, profile_similarity in candidates.items():
+            rows = author_rows.get(author_id)
+            if not rows:
+                continue
+            chunk_vectors = np.asarray(self.store.vectors_for(rows), dtype=np.float32)
+            norms = np.linalg.norm(chunk_vectors, axis=1)
+            norms[norms == 0] = 1.0
+            chunk_similarities = (chunk_vectors @ query) / norms
+            best = int(np.argmax(chunk_similarities))
+            results.append({
+                'author_id': author_id,
+                'similarity': float(chunk_similarities[best]) if rerank else profile_similarity,
+                'text': self.store.text(rows[best])
+            })
+        results.sort(key=lambda x: x['similarity'], reverse=True)
+        if threshold is not None:
+            results = [item for item in results if item['similarity'] > threshold]
+        return results[:author_count]
+
+def build_author_index(store_path, n_centroids=DEFAULT_CENTROIDS, incremental=False):
+    """Builds (or incrementally updates) and saves the author index for a store."""
+    store = VectorStore.open(store_path)
+    previous = AuthorIndex.for_store(store) if incremental else None
+    if incremental and previous is None:
+        print("No usable author index; building from scratch.")
+    n_centroids = previous.meta.get('centroids', n_centroids) if previous is not None else n_centroids
+    started = time.perf_counter()
+    index = AuthorIndex.build(store, n_centroids, previous)
+    index.save(os.path.join(store_path, AUTHOR_INDEX_DIR))
+    print(f"Author index: {len(index)} authors, {index.meta['profiles']} profiles over "
+          f"{index.indexed_count} rows ({index.meta['recomputed']} recomputed) "
+          f"in {time.perf_counter() - started:.1f}s")
+    return index
+
+def exhaustive_author_ranking(engine, store, query_vector):
+    """Ground truth: every author ranked by their best chunk over the full store."""
+    scores = engine.scores(query_vector)
+    best = {}
+    for author_id, rows in store.author_rows().items():
+        best[author_id] = float(scores[rows].max())
+    return sorted(best, key=best.get, reverse=True)
+
+def evaluate(store_path, top_k=20, n_queries=100, chunk_count=200, seed=0):
+    """
+    Compares two-stage author search and top-`chunk_count` chunk grouping
+    against an exhaustive per-author ranking (recall@k and latency).
+    """
+    store = VectorStore.open(store_path)
+    index = AuthorIndex.for_store(store)
+    if index is None:
+        print("No usable author index; build one first.")
+        return
+    searcher = AuthorSearcher(store, index)
+    engine = VectorSearchEngine.from_db(store)
+    rng = np.random.default_rng(seed)
+    queries = store.vectors_for(rng.choice(len(store), min(n_queries, len(store)), replace=False))
+    truth = [set(exhaustive_author_ranking(engine, store, q)[:top_k]) for q in queries]
+
+    def chunk_grouping(query):
+        ranked = []
+        for row, _ in engine.search(query, chunk_count):
+            for author_id in store[row]['author_ids']:
+                if author_id not in ranked:
+                    ranked.append(author_id)
+        return ranked[:top_k]
+
+    methods = [
+        (f"top-{chunk_count} chunks", chunk_grouping),
+        ('profiles only', lambda q: [r['author_id'] for r in searcher.search(q, top_k, rerank=False)]),
+        ('profiles + rerank', lambda q: [r['author_id'] for r in searcher.search(q, top_k, rerank=True)])
+    ]
+    print(f"{len(queries)} queries, author recall@{top_k}, {len(index)} authors, "
+          f"{index.meta.get('centroids')} profile(s) per author")
+    for name, method in methods:
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            found = method(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(expected & set(found))
+        print(f"  {name:<18} recall={hits / max(1, sum(len(t) for t in truth)):.3f} "
+              f"p50={np.percentile(latencies, 50):.2f}ms p99={np.percentile(latencies, 99):.2f}ms")
+
+def refresh_supabase_profiles(full=False):
+    """Runs refresh_author_profiles() in Supabase; returns the profiles written."""
+    from dotenv import load_dotenv
+    from vector_backends import create_supabase_client
+
+    if os.path.exists('config.env'):
+        load_dotenv('config.env')
+    started = time.perf_counter()
+    refreshed = create_supabase_client().rpc('refresh_author_profiles', {'full_refresh': full}).execute().data
+    print(f"Refreshed {refreshed} author profiles in {time.perf_counter() - started:.1f}s")
+    return refreshed
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and evaluate the author profile index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build author profiles from scratch')
+    build_parser.add_argument('--store', required=True, help='Vector store directory')
+    build_parser.add_argument('--centroids', type=int, default=DEFAULT_CENTROIDS,
+                              help='Profiles per author (1 = mean vector)')
+
+    update_parser = subparsers.add_parser('update', help='Recompute authors of rows added since the last build')
+    update_parser.add_argument('--store', required=True)
+
+    eval_parser = subparsers.add_parser('eval', help='Measure author recall against exhaustive ranking')
+    eval_parser.add_argument('--store', required=True)
+    eval_parser.add_argument('--k', type=int, default=20)
+    eval_parser.add_argument('--queries', type=int, default=100)
+    eval_parser.add_argument('--chunks', type=int, default=200, help='Chunk count of the baseline')
+
+    refresh_parser = subparsers.add_parser('refresh-supabase', help='Refresh the author_profiles table')
+    refresh_parser.add_argument('--full', action='store_true', help='Recompute every author')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build_author_index(args.store, args.centroids)
+    elif args.command == 'update':
+        build_author_index(args.store, incremental=True)
+    elif args.command == 'eval':
+        evaluate(args.store, args.k, args.queries, args.chunks)
+    elif args.command == 'refresh-supabase':
+        refresh_supabase_profiles(args.full)
+
+if __name__ == "__main__":
+    main()
@@ -2,32 +2,115 @@
 """
 Convert author_abstracts_4.json to force graph format
 Creates nodes and links for 3D force-directed graph visualization
+
+The graph is written in a compact format the page can load quickly: node
+fields are parallel arrays indexed by position and links are a flat list of
+index pairs. It carries only what the view draws; paper counts and papers go
+to the author detail store (author_details.py) that /authors serves on
+demand. The graph also gets .gz (and, with the optional brotli package, .br)
+variants that the API serves to clients that accept them.
 """
 
+import gzip
 import json
 import os
+import sys
+
+from author_details import DEFAULT_DETAILS_PATH, DEFAULT_TOP_PAPERS, write_author_details
+from json_stream import iter_sections
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-def convert_author_abstracts_4_to_graph(input_file, output_file):
+COMPACT_FORMAT = 'compact-v1'
+LEVEL_NAMES = ["unknown", "input", "direct", "second"]
+
+def write_precompressed(path, payload):
+    """
+    Write payload (bytes) to path plus .gz/.br variants for static serving
+
+    Returns:
+        dict: Size in bytes of each file written, keyed by path
+    """
+    variants = {path: payload, path + '.gz': gzip.compress(payload, 9, mtime=0)}
+    if brotli is not None:
+        variants[path + '.br'] = brotli.compress(payload, quality=11)
+    for variant_path, data in variants.items():
+        with open(variant_path, 'wb') as f:
+            f.write(data)
+    return {variant_path: len(data) for variant_path, data in variants.items()}
+
+def compact_graph(force_graph_data):
+    """Encode the rendering fields of force graph data in the compact format"""
+    nodes = force_graph_data["nodes"]
+    index = {node["id"]: i for i, node in enumerate(nodes)}
+    level_codes = {name: code for code, name in enumerate(LEVEL_NAMES)}
+    links = []
+    for link in force_graph_data["links"]:
+        links.append(index[link["source"]])
+        links.append(index[link["target"]])
+    compact = {
+        "format": COMPACT_FORMAT,
+        "ids": [node["id"] for node in nodes],
+        "names": [node["name"] for node in nodes],
+        "level_names": LEVEL_NAMES,
+        "levels": [level_codes[node["level"]] for node in nodes],
+        "links": links,
+        "metadata": force_graph_data["metadata"]
+    }
+    return compact
+
+def write_compact_graph(force_graph_data, output_file):
+    """Write the compact graph with its compressed variants"""
+    payload = json.dumps(compact_graph(force_graph_data), separators=(',', ':'), ensure_ascii=False)
+    return write_precompressed(output_file, payload.encode('utf-8'))
+
+def top_papers(papers, count=DEFAULT_TOP_PAPERS):
+    """The most recent papers, formatted for display"""
+    sorted_papers = sorted(papers, key=lambda x: x.get('year', 0), reverse=True)[:count]
+    return [{
+        "title": paper.get('title', ''),
+        "abstract": paper.get('abstract', ''),
+        "year": paper.get('year', 0),
+        "authors": paper.get('authors', '')
+    } for paper in sorted_papers]
+
+def convert_author_abstracts_4_to_graph(input_file, output_file, details_file=DEFAULT_DETAILS_PATH,
+                                        legacy_file=None):
     """
     Convert author_abstracts_4.json to force graph format
     
     Args:
         input_file (str): Path to author_abstracts_4.json
-        output_file (str): Path to output force graph JSON
+        output_file (str): Path to output compact force graph JSON
+        details_file (str): Path to the author detail store served by /authors
+        legacy_file (str): Optional path for the previous single-file format,
+            with papers embedded in every node
     """
     
     print(f"📖 Loading data from {input_file}...")
     
-    # Load the author abstracts data
-    with open(input_file, 'r') as f:
-        data = json.load(f)
-    
-    # Extract components
-    author_names = data.get('author_names', {})
-    co_authors = data.get('co_authors', {})
-    author_abstracts = data.get('author_abstracts', {})
-    author_levels = data.get('author_levels', {})
-    summary = data.get('summary', {})
+    # Stream the input; only the top papers and paper count of each author
+    # are kept, so memory does not grow with the number of abstracts
+    author_names = {}
+    co_authors = {}
+    author_papers = {}  # author_id -> (paper count, top papers)
+    author_levels = {}
+    summary = {}
+    for key, value in iter_sections(input_file):
+        if key == 'author_names':
+            author_names = dict(value)
+        elif key == 'co_authors':
+            co_authors = dict(value)
+        elif key == 'author_abstracts':
+            for author_id, papers in value:
+                author_papers[author_id] = (len(papers), top_papers(papers))
+        elif key == 'author_levels':
+            author_levels = value
+        elif key == 'summary':
+            summary = value
     
     print(f"📊 Data summary:")
     print(f"  - Total authors: {summary.get('total_authors', 0)}")
@@ -41,31 +124,21 @@ def convert_author_abstracts_4_to_graph(input_file, output_file):
     print("\n🔨 Building nodes...")
     nodes = []
     id_to_node = {}
+    input_authors = set(author_levels.get('input_authors', []))
+    direct_co_authors = set(author_levels.get('direct_co_authors', []))
+    second_level_co_authors = set(author_levels.get('second_level_co_authors', []))
     
     for author_id, author_name in author_names.items():
-        # Get research papers for this author
-        papers = author_abstracts.get(author_id, [])
-        
-        # Get top 3 most recent papers
-        sorted_papers = sorted(papers, key=lambda x: x.get('year', 0), reverse=True)[:3]
-        
-        # Format papers for display
-        formatted_papers = []
-        for paper in sorted_papers:
-            formatted_papers.append({
-                "title": paper.get('title', ''),
-                "abstract": paper.get('abstract', ''),
-                "year": paper.get('year', 0),
-                "authors": paper.get('authors', '')
-            })
+        # Top 3 most recent papers for this author
+        paper_count, formatted_papers = author_papers.get(author_id, (0, []))
         
         # Determine author level for styling
         author_level = "unknown"
-        if author_id in author_levels.get('input_authors', []):
+        if author_id in input_authors:
             author_level = "input"
-        elif author_id in author_levels.get('direct_co_authors', []):
+        elif author_id in direct_co_authors:
             author_level = "direct"
-        elif author_id in author_levels.get('second_level_co_authors', []):
+        elif author_id in second_level_co_authors:
             author_level = "second"
         
         # Create node
@@ -74,7 +147,7 @@ def convert_author_abstracts_4_to_graph(input_file, output_file):
             "name": author_name,
             "level": author_level,
             "papers": formatted_papers,
-            "paper_count": len(papers)
+            "paper_count": paper_count
         }
         
         nodes.append(node)
@@ -118,13 +191,25 @@ def convert_author_abstracts_4_to_graph(input_file, output_file):
         }
     }
     
-    # Save to output file
-    print(f"\n💾 Saving to {output_file}...")
-    with open(output_file, 'w') as f:
-        json.dump(force_graph_data, f, indent=2)
+    # Save to output files
+    print(f"\n💾 Saving to {output_file} and {details_file}...")
+    sizes = write_compact_graph(force_graph_data, output_file)
+    write_author_details(details_file, (
+        {"author_id": node["id"], "name": node["name"], "level": node["level"],
+         "paper_count": node["paper_count"], "papers": node["papers"]}
+        for node in nodes
+    ))
+    sizes[details_file] = os.path.getsize(details_file)
+    if legacy_file:
+        with open(legacy_file, 'w') as f:
+            json.dump(force_graph_data, f, separators=(',', ':'))
+        sizes[legacy_file] = os.path.getsize(legacy_file)
     
     print(f"✅ Successfully converted to force graph format!")
-    print(f"📁 Output saved to: {output_file}")
+    for path, size in sizes.items():
+        print(f"📁 {path}: {size / 1024:.1f} KB")
+    if brotli is None:
+        print("💡 Install brotli to also write .br variants")
     
     # Print some statistics
     print(f"\n📊 Final graph statistics:")
@@ -142,8 +227,9 @@ def main():
     print("=" * 60)
     
     # File paths
-    input_file = "nicolasdata/author_abstracts_5.json"
-    output_file = "static/forcegraph_data_3.json"
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "nicolasdata/author_abstracts_5.json"
+    output_file = sys.argv[2] if len(sys.argv) > 2 else "static/forcegraph_graph_3.json"
+    details_file = os.getenv('AUTHOR_DETAILS_PATH', DEFAULT_DETAILS_PATH)
     
     # Check if input file exists
     if not os.path.exists(input_file):
@@ -152,7 +238,7 @@ def main():
     
     # Convert the data
     try:
-        force_graph_data = convert_author_abstracts_4_to_graph(input_file, output_file)
+        force_graph_data = convert_author_abstracts_4_to_graph(input_file, output_file, details_file)
         print(f"\n🎉 Conversion complete!")
         print(f"💡 You can now use {output_file} with your 3D force graph visualization")
         
@@ -1,64 +1,59 @@
-import json
+import os
+import sys
 
-def convert_author_abstracts():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from json_stream import iter_sections, write_json
+
+def top_papers(papers, count=3):
+    """Sort by year (most recent first), then take the top `count`, formatted"""
+    sorted_papers = sorted(papers, key=lambda x: x.get("year", 0), reverse=True)[:count]
+    return [{
+        "title": paper.get("title", ""),
+        "abstract": paper.get("abstract", ""),
+        "year": paper.get("year", 0),
+        "authors": paper.get("authors", "")
+    } for paper in sorted_papers]
+
+def convert_author_abstracts(input_file="nicolasdata/author_abstracts_4.json", output_file="fornicolas.json"):
     """Convert author_abstracts.json to a new format with id, name, 3 research papers, and connections"""
     
-    # Load the original data
-    with open("nicolasdata/author_abstracts_4.json", "r") as f:
-        data = json.load(f)
-    
-    # Extract the components
-    all_authors = data.get("all_authors", [])
-    author_names = data.get("author_names", {})
-    co_authors = data.get("co_authors", {})
-    author_abstracts = data.get("author_abstracts", {})
+    # Stream the original data, keeping only the top 3 papers per author
+    all_authors = []
+    author_names = {}
+    co_authors = {}
+    author_papers = {}
+    for key, value in iter_sections(input_file):
+        if key == "all_authors":
+            all_authors = value
+        elif key == "author_names":
+            author_names = dict(value)
+        elif key == "co_authors":
+            co_authors = dict(value)
+        elif key == "author_abstracts":
+            for author_id, papers in value:
+                author_papers[author_id] = top_papers(papers)
     
     # Convert to new format
-    converted_data = []
-    
-    for author_id in all_authors:
-        author_name = author_names.get(author_id, "Unknown")
-        
-        # Get research papers from author_abstracts
-        papers = author_abstracts.get(author_id, [])
-        # Sort by year (most recent first), then take top 3
-        sorted_papers = sorted(papers, key=lambda x: x.get("year", 0), reverse=True)[:3]
-        
-        # Format papers
-        formatted_papers = []
-        for paper in sorted_papers:
-            formatted_papers.append({
-                "title": paper.get("title", ""),
-                "abstract": paper.get("abstract", ""),
-                "year": paper.get("year", 0),
-                "authors": paper.get("authors", "")
-            })
-        
-        # Get connections (co-authors)
-        connections = co_authors.get(author_id, [])
-        
-        # Create the new entry
-        entry = {
-            "id": author_id,
-            "name": author_name,
-            "research_papers": formatted_papers,
-            "connections": connections
-        }
-        
-        converted_data.append(entry)
+    def entries():
+        for author_id in all_authors:
+            yield {
+                "id": author_id,
+                "name": author_names.get(author_id, "Unknown"),
+                "research_papers": author_papers.get(author_id, []),
+                "connections": co_authors.get(author_id, [])
+            }
     
-    # Save the converted data
-    output_file = "fornicolas.json"
-    with open(output_file, "w") as f:
-        json.dump(converted_data, f, indent=2)
+    # Save the converted data, one entry at a time
+    write_json(output_file, entries())
     
-    print(f"✅ Converted {len(converted_data)} authors")
+    print(f"✅ Converted {len(all_authors)} authors")
     print(f"📊 Output saved to: {output_file}")
     
     # Show a sample entry
-    if converted_data:
+    if all_authors:
         print("\n📋 Sample entry:")
-        sample = converted_data[0]
+        sample = next(entries())
         print(f"ID: {sample['id']}")
         print(f"Name: {sample['name']}")
         print(f"Papers: {len(sample['research_papers'])}")
@@ -1,70 +1,207 @@
+import argparse
+import hashlib
 import json
 import glob
 import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
-def merge_author_abstracts():
-    """Merge multiple author_abstracts*.json files and convert to force graph format"""
-    
-    # Find all author abstracts files
-    abstract_files = glob.glob("author_abstracts*.json")
-    print(f"📁 Found {len(abstract_files)} author abstracts files: {abstract_files}")
-    
-    if not abstract_files:
-        print("❌ No author_abstracts*.json files found!")
-        return
-    
-    # Initialize merged data structure
-    merged_data = {
-        "input_authors": [],
-        "all_authors": [],
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from json_stream import iter_sections, write_json
+
+# Parsed inputs are cached per file under CACHE_DIR, keyed by content hash, so
+# a re-run only parses the author_abstracts*.json files that changed
+CACHE_DIR = ".merge_cache"
+MANIFEST_FILE = "manifest.json"
+MERGED_FILE = "merged_author_abstracts.json"
+CONVERTED_FILE = "converted_author_data.json"
+FORCEGRAPH_FILE = "forcegraph_data.json"
+# Inputs may be compressed (.zst requires the zstandard package)
+INPUT_PATTERNS = ("author_abstracts*.json", "author_abstracts*.json.gz", "author_abstracts*.json.zst")
+
+def file_digest(path):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parse_abstracts_file(path, cache_path=None):
+    """
+    Parse one author_abstracts file into a partial merge
+
+    Lists become dicts used as ordered sets and papers are keyed by title, so
+    reducing partials is a series of dict updates.
+
+    Args:
+        path (str): The author_abstracts*.json file
+        cache_path (str): Where to pickle the partial for later runs
+
+    Returns:
+        dict: The partial merge
+    """
+    partial = {
+        "input_authors": {},
+        "all_authors": {},
         "author_names": {},
         "co_authors": {},
-        "author_abstracts": {}
+        "author_abstracts": {},
+        "author_levels": {}
     }
+    # Streamed section by section; sections we do not merge are skipped
+    for key, value in iter_sections(path):
+        if key in ("input_authors", "all_authors"):
+            partial[key] = dict.fromkeys(value)
+        elif key == "author_names":
+            partial[key] = dict(value)
+        elif key == "co_authors":
+            partial[key] = {author_id: dict.fromkeys(connections) for author_id, connections in value}
+        elif key == "author_abstracts":
+            for author_id, papers in value:
+                by_title = partial[key].setdefault(author_id, {})
+                for paper in papers:
+                    by_title.setdefault(paper.get("title", ""), paper)
+        elif key == "author_levels":
+            partial[key] = {level: dict.fromkeys(author_ids) for level, author_ids in value.items()}
+    if cache_path:
+        with open(cache_path + ".tmp", "wb") as f:
+            pickle.dump(partial, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_path + ".tmp", cache_path)
+    return partial
+
+def reduce_partials(partials):
+    """
+    Fold partial merges in file order
+
+    Ids keep their first-seen order; names are overridden by later files;
+    co-author and level lists are unioned; papers are deduplicated by title,
+    first occurrence wins.
+    """
+    merged = {
+        "input_authors": {},
+        "all_authors": {},
+        "author_names": {},
+        "co_authors": {},
+        "author_abstracts": {},
+        "author_levels": {}
+    }
+    for partial in partials:
+        merged["input_authors"].update(partial["input_authors"])
+        merged["all_authors"].update(partial["all_authors"])
+        merged["author_names"].update(partial["author_names"])
+        for author_id, connections in partial["co_authors"].items():
+            merged["co_authors"].setdefault(author_id, {}).update(connections)
+        for author_id, papers in partial["author_abstracts"].items():
+            existing = merged["author_abstracts"].setdefault(author_id, {})
+            for title, paper in papers.items():
+                existing.setdefault(title, paper)
+        for level, author_ids in partial.get("author_levels", {}).items():
+            merged["author_levels"].setdefault(level, {}).update(author_ids)
+    return {
+        "input_authors": list(merged["input_authors"]),
+        "all_authors": list(merged["all_authors"]),
+        "author_names": merged["author_names"],
+        "co_authors": {author_id: list(connections) for author_id, connections in merged["co_authors"].items()},
+        "author_abstracts": {author_id: list(papers.values())
+                             for author_id, papers in merged["author_abstracts"].items()},
+        "author_levels": {level: list(author_ids) for level, author_ids in merged["author_levels"].items()}
+    }
+
+def load_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}, "merged": None}
+
+def save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def input_digests(abstract_files, manifest):
+    """Content hash per file; files whose size and mtime are unchanged are not re-read"""
+    digests = {}
+    for path in abstract_files:
+        stat = os.stat(path)
+        known = manifest["files"].get(path)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            digests[path] = known["sha256"]
+        else:
+            digests[path] = file_digest(path)
+        manifest["files"][path] = {"sha256": digests[path], "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return digests
+
+def load_partials(abstract_files, digests, cache_dir=CACHE_DIR, jobs=None, force=False):
+    """
+    Partial merges of the files in order: cached ones are unpickled, the rest
+    are parsed in a process pool (and cached)
+
+    Args:
+        digests (dict): Content hash per file, from input_digests
+    """
+    cache_paths = {path: os.path.join(cache_dir, digests[path] + ".pickle") for path in abstract_files}
+    partials = {}
+    for path in abstract_files:
+        if not force and os.path.exists(cache_paths[path]):
+            with open(cache_paths[path], "rb") as f:
+                partials[path] = pickle.load(f)
+    to_parse = [path for path in abstract_files if path not in partials]
+    print(f"♻️  {len(partials)} unchanged, 📖 parsing {len(to_parse)}")
+    if len(to_parse) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            parsed = executor.map(parse_abstracts_file, to_parse, [cache_paths[path] for path in to_parse])
+            partials.update(zip(to_parse, parsed))
+    else:
+        for path in to_parse:
+            partials[path] = parse_abstracts_file(path, cache_paths[path])
+    return [partials[path] for path in abstract_files]
+
+def prune_partials(cache_dir, digests):
+    """Drop partials of file versions that no longer exist"""
+    live = {digest + ".pickle" for digest in digests.values()}
+    for name in os.listdir(cache_dir):
+        if name.endswith(".pickle") and name not in live:
+            os.remove(os.path.join(cache_dir, name))
+
+def merge_author_abstracts(abstract_files=None, cache_dir=CACHE_DIR, jobs=None, force=False):
+    """
+    Merge multiple author_abstracts*.json files
+
+    Args:
+        abstract_files (list[str]): Inputs, in merge order (default: every
+            author_abstracts*.json[.gz|.zst] in the current directory, sorted)
+        cache_dir (str): Directory for parsed partials and the manifest
+        jobs (int): Worker processes for parsing (default: CPU count)
+        force (bool): Re-parse every file and rewrite the outputs
+
+    Returns:
+        dict: The merged data, or None if there are no inputs or nothing
+        changed since the last run
+    """
+    if abstract_files is None:
+        abstract_files = sorted(path for pattern in INPUT_PATTERNS for path in glob.glob(pattern))
+    print(f"📁 Found {len(abstract_files)} author abstracts files: {abstract_files}")
     
-    # Process each file
-    for file_path in abstract_files:
-        print(f"\n📖 Processing {file_path}...")
-        
-        with open(file_path, "r") as f:
-            data = json.load(f)
-        
-        # Merge input_authors (unique)
-        input_authors = data.get("input_authors", [])
-        for author_id in input_authors:
-            if author_id not in merged_data["input_authors"]:
-                merged_data["input_authors"].append(author_id)
-        
-        # Merge all_authors (unique)
-        all_authors = data.get("all_authors", [])
-        for author_id in all_authors:
-            if author_id not in merged_data["all_authors"]:
-                merged_data["all_authors"].append(author_id)
-        
-        # Merge author_names (later files override earlier ones)
-        author_names = data.get("author_names", {})
-        merged_data["author_names"].update(author_names)
-        
-        # Merge co_authors (combine lists, remove duplicates)
-        co_authors = data.get("co_authors", {})
-        for author_id, connections in co_authors.items():
-            if author_id not in merged_data["co_authors"]:
-                merged_data["co_authors"][author_id] = []
-            # Add new connections
-            for conn in connections:
-                if conn not in merged_data["co_authors"][author_id]:
-                    merged_data["co_authors"][author_id].append(conn)
-        
-        # Merge author_abstracts (later files override earlier ones)
-        author_abstracts = data.get("author_abstracts", {})
-        for author_id, papers in author_abstracts.items():
-            if author_id not in merged_data["author_abstracts"]:
-                merged_data["author_abstracts"][author_id] = []
-            # Add new papers (avoid duplicates by title)
-            existing_titles = {paper.get("title", "") for paper in merged_data["author_abstracts"][author_id]}
-            for paper in papers:
-                if paper.get("title", "") not in existing_titles:
-                    merged_data["author_abstracts"][author_id].append(paper)
+    if not abstract_files:
+        print("❌ No author_abstracts*.json files found!")
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = load_manifest(cache_dir)
+    digests = input_digests(abstract_files, manifest)
+    merged_key = hashlib.sha256("\n".join(digests[path] for path in abstract_files).encode()).hexdigest()
+    outputs = (MERGED_FILE, CONVERTED_FILE, FORCEGRAPH_FILE)
+    if not force and manifest.get("merged") == merged_key and all(os.path.exists(path) for path in outputs):
+        save_manifest(cache_dir, manifest)
+        print("✅ Inputs unchanged since the last run; outputs are up to date")
+        return None
+
+    merged_data = reduce_partials(load_partials(abstract_files, digests, cache_dir, jobs, force))
     
     print(f"\n📊 Merged data summary:")
     print(f"  - Input authors: {len(merged_data['input_authors'])}")
@@ -74,74 +211,64 @@ def merge_author_abstracts():
     print(f"  - Author abstracts: {len(merged_data['author_abstracts'])}")
     
     # Save merged data
-    merged_file = "merged_author_abstracts.json"
-    with open(merged_file, "w") as f:
+    with open(MERGED_FILE, "w") as f:
         json.dump(merged_data, f, indent=2)
-    print(f"\n💾 Saved merged data to: {merged_file}")
+    print(f"\n💾 Saved merged data to: {MERGED_FILE}")
+
+    prune_partials(cache_dir, digests)
+    manifest["files"] = {path: manifest["files"][path] for path in abstract_files}
+    manifest["merged"] = merged_key
+    save_manifest(cache_dir, manifest)
     
     return merged_data
 
-def convert_merged_to_author_data(merged_data):
-    """Convert merged data to the author data format"""
-    
-    print("\n🔄 Converting to author data format...")
-    
-    # Convert to new format
-    converted_data = []
-    
+def author_entries(merged_data, with_papers=True):
+    """Yield merged authors in the author data format, one at a time"""
     for author_id in merged_data["all_authors"]:
-        author_name = merged_data["author_names"].get(author_id, "Unknown")
-        
-        # Get research papers from author_abstracts
-        papers = merged_data["author_abstracts"].get(author_id, [])
-        # Sort by year (most recent first), then take top 3
-        sorted_papers = sorted(papers, key=lambda x: x.get("year", 0), reverse=True)[:3]
-        
-        # Format papers
-        formatted_papers = []
-        for paper in sorted_papers:
-            formatted_papers.append({
+        entry = {
+            "id": author_id,
+            "name": merged_data["author_names"].get(author_id, "Unknown")
+        }
+        if with_papers:
+            # Get research papers from author_abstracts
+            papers = merged_data["author_abstracts"].get(author_id, [])
+            # Sort by year (most recent first), then take top 3
+            sorted_papers = sorted(papers, key=lambda x: x.get("year", 0), reverse=True)[:3]
+            entry["research_papers"] = [{
                 "title": paper.get("title", ""),
                 "abstract": paper.get("abstract", ""),
                 "year": paper.get("year", 0),
                 "authors": paper.get("authors", "")
-            })
-        
+            } for paper in sorted_papers]
         # Get connections (co-authors)
-        connections = merged_data["co_authors"].get(author_id, [])
-        
-        # Create the new entry
-        entry = {
-            "id": author_id,
-            "name": author_name,
-            "research_papers": formatted_papers,
-            "connections": connections
-        }
-        
-        converted_data.append(entry)
+        entry["connections"] = merged_data["co_authors"].get(author_id, [])
+        yield entry
+
+def convert_merged_to_author_data(merged_data):
+    """Convert merged data to the author data format, writing it as it is produced"""
     
-    # Save the converted data
-    output_file = "converted_author_data.json"
-    with open(output_file, "w") as f:
-        json.dump(converted_data, f, indent=2)
+    print("\n🔄 Converting to author data format...")
     
-    print(f"✅ Converted {len(converted_data)} authors")
-    print(f"📊 Output saved to: {output_file}")
+    output_file = CONVERTED_FILE
+    write_json(output_file, author_entries(merged_data))
     
-    return converted_data
+    print(f"✅ Converted {len(merged_data['all_authors'])} authors")
+    print(f"📊 Output saved to: {output_file}")
 
-def convert_to_forcegraph():
-    """Convert author data to force graph format"""
+def convert_to_forcegraph(authors=None):
+    """Convert author data (any iterable of entries; read from disk if not given) to force graph format"""
     
     print("\n🌐 Converting to force graph format...")
     
     # Load the converted author data
-    with open("converted_author_data.json", "r") as f:
-        authors = json.load(f)
+    if authors is None:
+        with open(CONVERTED_FILE, "r") as f:
+            authors = json.load(f)
 
-    # Build nodes
+    # Build nodes in one pass, keeping only the connections for the links
     nodes = []
     id_to_node = {}
+    connections = []
     for author in authors:
         node = {
             "id": author["id"],
@@ -149,13 +276,13 @@ def convert_to_forcegraph():
         }
         nodes.append(node)
         id_to_node[author["id"]] = node
+        connections.append((author["id"], author.get("connections", [])))
 
     # Build links (deduplicate, undirected)
     links_set = set()
     links = []
-    for author in authors:
-        source_id = author["id"]
-        for target_id in author.get("connections", []):
+    for source_id, targets in connections:
+        for target_id in targets:
             # Only add link if both nodes exist
             if target_id in id_to_node:
                 # Use tuple with sorted ids to deduplicate undirected links
@@ -166,25 +293,34 @@ def convert_to_forcegraph():
 
     # Output
     out = {"nodes": nodes, "links": links}
-    with open("forcegraph_data.json", "w") as f:
+    with open(FORCEGRAPH_FILE, "w") as f:
         json.dump(out, f, indent=2)
-    print(f"✅ Wrote {len(nodes)} nodes and {len(links)} links to forcegraph_data.json")
+    print(f"✅ Wrote {len(nodes)} nodes and {len(links)} links to {FORCEGRAPH_FILE}")
 
 def main():
     """Main function to run the complete pipeline"""
+    parser = argparse.ArgumentParser(description="Merge author_abstracts*.json files and build the force graph")
+    parser.add_argument("files", nargs="*", help="Inputs in merge order (default: author_abstracts*.json, sorted)")
+    parser.add_argument("--jobs", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="Ignore the cache and rebuild everything")
+    args = parser.parse_args()
+
     print("🚀 Starting merge and update pipeline...")
     
     # Step 1: Merge all author abstracts files
-    merged_data = merge_author_abstracts()
+    merged_data = merge_author_abstracts(args.files or None, args.cache_dir, args.jobs, args.force)
+    if merged_data is None:
+        return
     
     # Step 2: Convert to author data format
     convert_merged_to_author_data(merged_data)
     
     # Step 3: Convert to force graph format
-    convert_to_forcegraph()
+    convert_to_forcegraph(author_entries(merged_data, with_papers=False))
     
     print("\n🎉 Pipeline complete! Your force graph is ready to view.")
     print("💡 Run 'python -m http.server 8000' and visit http://localhost:8000/force_graph.html")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# --- Persistent embedding cache ---
+#
+# Embeddings are cached in SQLite keyed by (model, task_type, sha256(text)) so
+# re-ingestion, repeated queries and test runs do not pay for vectors we have
+# already fetched. The least recently used entries are evicted once the cache
+# grows past `max_entries`.
+
+DEFAULT_CACHE_PATH = 'embedding_cache.sqlite3'
+DEFAULT_MAX_ENTRIES = 200000
+
+def text_digest(text):
+    """sha256 of the exact text; embeddings are not whitespace-insensitive."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache with LRU eviction and hit/miss counters."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, task_type, digest)
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings (last_used)')
+        self.conn.commit()
+
+    def get_many(self, model, task_type, texts):
+        """
+        Looks up several texts at once.
+
+        Returns:
+            list: One vector (list[float]) or None per text
+        """
+        digests = [text_digest(text) for text in texts]
+        found = {}
+        with self.lock:
+            for start in range(0, len(digests), 500):
+                chunk = digests[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND task_type = ? "
+                    f"AND digest IN ({','.join('?' * len(chunk))})",
+                    [model, task_type] + chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    'UPDATE embeddings SET last_used = ? WHERE model = ? AND task_type = ? AND digest = ?',
+                    [(now, model, task_type, digest) for digest in found]
+                )
+                self.conn.commit()
+            results = []
+            for digest in digests:
+                blob = found.get(digest)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(np.frombuffer(blob, dtype=np.float32).tolist())
+        return results
+
+    def get(self, model, task_type, text):
+        """Returns the cached vector for `text`, or None."""
+        return self.get_many(model, task_type, [text])[0]
+
+    def put_many(self, model, task_type, texts, vectors):
+        """Stores vectors for texts, then evicts old entries if over capacity."""
+        now = time.time()
+        rows = [(model, task_type, text_digest(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for text, vector in zip(texts, vectors)]
+        with self.lock:
+            self.conn.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)', rows)
+            self._evict()
+            self.conn.commit()
+
+    def put(self, model, task_type, text, vector):
+        self.put_many(model, task_type, [text], [vector])
+
+    def _evict(self):
+        count = self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # Trim to 90% so eviction does not run on every insert
+        excess = count - int(self.max_entries * 0.9)
+        self.conn.execute(
+            'DELETE FROM embeddings WHERE rowid IN '
+            '(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)', (excess,)
+        )
+        self.evictions += excess
+
+    def size(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current entry count."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': self.size(),
+            'max_entries': self.max_entries
+        }
+
+def cached_embed(cache, model, task_type, texts, embed_batch):
+    """
+    Embeds texts, calling `embed_batch` only for the cache misses.
+
+    Args:
+        cache (EmbeddingCache): The cache, or None to always call the API
+        model (str): Embedding model name
+        task_type (str): Gemini task type
+        texts (list[str]): Texts to embed
+        embed_batch (callable): list[str] -> list[list[float]] for the misses
+
+    Returns:
+        list[list[float]]: One vector per text
+    """
+    if cache is None:
+        return embed_batch(texts)
+    vectors = cache.get_many(model, task_type, texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        fetched = embed_batch([texts[i] for i in missing])
+        cache.put_many(model, task_type, [texts[i] for i in missing], fetched)
+        for i, vector in zip(missing, fetched):
+            vectors[i] = vector
+    return vectors
+
+def open_default_cache():
+    """
+    Opens the cache configured by EMBEDDING_CACHE_PATH / EMBEDDING_CACHE_MAX_ENTRIES.
+
+    Set EMBEDDING_CACHE_PATH to an empty string to disable caching. On Vercel
+    only /tmp is writable, so the cache lives there by default.
+
+    Returns:
+        EmbeddingCache: The cache, or None if disabled or it cannot be opened
+    """
+    default_path = '/tmp/embedding_cache.sqlite3' if os.getenv('VERCEL') else DEFAULT_CACHE_PATH
+    path = os.getenv('EMBEDDING_CACHE_PATH', default_path)
+    if not path:
+        return None
+    try:
+        return EmbeddingCache(path, int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)))
+    except Exception as e:
+        print(f"Embedding cache disabled: {e}")
+        return None
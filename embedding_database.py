@@ -1,8 +1,12 @@
 import google.generativeai as genai
 import numpy as np
 import os
-import json # Using json for saving/loading the database
 import math
+from vector_backends import LocalStoreBackend
+from vector_store import VectorStore, is_store, import_json
+from embedding_ingest import ingest_texts
+from embedding_cache import cached_embed, open_default_cache
+from json_stream import iter_author_abstracts
 
 # --- Configuration and Setup ---
 
@@ -26,16 +30,30 @@ except KeyError:
 
 # The embedding model to use
 EMBEDDING_MODEL = 'embedding-001'
-DB_FILE_PATH = 'vectorbig.json'
+DB_FILE_PATH = 'vectorbig.json'  # Legacy JSON database, imported on first run
+DB_STORE_PATH = 'vectorstore'    # Memory-mapped binary store (see vector_store.py)
+
+# Bulk ingestion settings (see embedding_ingest.py)
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '100'))
+EMBED_MAX_IN_FLIGHT = int(os.getenv('EMBED_MAX_IN_FLIGHT', '4'))
+EMBED_REQUESTS_PER_MINUTE = int(os.getenv('EMBED_REQUESTS_PER_MINUTE', '150'))
+
+# Search backend over the open database, reused between searches
+_search_backend = None
+
+# Persistent (model, task_type, text) -> vector cache; None if disabled
+embedding_cache = open_default_cache()
 
 # --- Core Functions ---
 
-def get_embedding(text):
+def get_embedding(text, task_type="RETRIEVAL_DOCUMENT"):
     """
     Generates an embedding for the given text using the Gemini API.
 
     Args:
         text (str): The text to embed.
+        task_type (str): Use 'RETRIEVAL_DOCUMENT' for items in DB
+                         and 'RETRIEVAL_QUERY' for search queries.
 
     Returns:
         list[float]: The embedding vector, or None if an error occurs.
@@ -43,17 +61,34 @@ def get_embedding(text):
     try:
         # The API handles requests where the text is too long by chunking it.
         # Here we assume the text fits within the model's context window for simplicity.
-        result = genai.embed_content(
-            model=f"models/{EMBEDDING_MODEL}",
-            content=text,
-            task_type="RETRIEVAL_DOCUMENT" # Use 'RETRIEVAL_DOCUMENT' for items in DB
-                                           # and 'RETRIEVAL_QUERY' for search queries.
-        )
-        return result['embedding']
+        return get_embeddings([text], task_type)[0]
     except Exception as e:
         print(f"Error getting embedding: {e}")
         return None
 
+def get_embeddings(texts, task_type="RETRIEVAL_DOCUMENT"):
+    """
+    Generates embeddings for several texts with a single API call.
+
+    Texts found in the embedding cache are not sent to the API. Unlike
+    get_embedding, errors are raised so the caller can retry.
+
+    Args:
+        texts (list[str]): The texts to embed.
+        task_type (str): Gemini task type for the embeddings.
+
+    Returns:
+        list[list[float]]: One embedding vector per text.
+    """
+    def embed_batch(batch):
+        return genai.embed_content(
+            model=f"models/{EMBEDDING_MODEL}",
+            content=batch,
+            task_type=task_type
+        )['embedding']
+
+    return cached_embed(embedding_cache, EMBEDDING_MODEL, task_type, texts, embed_batch)
+
 def cosine_similarity(vec_a, vec_b):
     """Calculate cosine similarity between two vectors"""
     # Ensure vectors are lists of floats
@@ -69,40 +104,52 @@ def cosine_similarity(vec_a, vec_b):
 # --- Database Management ---
 
 def load_database():
-    """Loads the vector database from a JSON file."""
-    if os.path.exists(DB_FILE_PATH):
-        with open(DB_FILE_PATH, 'r') as f:
-            return json.load(f)
-    return [] # Return an empty list if the file doesn't exist
+    """
+    Opens the vector store, importing the legacy JSON database on first run.
+
+    Returns:
+        VectorStore: List-like store of {'text', 'vector', 'author_ids'} rows
+    """
+    if not is_store(DB_STORE_PATH):
+        if os.path.exists(DB_FILE_PATH):
+            print(f"Importing {DB_FILE_PATH} into {DB_STORE_PATH}...")
+            import_json(DB_FILE_PATH, DB_STORE_PATH)
+        else:
+            return VectorStore.create(DB_STORE_PATH)
+    return VectorStore.open(DB_STORE_PATH)
 
 def save_database(db):
-    """Saves the vector database to a JSON file."""
-    with open(DB_FILE_PATH, 'w') as f:
-        json.dump(db, f, indent=4)
-    print(f"\nDatabase saved to {DB_FILE_PATH}")
+    """
+    Makes the changes logged so far durable.
+
+    Each change is already appended to this process's log, so this never
+    rewrites the database; `db.compact()` folds the logs into a new base.
+    """
+    db.save()
+    print(f"\nDatabase saved to {DB_STORE_PATH}")
 
 def find_existing_chunk(db, text):
     """
     Finds if a chunk with the same text already exists in the database.
     
+    Uses the store's content-hash index, so texts that differ only in
+    whitespace or unicode normalization count as the same chunk.
+    
     Args:
-        db (list): The database
+        db (VectorStore): The database
         text (str): The text to search for
         
     Returns:
         int: Index of the existing chunk, or -1 if not found
     """
-    for i, item in enumerate(db):
-        if item['text'] == text:
-            return i
-    return -1
+    return db.find(text)
 
 def add_text_to_db(db, text, author_id):
     """
     Adds text and its embedding to the database, handling duplicates.
     
     Args:
-        db (list): The database
+        db (VectorStore): The database
         text (str): The text to add
         author_id (str): The author ID to associate with this text
     """
@@ -112,7 +159,7 @@ def add_text_to_db(db, text, author_id):
     if existing_index >= 0:
         # Text already exists, just add the new author_id to the existing entry
         if author_id not in db[existing_index]['author_ids']:
-            db[existing_index]['author_ids'].append(author_id)
+            db.add_author_id(existing_index, author_id)
             print(f"Added author ID {author_id} to existing chunk.")
             save_database(db)
         else:
@@ -132,65 +179,85 @@ def add_text_to_db(db, text, author_id):
         else:
             print("Failed to add text to the database.")
 
-def load_author_abstracts_from_json(json_file_path):
-    """
-    Loads author abstracts from a JSON file and returns the data.
-    
-    Args:
-        json_file_path (str): Path to the JSON file
-        
-    Returns:
-        dict: The loaded JSON data
-    """
-    try:
-        with open(json_file_path, 'r') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        print(f"Error loading JSON file: {e}")
-        return None
-
-def process_author_abstracts(json_file_path):
+def process_author_abstracts(json_file_path, database=None):
     """
     Processes author abstracts from JSON file and adds them to the database.
+
+    The file (optionally .gz or .zst) is streamed one author at a time, so
+    memory does not grow with its size.
     
     Args:
         json_file_path (str): Path to the JSON file containing author abstracts
+        database (VectorStore): Open database to add to; opened if not given
+
+    Returns:
+        dict: ingest_texts counts ('embedded', 'linked', 'skipped', 'failed'),
+        or None if the file could not be read
     """
-    print(f"Loading author abstracts from {json_file_path}...")
-    data = load_author_abstracts_from_json(json_file_path)
-    
-    if not data or 'author_abstracts' not in data:
-        print("No author_abstracts found in the JSON file.")
+    print(f"Streaming author abstracts from {json_file_path}...")
+    if not os.path.exists(json_file_path):
+        print(f"Error loading JSON file: {json_file_path} not found")
         return
     
-    database = load_database()
-    author_abstracts = data['author_abstracts']
+    if database is None:
+        database = load_database()
+    counts = {'authors': 0, 'papers': 0}
     
-    total_papers = sum(len(papers) for papers in author_abstracts.values())
-    processed = 0
+    def paper_texts():
+        for author_id, papers in iter_author_abstracts(json_file_path):
+            counts['authors'] += 1
+            counts['papers'] += len(papers)
+            for paper in papers:
+                # Combine title and abstract
+                title = paper.get('title', '')
+                abstract = paper.get('abstract', '')
+                yield f"Title: {title}\nAbstract: {abstract}", author_id
     
-    print(f"Found {len(author_abstracts)} authors with {total_papers} total papers.")
-    
-    for author_id, papers in author_abstracts.items():
-        print(f"\nProcessing author {author_id} with {len(papers)} papers...")
-        
-        for paper in papers:
-            # Combine title and abstract
-            title = paper.get('title', '')
-            abstract = paper.get('abstract', '')
-            combined_text = f"Title: {title}\nAbstract: {abstract}"
-            
-            # Add to database
-            add_text_to_db(database, combined_text, author_id)
-            processed += 1
-            
-            # Progress update
-            if processed % 10 == 0:
-                print(f"Processed {processed}/{total_papers} papers...")
+    # Batched, concurrent and rate limited; already-embedded texts are skipped,
+    # so re-running after an interruption resumes where it stopped
+    try:
+        stats = ingest_texts(
+            database, paper_texts(), get_embeddings,
+            batch_size=EMBED_BATCH_SIZE,
+            max_in_flight=EMBED_MAX_IN_FLIGHT,
+            requests_per_minute=EMBED_REQUESTS_PER_MINUTE
+        )
+    except ValueError as e:
+        print(f"Error loading JSON file: {e}")
+        return
+    if not counts['authors']:
+        print("No author_abstracts found in the JSON file.")
+        return stats
+    print(f"Read {counts['authors']} authors with {counts['papers']} total papers.")
+    processed = counts['papers'] - stats['failed']
+    if stats['failed']:
+        print(f"\n{stats['failed']} papers failed to embed; run the load again to retry them.")
     
-    print(f"\nCompleted processing {processed} papers from {len(author_abstracts)} authors.")
+    # Fold this run's log into a fresh immutable base segment
+    print("\nCompacting database...")
+    database.compact()
+
+    print(f"\nCompleted processing {processed} papers from {counts['authors']} authors.")
     print(f"Database now contains {len(database)} unique chunks.")
+    return stats
+
+def get_search_backend(db):
+    """
+    Returns the local-store search backend for the database (the same backend
+    the API uses when VECTOR_BACKEND=local), reusing it between searches.
+
+    Args:
+        db (VectorStore): The database
+
+    Returns:
+        LocalStoreBackend: Backend over the database; it uses the store's IVF
+        index if one was built, and rebuilds its exact engine only when the
+        database grows
+    """
+    global _search_backend
+    if _search_backend is None or _search_backend.store is not db:
+        _search_backend = LocalStoreBackend.from_store(db)
+    return _search_backend
 
 def search_db(db, query_text, top_n=3):
     """Searches the database for text similar to the query."""
@@ -200,32 +267,19 @@ def search_db(db, query_text, top_n=3):
 
     print(f"\nGetting embedding for search query: '{query_text}'...")
     # Use 'RETRIEVAL_QUERY' for the search query embedding
-    query_vector = genai.embed_content(
-        model=f"models/{EMBEDDING_MODEL}",
-        content=query_text,
-        task_type="RETRIEVAL_QUERY"
-    )['embedding']
+    query_vector = get_embedding(query_text, task_type="RETRIEVAL_QUERY")
     
     if not query_vector:
         print("Could not get embedding for the search query.")
         return
 
-    # Calculate similarities
-    results = []
-    for item in db:
-        similarity = cosine_similarity(query_vector, item['vector'])
-        results.append({
-            'text': item['text'], 
-            'similarity': similarity,
-            'author_ids': item['author_ids']
-        })
-
-    # Sort results by similarity in descending order
-    results.sort(key=lambda x: x['similarity'], reverse=True)
+    # One matrix-vector product over the cached, pre-normalized matrix
+    # (or an IVF index probe when the store has one)
+    results = get_search_backend(db).search(query_vector, top_k=top_n)
 
     # Display top N results
     print("\n--- Search Results ---")
-    for i, result in enumerate(results[:top_n]):
+    for i, result in enumerate(results):
         print(f"\n{i+1}. Similarity: {result['similarity']:.4f}")
         print(f"   Author IDs: {', '.join(result['author_ids'])}")
         print(f"   Text: {result['text'][:200]}...")
@@ -237,7 +291,7 @@ def main():
     """The main function to run the interactive command-line interface."""
     database = load_database()
     print("--- Local Vector DB ---")
-    print(f"Loaded {len(database)} items from {DB_FILE_PATH}")
+    print(f"Loaded {len(database)} items from {DB_STORE_PATH}")
 
     while True:
         print("\nWhat would you like to do?")
@@ -246,13 +300,14 @@ def main():
         print("3. Search the database")
         print("4. View all items in the database")
         print("5. View statistics")
-        print("6. Exit")
+        print("6. Check if a text is already in the database")
+        print("7. Exit")
         
-        choice = input("Enter your choice (1/2/3/4/5/6): ")
+        choice = input("Enter your choice (1/2/3/4/5/6/7): ")
 
         if choice == '1':
             json_path = input("Enter the path to the JSON file: ")
-            process_author_abstracts(json_path)
+            process_author_abstracts(json_path, database)
         elif choice == '2':
             text = input("Enter the text to add: ")
             author_id = input("Enter the author ID: ")
@@ -265,9 +320,9 @@ def main():
             if not database:
                 print("The database is empty.")
             else:
-                for i, item in enumerate(database):
-                    print(f"{i+1}. Author IDs: {', '.join(item['author_ids'])}")
-                    print(f"   Text: {item['text'][:100]}...")
+                for i in range(len(database)):
+                    print(f"{i+1}. Author IDs: {', '.join(database.author_ids(i))}")
+                    print(f"   Text: {database.text(i)[:100]}...")
                     print()
             print("--------------------------")
         elif choice == '5':
@@ -277,21 +332,38 @@ def main():
             else:
                 total_chunks = len(database)
                 all_author_ids = set()
-                for item in database:
-                    all_author_ids.update(item['author_ids'])
+                multi_author_chunks = []
+                # Reads only the records sidecar, never the vectors
+                for i in range(total_chunks):
+                    author_ids = database.author_ids(i)
+                    all_author_ids.update(author_ids)
+                    if len(author_ids) > 1:
+                        multi_author_chunks.append(author_ids)
                 
                 print(f"Total unique chunks: {total_chunks}")
                 print(f"Total unique authors: {len(all_author_ids)}")
                 print(f"Average authors per chunk: {len(all_author_ids) / total_chunks:.2f}")
                 
                 # Show chunks with multiple authors
-                multi_author_chunks = [item for item in database if len(item['author_ids']) > 1]
                 if multi_author_chunks:
                     print(f"Chunks with multiple authors: {len(multi_author_chunks)}")
-                    for item in multi_author_chunks:
-                        print(f"  - {len(item['author_ids'])} authors: {', '.join(item['author_ids'])}")
+                    for author_ids in multi_author_chunks:
+                        print(f"  - {len(author_ids)} authors: {', '.join(author_ids)}")
+            if embedding_cache is not None:
+                cache_stats = embedding_cache.stats()
+                print(f"Embedding cache: {cache_stats['entries']} entries, "
+                      f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                      f"({cache_stats['hit_ratio']:.0%} hit ratio)")
             print("--------------------------")
         elif choice == '6':
+            text = input("Enter the text to look up: ")
+            existing_index = find_existing_chunk(database, text)
+            if existing_index >= 0:
+                print(f"Already stored as chunk {existing_index + 1}, "
+                      f"author IDs: {', '.join(database[existing_index]['author_ids'])}")
+            else:
+                print("Not in the database yet.")
+        elif choice == '7':
             print("Exiting. Goodbye!")
             break
         else:
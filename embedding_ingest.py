@@ -0,0 +1,171 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from vector_store import text_key
+
+# --- Batched, concurrent, rate-limited embedding ingestion ---
+#
+# Texts are deduplicated against the database as they are read, packed into
+# batches for a single embed call each, and sent with a bounded number of
+# requests in flight. Only the calling thread writes to the database, and
+# every batch is made durable as soon as it lands, so the database itself is
+# the checkpoint: re-running an interrupted ingestion skips everything
+# already embedded.
+
+DEFAULT_BATCH_SIZE = 100          # Gemini accepts up to 100 texts per batch call
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_REQUESTS_PER_MINUTE = 150
+DEFAULT_MAX_RETRIES = 6
+
+class TokenBucket:
+    """Thread-safe token bucket; `acquire` blocks until a token is available."""
+
+    def __init__(self, rate_per_second, capacity=None):
+        self.rate = rate_per_second
+        self.capacity = capacity or max(1.0, rate_per_second)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+def is_retryable_error(error):
+    """True for quota/rate-limit and transient server errors from the API."""
+    name = type(error).__name__
+    if name in ('ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable',
+                'DeadlineExceeded', 'InternalServerError'):
+        return True
+    message = str(error).lower()
+    return '429' in message or 'quota' in message or 'rate limit' in message
+
+def embed_with_retry(embed_batch, texts, bucket, max_retries=DEFAULT_MAX_RETRIES, base_delay=1.0):
+    """
+    Embeds one batch, backing off exponentially (with jitter) on retryable errors.
+
+    Args:
+        embed_batch (callable): list[str] -> list[list[float]]
+        texts (list[str]): Texts to embed
+        bucket (TokenBucket): Rate limiter, one token per request
+        max_retries (int): Attempts before giving up on the batch
+        base_delay (float): First backoff delay in seconds
+
+    Returns:
+        list[list[float]]: One vector per text
+    """
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        try:
+            vectors = embed_batch(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+            return vectors
+        except Exception as e:
+            if attempt == max_retries or not is_retryable_error(e):
+                raise
+            delay = base_delay * (2 ** attempt) * (1 + random.random())
+            print(f"Embedding batch failed ({e}); retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def ingest_texts(db, items, embed_batch, batch_size=DEFAULT_BATCH_SIZE,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 max_retries=DEFAULT_MAX_RETRIES):
+    """
+    Adds (text, author_id) pairs to the database, embedding only new texts.
+
+    Items are consumed as they arrive: new texts are packed into batches and
+    sent while the input is still being read, so at most `max_in_flight + 1`
+    batches are held in memory however many items there are.
+
+    Args:
+        db (VectorStore): The database
+        items: Iterable of (text, author_id) pairs
+        embed_batch (callable): list[str] -> list[list[float]]
+        batch_size (int): Texts per embed request
+        max_in_flight (int): Maximum concurrent embed requests
+        requests_per_minute (int): Rate limit shared by all requests
+        max_retries (int): Retries per batch on quota/transient errors
+
+    Returns:
+        dict: Counts of 'embedded', 'linked' (author added to an existing
+              chunk), 'skipped' (already linked) and 'failed' texts
+    """
+    stats = {'embedded': 0, 'linked': 0, 'skipped': 0, 'failed': 0}
+    bucket = TokenBucket(requests_per_minute / 60.0, capacity=max_in_flight)
+    started = time.monotonic()
+    queued = {}     # text_key -> (text, author_ids) batched but not yet in the database
+    in_flight = {}  # future -> keys of its batch
+
+    def collect():
+        """Waits for at least one batch and appends everything that finished."""
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            batch = [queued.pop(key) for key in in_flight.pop(future)]
+            try:
+                vectors = future.result()
+            except Exception as e:
+                print(f"Giving up on a batch of {len(batch)} texts: {e}")
+                stats['failed'] += len(batch)
+                continue
+            for (text, author_ids), vector in zip(batch, vectors):
+                db.append({'text': text, 'vector': vector, 'author_ids': author_ids})
+            db.save()  # Durable checkpoint for this batch
+            stats['embedded'] += len(batch)
+        elapsed = time.monotonic() - started
+        print(f"Embedded {stats['embedded']} texts "
+              f"({stats['embedded'] / max(elapsed, 1e-9):.1f}/s, {stats['failed']} failed)")
+
+    def submit(keys):
+        while len(in_flight) >= max_in_flight:
+            collect()
+        future = executor.submit(embed_with_retry, embed_batch,
+                                 [queued[key][0] for key in keys], bucket, max_retries)
+        in_flight[future] = keys
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        try:
+            batch = []
+            for text, author_id in items:
+                existing_index = db.find(text)
+                if existing_index >= 0:
+                    # Reads only the records sidecar, not the row's vector
+                    if author_id in db.author_ids(existing_index):
+                        stats['skipped'] += 1
+                    else:
+                        db.add_author_id(existing_index, author_id)
+                        stats['linked'] += 1
+                    continue
+                key = text_key(text)
+                if key in queued:
+                    # Batched already; authors added before it lands are stored with it
+                    if author_id not in queued[key][1]:
+                        queued[key][1].append(author_id)
+                    continue
+                queued[key] = (text, [author_id])
+                batch.append(key)
+                if len(batch) == batch_size:
+                    submit(batch)
+                    batch = []
+            if batch:
+                submit(batch)
+        finally:
+            # Keep what was already paid for, even if reading the input failed
+            while in_flight:
+                collect()
+            db.save()
+
+    print(f"{stats['linked'] + stats['skipped']} texts already embedded, "
+          f"{stats['embedded']} embedded, {stats['failed']} failed")
+    return stats
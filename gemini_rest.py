@@ -0,0 +1,70 @@
+import http.client
+import json
+import threading
+
+# --- Minimal Gemini REST client ---
+#
+# A query needs a single embedContent call. Making it with http.client spares
+# a cold start the import of google.generativeai and its gRPC/protobuf stack.
+# Each thread keeps its HTTPS connection alive between requests.
+
+GEMINI_HOST = 'generativelanguage.googleapis.com'
+API_VERSION = 'v1beta'
+
+_local = threading.local()
+
+class GeminiRESTError(Exception):
+    """Non-200 response from the Gemini REST API (message starts with the status)."""
+
+def _connection(timeout):
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = http.client.HTTPSConnection(GEMINI_HOST, timeout=timeout)
+        _local.conn = conn
+    return conn
+
+def _reset_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+    _local.conn = None
+
+def post(path, payload, api_key, timeout=30):
+    """
+    POSTs JSON to a Gemini REST method.
+
+    Args:
+        path (str): Method path after the API version, e.g.
+            'models/embedding-001:embedContent'
+        payload (dict): Request body
+        api_key (str): Google API key
+
+    Returns:
+        dict: The decoded response
+    """
+    body = json.dumps(payload).encode('utf-8')
+    headers = {'Content-Type': 'application/json', 'x-goog-api-key': api_key}
+    for attempt in range(2):
+        conn = _connection(timeout)
+        try:
+            conn.request('POST', f"/{API_VERSION}/{path}", body, headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            # The server may have closed an idle kept-alive connection; retry once
+            _reset_connection()
+            if attempt:
+                raise
+            continue
+        if response.status != 200:
+            raise GeminiRESTError(f"{response.status} {response.reason}: {data[:300].decode('utf-8', 'replace')}")
+        return json.loads(data)
+
+def embed_content(api_key, model, text, task_type="RETRIEVAL_QUERY", timeout=30):
+    """Embeds one text; returns the vector as a list of floats."""
+    data = post(f"models/{model}:embedContent", {
+        'model': f"models/{model}",
+        'content': {'parts': [{'text': text}]},
+        'taskType': task_type
+    }, api_key, timeout)
+    return data['embedding']['values']
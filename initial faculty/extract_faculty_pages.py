@@ -1,101 +1,172 @@
-from bs4 import BeautifulSoup
-import json
+import argparse
 import glob
+import json
 import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+# Parsers from fastest to slowest; the first one installed is used by default.
+# selectolax (lexbor) and lxml are C-backed; BeautifulSoup is the fallback
+# and uses lxml as its tree builder when it is available.
+PARSERS = ('selectolax', 'lxml', 'bs4')
+DEFAULT_PATTERN = 'faculty_page_*.html'
+DEFAULT_OUTPUT = 'faculty_professors.json'
 
-def extract_professors_from_html(html_file):
+ARTICLE_CLASS = 'node--type-faculty'
+NAME_CLASS = 'field--name-title'
+INTERESTS_CLASS = 'field--name-field-areas-of-expertise'
+
+def available_parser(preferred=None):
+    """
+    Return the parser to use: `preferred` if given, else the fastest installed one.
+    """
+    for parser in ([preferred] if preferred else PARSERS):
+        try:
+            if parser == 'selectolax':
+                import selectolax.lexbor  # noqa: F401
+            elif parser == 'lxml':
+                import lxml.html  # noqa: F401
+            elif parser == 'bs4':
+                import bs4  # noqa: F401
+            else:
+                raise ValueError(f"Unknown parser {parser!r}; choose from {', '.join(PARSERS)}")
+            return parser
+        except ImportError:
+            if preferred:
+                raise
+    raise ImportError(f"No HTML parser installed; install one of {', '.join(PARSERS)}")
+
+def _extract_selectolax(html_content):
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html_content)
+    for article in tree.css(f'article.{ARTICLE_CLASS}'):
+        name_element = article.css_first(f'span.{NAME_CLASS}')
+        interests_element = article.css_first(f'div.{INTERESTS_CLASS}')
+        yield (name_element.text() if name_element else None,
+               [link.text() for link in interests_element.css('a')] if interests_element else [])
+
+def _has_class(tag, name):
+    return f"{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+
+def _extract_lxml(html_content):
+    import lxml.html
+
+    tree = lxml.html.fromstring(html_content)
+    for article in tree.xpath(f"//{_has_class('article', ARTICLE_CLASS)}"):
+        name_elements = article.xpath(f".//{_has_class('span', NAME_CLASS)}")
+        interests_elements = article.xpath(f".//{_has_class('div', INTERESTS_CLASS)}")
+        yield (name_elements[0].text_content() if name_elements else None,
+               [link.text_content() for link in interests_elements[0].iter('a')] if interests_elements else [])
+
+def _extract_bs4(html_content):
+    from bs4 import BeautifulSoup
+
+    try:
+        import lxml  # noqa: F401
+        builder = 'lxml'
+    except ImportError:
+        builder = 'html.parser'
+    soup = BeautifulSoup(html_content, builder)
+    for article in soup.find_all('article', class_=ARTICLE_CLASS):
+        name_element = article.find('span', class_=NAME_CLASS)
+        interests_element = article.find('div', class_=INTERESTS_CLASS)
+        yield (name_element.text if name_element else None,
+               [link.text for link in interests_element.find_all('a')] if interests_element else [])
+
+EXTRACTORS = {'selectolax': _extract_selectolax, 'lxml': _extract_lxml, 'bs4': _extract_bs4}
+
+def extract_professors_from_html(html_file, parser=None):
     """
     Extract professor names and interests from a faculty page HTML file.
     Returns a list of dictionaries with 'name' and 'interests' keys.
     """
-    # Read the HTML file
     with open(html_file, 'r', encoding='utf-8') as f:
         html_content = f.read()
-    
-    # Parse HTML
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Find all professor articles
-    professor_articles = soup.find_all('article', class_='node--type-faculty')
-    
+
     professors = []
-    
-    for article in professor_articles:
-        # Extract name
-        name_element = article.find('span', class_='field--name-title')
-        if name_element:
-            name = name_element.text.strip()
-        else:
+    for name, interests in EXTRACTORS[parser or available_parser()](html_content):
+        name = name.strip() if name else ''
+        if not name:
             continue  # Skip if no name found
-        
-        # Extract interests
-        interests_element = article.find('div', class_='field--name-field-areas-of-expertise')
-        interests = []
-        
-        if interests_element:
-            # Find all interest links
-            interest_links = interests_element.find_all('a')
-            for link in interest_links:
-                interest = link.text.strip()
-                if interest:  # Only add non-empty interests
-                    interests.append(interest)
-        
-        # Create professor entry
-        professor = {
+        professors.append({
             'name': name,
-            'interests': interests
-        }
-        
-        professors.append(professor)
-    
+            'interests': [interest for interest in (text.strip() for text in interests) if interest]
+        })
     return professors
 
-def process_all_faculty_pages():
+def normalize_name(name):
     """
-    Process all faculty_page HTML files and extract professors.
+    Dedup key for a name: case, accents, punctuation and spacing are ignored,
+    so "José  García-Molina" and "Jose Garcia Molina" match.
     """
-    # Find all faculty page HTML files
-    faculty_files = glob.glob('faculty_page_*.html')
-    faculty_files.sort()  # Sort to process in order
-    
-    if not faculty_files:
-        print("No faculty_page HTML files found!")
-        return
-    
-    print(f"Found {len(faculty_files)} faculty page files: {faculty_files}")
-    
-    all_professors = []
-    total_new = 0
-    
-    # Process each faculty page
-    for faculty_file in faculty_files:
-        print(f"Processing {faculty_file}...")
-        
-        # Extract professors from the file
-        professors = extract_professors_from_html(faculty_file)
-        print(f"Found {len(professors)} professors in {faculty_file}")
-        
-        # Create a set of existing professor names for quick lookup
-        existing_names = {prof['name'].lower() for prof in all_professors}
-        
-        # Filter out duplicates (based on name)
-        unique_professors = []
-        duplicates = 0
-        
-        for prof in professors:
-            if prof['name'].lower() not in existing_names:
-                unique_professors.append(prof)
-            else:
-                duplicates += 1
-        
-        if duplicates > 0:
-            print(f"Skipped {duplicates} duplicate professors")
-        
-        # Add unique professors to the main list
-        all_professors.extend(unique_professors)
-        total_new += len(unique_professors)
-    
-    return all_professors, total_new
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[\W_]+', ' ', stripped.casefold()).split())
+
+def find_faculty_pages(paths, pattern=DEFAULT_PATTERN):
+    """
+    Expand files and directories (searched recursively for `pattern`) into a
+    sorted list of HTML files.
+    """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            files.update(glob.glob(os.path.join(path, '**', pattern), recursive=True))
+        else:
+            # An unmatched pattern finds nothing; a plain path is kept so a
+            # missing file is reported rather than silently skipped
+            files.update(glob.glob(path) or ([] if glob.has_magic(path) else [path]))
+    return sorted(files)
+
+def process_all_faculty_pages(faculty_files, parser=None, jobs=None):
+    """
+    Extract professors from all pages in a process pool and merge them.
+
+    Pages are merged in file order; a professor seen again (same normalized
+    name) keeps the first entry's name and gains any new interests.
+    """
+    parser = available_parser(parser)
+    print(f"Parsing {len(faculty_files)} faculty pages with {parser}...")
+
+    professors_by_name = {}
+    total_found = 0
+    duplicates = 0
+    if len(faculty_files) > 1 and jobs != 1:
+        workers = jobs or os.cpu_count() or 1
+        # Batches of pages per task keep pickling overhead low on large crawls
+        chunksize = max(1, len(faculty_files) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(extract_professors_from_html, faculty_files,
+                                   [parser] * len(faculty_files), chunksize=chunksize)
+            for professors in results:
+                total_found += len(professors)
+                duplicates += merge_professors(professors_by_name, professors)
+    else:
+        for faculty_file in faculty_files:
+            professors = extract_professors_from_html(faculty_file, parser)
+            total_found += len(professors)
+            duplicates += merge_professors(professors_by_name, professors)
+
+    print(f"Found {total_found} professors; skipped {duplicates} duplicates")
+    return list(professors_by_name.values())
+
+def merge_professors(professors_by_name, professors):
+    """
+    Add professors to the running dedup index. Returns the number of duplicates.
+    """
+    duplicates = 0
+    for prof in professors:
+        key = normalize_name(prof['name'])
+        existing = professors_by_name.get(key)
+        if existing is None:
+            professors_by_name[key] = {'name': prof['name'], 'interests': list(prof['interests'])}
+            continue
+        duplicates += 1
+        known = set(existing['interests'])
+        existing['interests'].extend(interest for interest in prof['interests'] if interest not in known)
+    return duplicates
 
 def save_professors_to_json(professors, output_file):
     """
@@ -103,7 +174,7 @@ def save_professors_to_json(professors, output_file):
     """
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(professors, f, indent=2, ensure_ascii=False)
-    
+
     print(f"Saved {len(professors)} professors to {output_file}")
 
 def print_summary(professors):
@@ -112,11 +183,11 @@ def print_summary(professors):
     """
     print(f"\n=== SUMMARY ===")
     print(f"Total professors: {len(professors)}")
-    
+
     # Count total interests
     total_interests = sum(len(prof['interests']) for prof in professors)
     print(f"Total interests: {total_interests}")
-    
+
     # Show first few professors as example
     print(f"\n=== FIRST 5 PROFESSORS ===")
     for i, professor in enumerate(professors[:5]):
@@ -125,23 +196,36 @@ def print_summary(professors):
         print()
 
 def main():
-    # Process all faculty pages
+    parser = argparse.ArgumentParser(description='Extract professors from saved faculty page HTML files')
+    parser.add_argument('paths', nargs='*', default=[DEFAULT_PATTERN],
+                        help=f"HTML files, globs or directories (searched recursively; default: {DEFAULT_PATTERN})")
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN, help='File pattern inside directories')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON file to write')
+    parser.add_argument('--parser', choices=PARSERS, default=None,
+                        help='HTML parser (default: the fastest installed)')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: one per core)')
+    args = parser.parse_args()
+
     print("Extracting professors from faculty page HTML files...")
-    all_professors, total_new = process_all_faculty_pages()
-    
+    faculty_files = find_faculty_pages(args.paths, args.pattern)
+    if not faculty_files:
+        print("No faculty_page HTML files found!")
+        return
+
+    all_professors = process_all_faculty_pages(faculty_files, args.parser, args.jobs)
     if not all_professors:
         print("No professors found in the HTML files!")
         return
-    
+
     # Save to JSON file
-    save_professors_to_json(all_professors, 'faculty_professors.json')
-    
+    save_professors_to_json(all_professors, args.output)
+
     # Print summary
     print_summary(all_professors)
-    
+
     print("\n=== EXTRACTION COMPLETE ===")
     print(f"Total unique professors: {len(all_professors)}")
-    print(f"File created: faculty_professors.json")
+    print(f"File created: {args.output}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
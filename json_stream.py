@@ -0,0 +1,184 @@
+import gzip
+import io
+import json
+import re
+
+# --- Streaming JSON for the author_abstracts pipeline ---
+#
+# author_abstracts_*.json is one object whose large sections (author_names,
+# co_authors, author_abstracts) are maps keyed by author id. The reader walks
+# the top level and hands those sections out member by member, decoding one
+# value at a time with json's own raw_decode, so memory is bounded by the
+# largest single value rather than the file. The writer is the mirror image:
+# generators and StreamedDict values are written as they are produced.
+# Paths ending in .gz or .zst (requires the zstandard package) are
+# (de)compressed transparently.
+
+CHUNK_SIZE = 1 << 16
+STREAMED_SECTIONS = ('author_names', 'co_authors', 'author_abstracts')
+
+_decoder = json.JSONDecoder()
+_NON_WHITESPACE = re.compile(r'[^ \t\n\r]')
+
+def open_text(path, mode='r'):
+    """Opens a text file for 'r' or 'w', compressed according to its suffix."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f"Reading or writing {path} requires the zstandard package")
+        raw = open(path, mode + 'b')
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(raw)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+class _Reader:
+    """Buffered cursor over a text stream holding one JSON document."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, at_least=CHUNK_SIZE):
+        if self.eof:
+            return False
+        if self.pos >= CHUNK_SIZE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        data = self.stream.read(max(CHUNK_SIZE, at_least))
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at the end), without consuming it."""
+        while True:
+            match = _NON_WHITESPACE.search(self.buf, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value: read at least as much again and retry
+                if self.fill(len(self.buf) - self.pos):
+                    continue
+                raise
+            if end == len(self.buf) and self.fill():
+                continue  # A number may continue in the next chunk
+            self.pos = end
+            return value
+
+    def members(self):
+        """Yields (key, value) of the object starting at the cursor."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key, self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' but found {separator!r}")
+
+def iter_sections(path, streamed=STREAMED_SECTIONS):
+    """
+    Yields (key, value) for each top-level entry of a JSON object file.
+
+    Entries named in `streamed` whose value is an object are yielded as an
+    iterator of (key, value) members instead of a dict. Consume it before
+    advancing to the next section; anything left is skipped.
+    """
+    with open_text(path) as stream:
+        reader = _Reader(stream)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key in streamed and reader.peek() == '{':
+                members = reader.members()
+                yield key, members
+                for _ in members:
+                    pass
+            else:
+                yield key, reader.value()
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' but found {separator!r}")
+
+def iter_author_abstracts(path):
+    """Yields (author_id, papers) from an author_abstracts file."""
+    for key, value in iter_sections(path):
+        if key == 'author_abstracts':
+            yield from (value if not isinstance(value, dict) else value.items())
+
+class StreamedDict:
+    """An iterable of (key, value) pairs to be written as a JSON object."""
+
+    def __init__(self, items):
+        self.items = items
+
+def _is_streamed(value):
+    return isinstance(value, StreamedDict) or hasattr(value, '__next__')
+
+def _write(stream, value):
+    if isinstance(value, dict) and any(_is_streamed(v) for v in value.values()):
+        value = StreamedDict(value.items())
+    if isinstance(value, StreamedDict):
+        stream.write('{')
+        for i, (key, item) in enumerate(value.items):
+            stream.write((',\n' if i else '\n') + json.dumps(key, ensure_ascii=False) + ':')
+            _write(stream, item)
+        stream.write('\n}')
+    elif hasattr(value, '__next__'):
+        stream.write('[')
+        for i, item in enumerate(value):
+            stream.write(',\n' if i else '\n')
+            _write(stream, item)
+        stream.write('\n]')
+    else:
+        stream.write(json.dumps(value, ensure_ascii=False, separators=(',', ':')))
+
+def write_json(path, value):
+    """
+    Writes value as JSON, one member per line for streamed containers.
+
+    Generators (and other iterators) are written as arrays and StreamedDict
+    values as objects, pulling items only as they are written; plain dicts
+    holding such values are written member by member too.
+    """
+    with open_text(path, 'w') as stream:
+        _write(stream, value)
+        stream.write('\n')
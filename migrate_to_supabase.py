@@ -1,8 +1,8 @@
-import json
 import os
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import google.generativeai as genai
+from vector_store import load_records, text_key
 
 # Load environment variables
 load_dotenv('config.env')
@@ -20,128 +20,158 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 genai.configure(api_key=GOOGLE_API_KEY)
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def migrate_data():
-    """Migrate data from JSON file to Supabase"""
+def fetch_known_hashes(page_size=1000):
+    """
+    Collects the content hashes of chunks already in Supabase.
+
+    Only ids, hashes and author_ids are downloaded, never the texts. Rows
+    inserted before the content_hash column existed are hashed (and their
+    duplicates merged) by supabase_schema.sql before its unique index is
+    created; any row still without a hash is reported and ignored.
+
+    Returns:
+        dict: text_key digest -> {'id', 'author_ids'} of every stored chunk
+    """
+    known = {}
+    unhashed = 0
+    start = 0
+    while True:
+        response = supabase.table('embeddings').select('id, content_hash, author_ids').order('id').range(start, start + page_size - 1).execute()
+        for row in response.data:
+            if not row['content_hash']:
+                unhashed += 1
+                continue
+            known[row['content_hash']] = {'id': row['id'], 'author_ids': row['author_ids'] or []}
+        if len(response.data) < page_size:
+            if unhashed:
+                print(f"Warning: {unhashed} rows have no content_hash; run supabase_schema.sql to backfill them")
+            return known
+        start += page_size
+
+def update_author_ids(data, known_rows, item_text, item_author_ids):
+    """
+    Pushes author links added locally to chunks Supabase already has.
+
+    A chunk gains authors locally (add_author_id) without changing its
+    text, so its content hash alone cannot tell whether Supabase is current.
+    Remote author_ids are extended with the local ones, never shrunk.
+
+    Returns:
+        int: Number of rows updated
+    """
+    updated = 0
+    for i in range(len(data)):
+        remote = known_rows.get(text_key(item_text(i)))
+        if remote is None:
+            continue
+        missing = [author_id for author_id in item_author_ids(i) if author_id not in remote['author_ids']]
+        if not missing:
+            continue
+        try:
+            supabase.table('embeddings').update({
+                'author_ids': remote['author_ids'] + missing
+            }).eq('id', remote['id']).execute()
+            updated += 1
+        except Exception as e:
+            print(f"Failed to update authors of item {i}: {e}")
+    return updated
+
+def migrate_data(path=None):
+    """Migrate data from the local vector store (or legacy JSON file) to Supabase"""
     
-    # Check if vectorbig.json exists
-    json_file_path = 'static/vectorbig.json'
+    # Prefer the binary vector store, fall back to vectorbig.json
+    json_file_path = path or os.getenv('VECTOR_DB_PATH', 'static/vectorstore')
+    if not os.path.exists(json_file_path):
+        json_file_path = 'static/vectorbig.json'
     if not os.path.exists(json_file_path):
         print(f"Error: {json_file_path} not found!")
         return
     
-    # Load existing data
+    # Load existing data (store directories are memory-mapped, not parsed)
     print(f"Loading data from {json_file_path}...")
-    with open(json_file_path, 'r') as f:
-        data = json.load(f)
+    data = load_records(json_file_path)
     
     print(f"Found {len(data)} entries to migrate")
     
     # Check if embeddings table exists and has data
+    known_hashes = {}
     try:
         response = supabase.table('embeddings').select('id', count='exact').limit(1).execute()
         existing_count = response.count if response.count is not None else 0
         if existing_count > 0:
-            print(f"Warning: Table already contains {existing_count} entries")
-            response = input("Do you want to continue and add more data? (y/n): ")
-            if response.lower() != 'y':
-                print("Migration cancelled")
-                return
+            print(f"Table already contains {existing_count} entries, fetching their content hashes...")
+            known_hashes = fetch_known_hashes()
     except Exception as e:
         print(f"Error checking existing data: {e}")
-        print("Make sure you've created the embeddings table in Supabase first!")
+        print("Make sure you've created the embeddings table (with the content_hash column) in Supabase first!")
         return
     
+    # Texts and authors are read without decoding vectors where the store allows
+    if hasattr(data, 'text'):
+        item_text, item_author_ids = data.text, data.author_ids
+    else:
+        item_text = lambda i: data[i]['text']
+        item_author_ids = lambda i: data[i]['author_ids']
+
+    # Skip chunks Supabase already has, using the same digest as the local index
+    pending = [i for i in range(len(data)) if text_key(item_text(i)) not in known_hashes]
+    skipped = len(data) - len(pending)
+    if skipped:
+        print(f"Skipping {skipped} chunks already present in Supabase")
+        updated = update_author_ids(data, known_hashes, item_text, item_author_ids)
+        print(f"Updated author_ids of {updated} existing chunks")
+    
     # Insert data in batches
     batch_size = 50  # Smaller batch size for better reliability
     successful_inserts = 0
     
-    for i in range(0, len(data), batch_size):
-        batch = data[i:i + batch_size]
+    for i in range(0, len(pending), batch_size):
+        batch = [data[j] for j in pending[i:i + batch_size]]
         
         # Prepare batch for insertion
         insert_data = []
         for item in batch:
             insert_data.append({
                 'text': item['text'],
-                'embedding': item['vector'],
-                'author_ids': item['author_ids']
+                'embedding': [float(x) for x in item['vector']],
+                'author_ids': item['author_ids'],
+                'content_hash': text_key(item['text'])
             })
         
         try:
             response = supabase.table('embeddings').insert(insert_data).execute()
             successful_inserts += len(batch)
-            print(f"Inserted batch {i//batch_size + 1}/{(len(data) + batch_size - 1)//batch_size} ({successful_inserts}/{len(data)} total)")
+            print(f"Inserted batch {i//batch_size + 1}/{(len(pending) + batch_size - 1)//batch_size} ({successful_inserts}/{len(pending)} total)")
         except Exception as e:
             print(f"Error inserting batch {i//batch_size + 1}: {e}")
             # Try inserting one by one to identify problematic entries
-            for j, item in enumerate(batch):
+            for j, item in enumerate(insert_data):
                 try:
-                    supabase.table('embeddings').insert({
-                        'text': item['text'],
-                        'embedding': item['vector'],
-                        'author_ids': item['author_ids']
-                    }).execute()
+                    supabase.table('embeddings').insert(item).execute()
                     successful_inserts += 1
                 except Exception as e2:
-                    print(f"Failed to insert item {i + j}: {e2}")
+                    print(f"Failed to insert item {pending[i + j]}: {e2}")
     
-    print(f"\nMigration completed! Successfully inserted {successful_inserts}/{len(data)} entries")
+    print(f"\nMigration completed! Successfully inserted {successful_inserts}/{len(pending)} entries ({skipped} already present)")
     
     # Verify the migration
     try:
         response = supabase.table('embeddings').select('id', count='exact').execute()
         final_count = response.count if response.count is not None else 0
         print(f"Final database count: {final_count} entries")
+        print("Rebuild the vector index for the new data with: python pgvector_index.py rebuild")
     except Exception as e:
         print(f"Error verifying final count: {e}")
 
 def create_table_schema():
-    """Create the embeddings table schema in Supabase"""
-    print("""
+    """Show the SQL (from supabase_schema.sql) that creates the embeddings table and RPCs"""
+    schema_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'supabase_schema.sql')
+    with open(schema_path, 'r') as f:
+        schema_sql = f.read()
+    print(f"""
 To create the embeddings table in Supabase, run the following SQL in your Supabase SQL editor:
 
--- Enable the pgvector extension
-CREATE EXTENSION IF NOT EXISTS vector;
-
--- Create table for storing embeddings
-CREATE TABLE IF NOT EXISTS embeddings (
-    id SERIAL PRIMARY KEY,
-    text TEXT NOT NULL,
-    embedding vector(768), -- Adjust dimension based on your embedding model
-    author_ids TEXT[] NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
-
--- Create index for similarity search
-CREATE INDEX IF NOT EXISTS embeddings_embedding_idx ON embeddings USING ivfflat (embedding vector_cosine_ops);
-
--- Create function for similarity search
-CREATE OR REPLACE FUNCTION match_embeddings(
-    query_embedding vector(768),
-    match_threshold float,
-    match_count int
-)
-RETURNS TABLE (
-    id bigint,
-    text text,
-    author_ids text[],
-    similarity float
-)
-LANGUAGE plpgsql
-AS $$
-BEGIN
-    RETURN QUERY
-    SELECT
-        embeddings.id,
-        embeddings.text,
-        embeddings.author_ids,
-        1 - (embeddings.embedding <=> query_embedding) as similarity
-    FROM embeddings
-    WHERE 1 - (embeddings.embedding <=> query_embedding) > match_threshold
-    ORDER BY embeddings.embedding <=> query_embedding
-    LIMIT match_count;
-END;
-$$;
+{schema_sql}
 """)
 
 if __name__ == "__main__":
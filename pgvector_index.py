@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Lifecycle management for the pgvector index on the Supabase embeddings table.
+
+ivfflat chooses its centroids from the rows present when the index is built,
+so the index created by supabase_schema.sql on an empty table must be rebuilt
+after bulk loads (e.g. migrate_to_supabase.py). HNSW has no training step and
+can be used instead. `bench` measures recall@k against exact brute-force
+search and p50/p99 latency for a range of probes / ef_search values, so the
+search width is chosen from measurements rather than defaults. It measures
+at the API's match_count by default: HNSW returns at most ef_search rows, so
+the RPCs search at least match_count wide and bench does the same.
+
+With --precision half (pgvector 0.7+) a second index is built on the
+expression embedding::halfvec, about half the size, while the table keeps
+the full vectors; queries then go through match_embeddings_halfvec
+(VECTOR_PRECISION in vector_backends.py), optionally rescoring candidates at
+full precision. The full-precision index is kept alongside it, because
+match_embeddings, match_authors, two-stage reranking and the fallback when
+the halfvec RPC is missing all order by the vector column. Dropping it with
+--drop-full saves its memory, but those then scan the whole table.
+
+Connects with psycopg2 to DATABASE_URL (Supabase: Settings -> Database ->
+Connection string).
+
+Usage:
+  python pgvector_index.py status
+  python pgvector_index.py rebuild [--method ivfflat|hnsw] [--lists N] [--m 16] [--ef-construction 64] [--precision full|half [--drop-full]]
+  python pgvector_index.py bench [--probes 1,5,10,20] [--ef-search 200,400,800] [--k 200] [--queries 100] [--precision half --rescore 4]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from search_common import MATCH_COUNT
+
+INDEX_NAMES = {'full': 'embeddings_embedding_idx', 'half': 'embeddings_embedding_half_idx'}
+DEFAULT_HNSW_M = 16
+DEFAULT_HNSW_EF_CONSTRUCTION = 64
+EMBEDDING_DIM = 768  # Matches vector(768) in supabase_schema.sql
+HALF_EXPRESSION = f"embedding::halfvec({EMBEDDING_DIM})"
+
+def connect():
+    """Opens a psycopg2 connection to DATABASE_URL."""
+    import psycopg2
+    from dotenv import load_dotenv
+
+    if os.path.exists('config.env'):
+        load_dotenv('config.env')
+    url = os.getenv('DATABASE_URL')
+    if not url:
+        raise ValueError("DATABASE_URL not found in environment variables")
+    return psycopg2.connect(url)
+
+def default_ivfflat_lists(count):
+    """pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if count <= 1000000:
+        return max(1, count // 1000)
+    return int(round(np.sqrt(count)))
+
+def default_ivfflat_probes(lists):
+    """Starting point for ivfflat.probes; confirm with `bench`."""
+    return max(1, int(round(np.sqrt(lists))))
+
+def row_count(conn):
+    with conn.cursor() as cur:
+        cur.execute('SELECT COUNT(*) FROM embeddings')
+        return cur.fetchone()[0]
+
+def index_status(conn, precision='full'):
+    """Returns (definition, size) of a precision's vector index, or None if it is missing."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT pg_get_indexdef(c.oid), pg_size_pretty(pg_relation_size(c.oid)) "
+            "FROM pg_class c WHERE c.relname = %s AND c.relkind = 'i'",
+            (INDEX_NAMES[precision],)
+        )
+        return cur.fetchone()
+
+def rebuild_index(conn, method='ivfflat', lists=None, m=DEFAULT_HNSW_M,
+                  ef_construction=DEFAULT_HNSW_EF_CONSTRUCTION, maintenance_work_mem='512MB',
+                  precision='full', drop_full=False):
+    """
+    Drops and recreates one precision's vector index sized for the current
+    row count. The full and halfvec indexes have different names, so
+    rebuilding one leaves the other in place.
+
+    Args:
+        conn: psycopg2 connection
+        method (str): 'ivfflat' or 'hnsw'
+        lists (int): ivfflat lists (default: from the row count)
+        m (int): hnsw links per node
+        ef_construction (int): hnsw build-time candidate list size
+        maintenance_work_mem (str): Memory for the build; the build is much
+            faster when the index fits
+        precision (str): 'full' indexes the vector column, 'half' the
+            embedding::halfvec expression (half the size)
+        drop_full (bool): With 'half', also drop the full-precision index;
+            queries on the vector column then scan the table
+
+    Returns:
+        str: The CREATE INDEX statement that was run
+    """
+    count = row_count(conn)
+    if method == 'ivfflat':
+        lists = lists or default_ivfflat_lists(count)
+        options = f"lists = {int(lists)}"
+    elif method == 'hnsw':
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    else:
+        raise ValueError(f"Unknown index method: {method}")
+    if precision == 'half':
+        column = f"({HALF_EXPRESSION}) halfvec_cosine_ops"
+    elif precision == 'full':
+        column = "embedding vector_cosine_ops"
+    else:
+        raise ValueError(f"Unknown index precision: {precision}")
+    if drop_full and precision != 'half':
+        raise ValueError("drop_full only applies when building the halfvec index")
+    statement = (f"CREATE INDEX {INDEX_NAMES[precision]} ON embeddings "
+                 f"USING {method} ({column}) WITH ({options})")
+
+    with conn.cursor() as cur:
+        cur.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+        cur.execute(f"DROP INDEX IF EXISTS {INDEX_NAMES[precision]}")
+        started = time.perf_counter()
+        cur.execute(statement)
+        if drop_full:
+            cur.execute(f"DROP INDEX IF EXISTS {INDEX_NAMES['full']}")
+        cur.execute("ANALYZE embeddings")
+    conn.commit()
+    print(f"Built {precision}-precision {method} index over {count} rows in {time.perf_counter() - started:.1f}s")
+    status = index_status(conn, precision)
+    if status:
+        print(f"Index size: {status[1]}")
+    if drop_full:
+        print("Dropped the full-precision index: match_embeddings, match_authors and two-stage "
+              "reranking now scan the whole table.")
+    if method == 'ivfflat':
+        print(f"Suggested starting point: probes={default_ivfflat_probes(lists)} (measure with `bench`)")
+    return statement
+
+def sample_queries(conn, n_queries, seed=0):
+    """Samples stored embeddings to use as queries (pgvector text format)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT setseed(%s)", (seed / 2 ** 31,))
+        cur.execute("SELECT embedding::text FROM embeddings ORDER BY random() LIMIT %s", (n_queries,))
+        return [row[0] for row in cur.fetchall()]
+
+def top_k_sql(half=False, rescore_count=0):
+    """
+    Top-k query ordered the way the index is built, so the planner can use it.
+    With half and rescore_count, that many halfvec candidates are re-ranked at
+    full precision (as match_embeddings_halfvec does).
+    """
+    if not half:
+        return "SELECT id FROM embeddings ORDER BY embedding <=> %(query)s::vector LIMIT %(k)s"
+    half_order = f"{HALF_EXPRESSION} <=> %(query)s::vector::halfvec({EMBEDDING_DIM})"
+    if not rescore_count:
+        return f"SELECT id FROM embeddings ORDER BY {half_order} LIMIT %(k)s"
+    return (f"SELECT id FROM (SELECT id, embedding FROM embeddings ORDER BY {half_order} "
+            f"LIMIT %(candidates)s) c ORDER BY c.embedding <=> %(query)s::vector LIMIT %(k)s")
+
+def top_k_ids(conn, query, k, settings, half=False, rescore_count=0):
+    """Runs one top-k query with the given session settings; returns (ids, ms)."""
+    with conn.cursor() as cur:
+        for name, value in settings.items():
+            cur.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
+        started = time.perf_counter()
+        cur.execute(top_k_sql(half, rescore_count),
+                    {'query': query, 'k': k, 'candidates': max(k, rescore_count)})
+        ids = [row[0] for row in cur.fetchall()]
+        elapsed = (time.perf_counter() - started) * 1000
+    conn.rollback()  # set_config(..., true) lasts until the end of the transaction
+    return ids, elapsed
+
+def benchmark(conn, probes=(), ef_search=(), k=MATCH_COUNT, n_queries=100, target_recall=0.95, seed=0, rescore=0,
+              precision='full'):
+    """
+    Prints recall@k against brute force and p50/p99 latency per search width.
+
+    Ground truth disables index scans so the planner falls back to an exact
+    sequential scan at full precision, so the halfvec index's recall
+    (precision='half') includes the precision loss; with `rescore`, each
+    width is also measured with k * rescore candidates re-ranked at full
+    precision. Returns the narrowest
+    setting reaching `target_recall` as (name, value), or None.
+    """
+    status = index_status(conn, precision)
+    if status is None:
+        print(f"No {precision}-precision vector index found; run `rebuild --precision {precision}` first.")
+        return None
+    print(f"Index: {status[0]} ({status[1]})")
+    method = 'hnsw' if ' hnsw ' in status[0] else 'ivfflat'
+    half = precision == 'half'
+    if method == 'ivfflat':
+        name, values = 'ivfflat.probes', probes
+    else:
+        name, values = 'hnsw.ef_search', ef_search
+    if method == 'hnsw':
+        # As in the RPCs: ef_search below k would truncate the results
+        values = sorted({max(v, k) for v in values})
+
+    queries = sample_queries(conn, n_queries, seed)
+    exact_latencies = []
+    truth = []
+    for query in queries:
+        ids, elapsed = top_k_ids(conn, query, k, {'enable_indexscan': 'off'})
+        truth.append(set(ids))
+        exact_latencies.append(elapsed)
+    print(f"{len(queries)} queries, recall@{k}")
+    print(f"  exact            recall=1.000 p50={np.percentile(exact_latencies, 50):7.2f}ms "
+          f"p99={np.percentile(exact_latencies, 99):7.2f}ms")
+
+    chosen = None
+    variants = [0, k * rescore] if half and rescore else [0]
+    for value in values:
+        for rescore_count in variants:
+            latencies = []
+            hits = 0
+            # match_embeddings_halfvec also widens ef_search to the rescored candidates
+            setting = max(value, rescore_count) if method == 'hnsw' else value
+            for query, expected in zip(queries, truth):
+                ids, elapsed = top_k_ids(conn, query, k, {name: setting}, half, rescore_count)
+                latencies.append(elapsed)
+                hits += len(expected & set(ids))
+            recall = hits / max(1, sum(len(expected) for expected in truth))
+            label = f"{name}={value}" + (f" rescore={rescore_count}" if rescore_count else '')
+            print(f"  {label:<16} recall={recall:.3f} p50={np.percentile(latencies, 50):7.2f}ms "
+                  f"p99={np.percentile(latencies, 99):7.2f}ms")
+            if chosen is None and recall >= target_recall:
+                chosen = (name, value)
+    if chosen:
+        print(f"Narrowest setting with recall >= {target_recall}: {chosen[0]}={chosen[1]} "
+              f"(set PGVECTOR_{'PROBES' if method == 'ivfflat' else 'EF_SEARCH'}={chosen[1]} for the API)")
+    else:
+        print(f"No tested setting reached recall {target_recall}; try wider values or rebuild the index.")
+    return chosen
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the pgvector index on the embeddings table')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('status', help='Show the current indexes and row count')
+
+    rebuild_parser = subparsers.add_parser('rebuild', help='Recreate the index sized for the current data')
+    rebuild_parser.add_argument('--method', choices=['ivfflat', 'hnsw'], default='ivfflat')
+    rebuild_parser.add_argument('--lists', type=int, default=None, help='ivfflat lists (default: from row count)')
+    rebuild_parser.add_argument('--m', type=int, default=DEFAULT_HNSW_M)
+    rebuild_parser.add_argument('--ef-construction', type=int, default=DEFAULT_HNSW_EF_CONSTRUCTION)
+    rebuild_parser.add_argument('--maintenance-work-mem', default='512MB')
+    rebuild_parser.add_argument('--precision', choices=['full', 'half'], default='full',
+                                help='half indexes embedding::halfvec (pgvector 0.7+), next to the full index')
+    rebuild_parser.add_argument('--drop-full', action='store_true',
+                                help='With --precision half, drop the full-precision index (full-precision RPCs then scan the table)')
+
+    bench_parser = subparsers.add_parser('bench', help='Measure recall@k and latency against brute force')
+    bench_parser.add_argument('--probes', default='1,2,5,10,20,40')
+    bench_parser.add_argument('--ef-search', default='200,300,400,800')
+    bench_parser.add_argument('--k', type=int, default=MATCH_COUNT,
+                              help='Results per query (default: the API match_count)')
+    bench_parser.add_argument('--queries', type=int, default=100)
+    bench_parser.add_argument('--target-recall', type=float, default=0.95)
+    bench_parser.add_argument('--rescore', type=int, default=0,
+                              help='With --precision half, also measure k * N candidates rescored at full precision')
+    bench_parser.add_argument('--precision', choices=['full', 'half'], default='full',
+                              help='Which index to measure')
+
+    args = parser.parse_args()
+    conn = connect()
+    try:
+        if args.command == 'status':
+            print(f"Rows: {row_count(conn)}")
+            for precision in INDEX_NAMES:
+                status = index_status(conn, precision)
+                print(f"{precision.capitalize()} index: {status[0]} ({status[1]})" if status
+                      else f"{precision.capitalize()} index: none")
+        elif args.command == 'rebuild':
+            rebuild_index(conn, args.method, args.lists, args.m, args.ef_construction,
+                          args.maintenance_work_mem, args.precision, args.drop_full)
+        elif args.command == 'bench':
+            benchmark(conn,
+                      [int(v) for v in args.probes.split(',')],
+                      [int(v) for v in args.ef_search.split(',')],
+                      args.k, args.queries, args.target_recall, rescore=args.rescore,
+                      precision=args.precision)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
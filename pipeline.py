@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+End-to-end data build as a DAG of cached stages.
+
+  merge ─┬─ graph                      (compact graph + author detail store)
+         └─ embed ─┬─ ann_index        (IVF index of the local store)
+                   ├─ author_index     (author profiles for two-stage search)
+                   └─ supabase         (optional: migrate + refresh profiles)
+
+Every stage is keyed by its parameters, the digests of the artifacts it
+depends on and the contents of its input files. Outputs go to a directory
+under .pipeline/artifacts named after that key, so a stage whose key already
+has a complete artifact is skipped. A stage that reruns but produces
+identical output leaves its dependents cached. Stages that write outside the
+artifact directory (the vector store, Supabase) record the state they left
+behind and rerun if it no longer matches. Independent stages run in
+parallel, and each run writes a timing/size report to .pipeline/reports.
+
+Usage:
+  python pipeline.py run [--inputs 'nicolasdata/author_abstracts*.json'] [--store static/vectorstore]
+                         [--only graph,embed] [--supabase] [--force merge,...] [--jobs 4]
+  python pipeline.py status [same options]   # which stages would run
+  python pipeline.py report                  # the last run's report
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+PIPELINE_DIR = '.pipeline'
+ARTIFACTS_DIR = 'artifacts'
+REPORTS_DIR = 'reports'
+STATE_FILE = 'state.json'
+ARTIFACT_FILE = 'artifact.json'
+KEEP_ARTIFACTS = 3  # Per stage, including the current one
+
+DEFAULT_INPUTS = ['nicolasdata/author_abstracts*.json']
+DEFAULT_STORE = 'static/vectorstore'
+DEFAULT_STATIC_DIR = 'static'
+
+MERGED_ARTIFACT = 'author_abstracts.json'
+GRAPH_ARTIFACT = 'forcegraph_graph_3.json'
+DETAILS_ARTIFACT = 'author_details.sqlite3'
+
+# --- Artifacts ---
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_artifact(artifact_dir):
+    """The artifact's manifest, or None if it is missing or incomplete."""
+    try:
+        with open(os.path.join(artifact_dir, ARTIFACT_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_artifact(artifact_dir, stage, key, seconds):
+    """Hashes every file a stage wrote and records them; written last, so its presence marks completion."""
+    files = {}
+    for root, _, names in os.walk(artifact_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, artifact_dir)] = {'sha256': file_digest(path), 'size': os.path.getsize(path)}
+    digest = hashlib.sha256(json.dumps(
+        {path: entry['sha256'] for path, entry in files.items()}, sort_keys=True).encode()).hexdigest()
+    artifact = {'stage': stage, 'key': key, 'digest': digest, 'files': files,
+                'seconds': round(seconds, 3), 'created': time.time()}
+    with open(os.path.join(artifact_dir, ARTIFACT_FILE), 'w') as f:
+        json.dump(artifact, f, indent=2)
+    return artifact
+
+def write_state(artifact_dir, name, state):
+    with open(os.path.join(artifact_dir, name), 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+def read_state(artifact_dir, name):
+    with open(os.path.join(artifact_dir, name), 'r') as f:
+        return json.load(f)
+
+def publish_file(source, destination):
+    """Copies an artifact file to where it is served, atomically and only if it differs."""
+    if os.path.exists(destination) and file_digest(destination) == file_digest(source):
+        return False
+    os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+    tmp_path = f"{destination}.tmp-{os.getpid()}"
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+    return True
+
+def prune_artifacts(artifacts_dir, current, keep=KEEP_ARTIFACTS):
+    """Keeps the `keep` newest artifacts of each stage, always including the current ones."""
+    by_stage = {}
+    for name in os.listdir(artifacts_dir):
+        artifact = read_artifact(os.path.join(artifacts_dir, name))
+        if artifact is not None:
+            by_stage.setdefault(artifact['stage'], []).append((artifact['created'], name))
+    for stage, entries in by_stage.items():
+        entries.sort(reverse=True)
+        kept = {current.get(stage)} | {name for _, name in entries[:keep - 1]}
+        for _, name in entries:
+            if name not in kept:
+                shutil.rmtree(os.path.join(artifacts_dir, name), ignore_errors=True)
+
+# --- Stages ---
+
+class Stage:
+    """
+    One step of the build.
+
+    Args:
+        name (str): Stage name
+        run (callable): (ctx, out_dir, dep_dirs) -> None; writes the outputs
+            to out_dir. dep_dirs maps each dependency to its artifact directory.
+        deps (tuple[str]): Stages whose artifacts this one reads
+        inputs (callable): ctx -> list of source files the stage reads
+        params (callable): ctx -> JSON-able settings that change the output
+        check (callable): (ctx, artifact_dir) -> bool; False if state outside
+            the artifact has drifted and the stage must rerun
+        publish (callable): (ctx, artifact_dir) -> None; installs the outputs,
+            also when the artifact was cached
+        version (int): Bump when the stage's code changes its output
+    """
+
+    def __init__(self, name, run, deps=(), inputs=None, params=None, check=None, publish=None, version=1):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.inputs = inputs
+        self.params = params
+        self.check = check
+        self.publish = publish
+        self.version = version
+
+def store_state(store_path):
+    """What the embed stage left behind: the store's base segment and row count."""
+    from vector_store import VectorStore, is_store
+
+    if not is_store(store_path):
+        return None
+    store = VectorStore.open(store_path)
+    try:
+        return {'base': store.base_name, 'count': len(store)}
+    finally:
+        store.close()
+
+def run_merge(ctx, out_dir, deps):
+    from datascripts.merge_and_update import load_partials, prune_partials, reduce_partials
+
+    cache_dir = os.path.join(ctx.pipeline_dir, 'merge_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    files = ctx.input_files()
+    digests = ctx.digests(files)
+    merged = reduce_partials(load_partials(files, digests, cache_dir, ctx.jobs))
+    prune_partials(cache_dir, digests)
+    merged['summary'] = {
+        'total_authors': len(merged['author_names']),
+        'input_authors_count': len(merged['input_authors']),
+        'direct_co_authors_count': len(merged['author_levels'].get('direct_co_authors', [])),
+        'second_level_co_authors_count': len(merged['author_levels'].get('second_level_co_authors', [])),
+        'authors_with_abstracts': sum(1 for papers in merged['author_abstracts'].values() if papers),
+        'total_abstracts': sum(len(papers) for papers in merged['author_abstracts'].values())
+    }
+    with open(os.path.join(out_dir, MERGED_ARTIFACT), 'w') as f:
+        json.dump(merged, f, separators=(',', ':'), ensure_ascii=False)
+
+def run_graph(ctx, out_dir, deps):
+    from convert_author_abstracts_4_to_graph import convert_author_abstracts_4_to_graph
+
+    convert_author_abstracts_4_to_graph(os.path.join(deps['merge'], MERGED_ARTIFACT),
+                                        os.path.join(out_dir, GRAPH_ARTIFACT),
+                                        os.path.join(out_dir, DETAILS_ARTIFACT))
+
+def publish_graph(ctx, artifact_dir):
+    for name in os.listdir(artifact_dir):
+        if name.startswith(GRAPH_ARTIFACT):
+            publish_file(os.path.join(artifact_dir, name), os.path.join(ctx.static_dir, name))
+    publish_file(os.path.join(artifact_dir, DETAILS_ARTIFACT), ctx.details_path)
+
+def run_embed(ctx, out_dir, deps):
+    from embedding_database import process_author_abstracts
+    from vector_store import VectorStore, is_store
+
+    store = VectorStore.open(ctx.store) if is_store(ctx.store) else VectorStore.create(ctx.store)
+    try:
+        stats = process_author_abstracts(os.path.join(deps['merge'], MERGED_ARTIFACT), store)
+        if store.base_count < len(store):
+            # Compact here so the index stages read (and record) a settled base segment
+            store.compact()
+    finally:
+        store.close()
+    if stats is None or stats['failed']:
+        # No artifact is recorded, so the next run retries the missing chunks
+        raise RuntimeError(f"Embedding incomplete: {stats}")
+    write_state(out_dir, 'store.json', store_state(ctx.store))
+
+def check_embed(ctx, artifact_dir):
+    return read_state(artifact_dir, 'store.json') == store_state(ctx.store)
+
+def run_ann_index(ctx, out_dir, deps):
+    from ann_index import build_store_index
+
+    index = build_store_index(ctx.store)
+    write_state(out_dir, 'ann_index.json', {'store': read_state(deps['embed'], 'store.json'),
+                                            'lists': index.n_lists})
+
+def check_ann_index(ctx, artifact_dir):
+    """The index on disk loads and covers the store state it was built from."""
+    from ann_index import INDEX_DIR, IVFIndex
+
+    try:
+        index = IVFIndex.load(os.path.join(ctx.store, INDEX_DIR))
+    except (OSError, ValueError, KeyError):
+        return False
+    store = read_state(artifact_dir, 'ann_index.json')['store']
+    return len(index) == store['count'] and index.meta.get('base') == store['base']
+
+def run_author_index(ctx, out_dir, deps):
+    from author_index import build_author_index
+
+    index = build_author_index(ctx.store, incremental=True)
+    write_state(out_dir, 'author_index.json', {'store': read_state(deps['embed'], 'store.json'),
+                                               'authors': len(index)})
+
+def check_author_index(ctx, artifact_dir):
+    """The profiles on disk load and cover the store state they were built from."""
+    from author_index import AUTHOR_INDEX_DIR, AuthorIndex
+
+    try:
+        index = AuthorIndex.load(os.path.join(ctx.store, AUTHOR_INDEX_DIR))
+    except (OSError, ValueError, KeyError):
+        return False
+    return index.indexed_count == read_state(artifact_dir, 'author_index.json')['store']['count']
+
+def run_supabase(ctx, out_dir, deps):
+    from migrate_to_supabase import migrate_data
+    from author_index import refresh_supabase_profiles
+
+    migrate_data(ctx.store)
+    refresh_supabase_profiles()
+    write_state(out_dir, 'supabase.json', {'store': read_state(deps['embed'], 'store.json')})
+
+STAGES = [
+    Stage('merge', run_merge, inputs=lambda ctx: ctx.input_files()),
+    Stage('graph', run_graph, deps=['merge'], publish=publish_graph),
+    Stage('embed', run_embed, deps=['merge'], check=check_embed,
+          params=lambda ctx: {'store': os.path.abspath(ctx.store)}),
+    Stage('ann_index', run_ann_index, deps=['embed'], check=check_ann_index),
+    Stage('author_index', run_author_index, deps=['embed'], check=check_author_index),
+    Stage('supabase', run_supabase, deps=['embed']),
+]
+
+def select_stages(only=None, supabase=False):
+    """The requested stages plus everything they depend on, in definition order."""
+    by_name = {stage.name: stage for stage in STAGES}
+    wanted = set(only or [stage.name for stage in STAGES if stage.name != 'supabase' or supabase])
+    unknown = wanted - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+    pending = list(wanted)
+    while pending:
+        for dep in by_name[pending.pop()].deps:
+            if dep not in wanted:
+                wanted.add(dep)
+                pending.append(dep)
+    return [stage for stage in STAGES if stage.name in wanted]
+
+# --- Runner ---
+
+class PipelineContext:
+    """Settings shared by the stages, plus the cache of input file digests."""
+
+    def __init__(self, inputs=None, store=DEFAULT_STORE, static_dir=DEFAULT_STATIC_DIR,
+                 details_path=None, jobs=None, pipeline_dir=PIPELINE_DIR):
+        from author_details import DEFAULT_DETAILS_PATH
+
+        self.inputs = inputs or DEFAULT_INPUTS
+        self.store = store
+        self.static_dir = static_dir
+        self.details_path = details_path or os.getenv('AUTHOR_DETAILS_PATH', DEFAULT_DETAILS_PATH)
+        self.jobs = jobs
+        self.pipeline_dir = pipeline_dir
+        self.artifacts_dir = os.path.join(pipeline_dir, ARTIFACTS_DIR)
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        try:
+            with open(os.path.join(pipeline_dir, STATE_FILE), 'r') as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {'files': {}}
+
+    def input_files(self):
+        """Source files matched by the input patterns, sorted (merge order)."""
+        return sorted({path for pattern in self.inputs for path in glob.glob(pattern)})
+
+    def digests(self, paths):
+        """Content hash per file; unchanged size and mtime reuse the recorded hash."""
+        from datascripts.merge_and_update import input_digests
+
+        with self.lock:
+            return input_digests(paths, self.state)
+
+    def save_state(self):
+        with self.lock:
+            path = os.path.join(self.pipeline_dir, STATE_FILE)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(path + '.tmp', path)
+
+def stage_key(stage, ctx, dep_artifacts, input_digests):
+    payload = {
+        'stage': stage.name,
+        'version': stage.version,
+        'params': stage.params(ctx) if stage.params else None,
+        'deps': {dep: artifact['digest'] for dep, artifact in dep_artifacts.items()},
+        'inputs': input_digests
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def execute_stage(stage, ctx, dep_results, force=False, dry_run=False):
+    """
+    Runs one stage unless its artifact is cached.
+
+    Returns:
+        dict: status ('cached', 'ran', 'stale' on a dry run, or 'failed'),
+        seconds, and the artifact's directory, digest and size
+    """
+    started = time.perf_counter()
+    try:
+        input_digests = ctx.digests(stage.inputs(ctx)) if stage.inputs else {}
+        dep_artifacts = {dep: result['artifact'] for dep, result in dep_results.items()}
+        key = stage_key(stage, ctx, dep_artifacts, input_digests)
+        artifact_dir = os.path.join(ctx.artifacts_dir, f"{stage.name}-{key[:16]}")
+        artifact = read_artifact(artifact_dir)
+        cached = (artifact is not None and not force and
+                  (stage.check is None or stage.check(ctx, artifact_dir)))
+        if dry_run:
+            return {'status': 'cached' if cached else 'stale', 'key': key, 'path': artifact_dir,
+                    'artifact': artifact if cached else None, 'seconds': 0.0}
+        if cached:
+            status = 'cached'
+        else:
+            print(f"\n=== {stage.name} ===")
+            tmp_dir = f"{artifact_dir}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            try:
+                stage.run(ctx, tmp_dir, {dep: result['path'] for dep, result in dep_results.items()})
+                artifact = write_artifact(tmp_dir, stage.name, key, time.perf_counter() - started)
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+            shutil.rmtree(artifact_dir, ignore_errors=True)
+            os.replace(tmp_dir, artifact_dir)
+            status = 'ran'
+        if stage.publish:
+            stage.publish(ctx, artifact_dir)
+        return {'status': status, 'key': key, 'path': artifact_dir, 'artifact': artifact,
+                'seconds': time.perf_counter() - started}
+    except Exception as e:
+        traceback.print_exc()
+        return {'status': 'failed', 'error': str(e), 'seconds': time.perf_counter() - started}
+
+def run_pipeline(stages, ctx, jobs=4, force=(), dry_run=False):
+    """
+    Runs stages as their dependencies complete, up to `jobs` at a time.
+
+    A failed stage's dependents are skipped; independent stages still run.
+    On a dry run, dependents of a stale stage are reported stale too.
+
+    Returns:
+        dict: stage name -> result (see execute_stage)
+    """
+    results = {}
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(dep in pending or dep in running.values() for dep in stage.deps):
+                    continue
+                del pending[name]
+                dep_results = {dep: results[dep] for dep in stage.deps}
+                blocked = [dep for dep, result in dep_results.items() if result['status'] not in ('cached', 'ran')]
+                if blocked:
+                    status = 'stale' if dry_run and all(dep_results[dep]['status'] == 'stale' for dep in blocked) else 'skipped'
+                    results[name] = {'status': status, 'seconds': 0.0, 'error': f"waiting on {', '.join(blocked)}"}
+                    continue
+                running[executor.submit(execute_stage, stage, ctx, dep_results, name in force, dry_run)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    ctx.save_state()
+    return results
+
+def build_report(results, total_seconds):
+    stages = {}
+    for name, result in results.items():
+        artifact = result.get('artifact')
+        stages[name] = {
+            'status': result['status'],
+            'seconds': round(result['seconds'], 3),
+            'artifact': os.path.basename(result['path']) if artifact else None,
+            'files': len(artifact['files']) if artifact else 0,
+            'bytes': sum(entry['size'] for entry in artifact['files'].values()) if artifact else 0,
+            'error': result.get('error')
+        }
+    return {'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seconds': round(total_seconds, 3), 'stages': stages}
+
+def print_report(report):
+    print(f"\n{'stage':<14} {'status':<8} {'seconds':>9} {'size':>11}  artifact")
+    for name, stage in report['stages'].items():
+        size = f"{stage['bytes'] / 1024:.1f} KB" if stage['bytes'] else '-'
+        detail = stage['artifact'] or stage['error'] or ''
+        print(f"{name:<14} {stage['status']:<8} {stage['seconds']:>9.2f} {size:>11}  {detail}")
+    print(f"Total: {report['seconds']:.2f}s")
+
+def save_report(ctx, report):
+    reports_dir = os.path.join(ctx.pipeline_dir, REPORTS_DIR)
+    os.makedirs(reports_dir, exist_ok=True)
+    path = os.path.join(reports_dir, f"run-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    for target in (path, os.path.join(reports_dir, 'last.json')):
+        with open(target, 'w') as f:
+            json.dump(report, f, indent=2)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the search and graph data from author_abstracts files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('run', 'Run the stages whose inputs changed'),
+                               ('status', 'Show which stages would run')):
+        command_parser = subparsers.add_parser(command, help=help_text)
+        command_parser.add_argument('--inputs', nargs='+', default=None,
+                                    help=f"Input file patterns (default: {' '.join(DEFAULT_INPUTS)})")
+        command_parser.add_argument('--store', default=DEFAULT_STORE, help='Local vector store to embed into')
+        command_parser.add_argument('--static-dir', default=DEFAULT_STATIC_DIR, help='Where the graph is published')
+        command_parser.add_argument('--details-path', default=None, help='Where the author detail store is published')
+        command_parser.add_argument('--only', default=None, help='Comma-separated stages (dependencies are added)')
+        command_parser.add_argument('--supabase', action='store_true', help='Also migrate to Supabase')
+        command_parser.add_argument('--force', default='', help='Comma-separated stages to rerun regardless of cache')
+        command_parser.add_argument('--jobs', type=int, default=4, help='Stages run in parallel')
+    subparsers.add_parser('report', help="Print the last run's report")
+    args = parser.parse_args()
+
+    if args.command == 'report':
+        try:
+            with open(os.path.join(PIPELINE_DIR, REPORTS_DIR, 'last.json'), 'r') as f:
+                print_report(json.load(f))
+        except OSError:
+            print("No pipeline run recorded yet.")
+        return
+
+    stages = select_stages(args.only.split(',') if args.only else None, args.supabase)
+    ctx = PipelineContext(args.inputs, args.store, args.static_dir, args.details_path, jobs=None)
+    if not ctx.input_files():
+        print(f"No input files match {' '.join(ctx.inputs)}")
+        sys.exit(1)
+    started = time.perf_counter()
+    results = run_pipeline(stages, ctx, args.jobs, set(filter(None, args.force.split(','))),
+                           dry_run=args.command == 'status')
+    report = build_report(results, time.perf_counter() - started)
+    print_report(report)
+    if args.command == 'run':
+        print(f"Report saved to {save_report(ctx, report)}")
+        prune_artifacts(ctx.artifacts_dir, {name: os.path.basename(result['path'])
+                                            for name, result in results.items() if result.get('artifact')})
+    if any(result['status'] in ('failed', 'skipped') for result in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Reduced-precision vectors for in-process search.
+
+The search structures (the exact engine's matrix and the IVF index's list
+vectors) hold every vector a second time, normalized, and are what the
+process keeps resident. They can be stored as:
+  - float32 : 4 bytes per dimension (default)
+  - float16 : 2 bytes per dimension
+  - int8    : 1 byte per dimension plus one float32 scale per row
+              (symmetric scalar quantization of the normalized row)
+Scores are computed block by block in float32, so the only extra memory per
+query is one block. The store's own float32 vectors stay on disk and
+memory-mapped, and can rescore the top `top_k * rescore` candidates exactly.
+
+`report` measures what the precision costs in recall@k, with and without
+rescoring, and how much memory it saves against float32.
+
+Usage:
+  python quantization.py report --store static/vectorstore [--k 10] [--queries 200] [--rescore 4] [--nprobe 8]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from vector_search import normalize_rows, top_k_indices, VectorSearchEngine
+
+PRECISIONS = ('float32', 'float16', 'int8')
+BLOCK_ROWS = 512  # Rows converted to float32 at a time; small enough to stay in cache
+
+class QuantizedMatrix:
+    """
+    Normalized rows in float16 or int8 that score like a float32 matrix.
+
+    Supports the parts of the ndarray interface the search code uses:
+    `shape`, `nbytes`, row slicing / fancy indexing, and `matrix @ query`.
+    """
+
+    def __init__(self, codes, scales=None):
+        """
+        Args:
+            codes (np.ndarray): float16 rows, or int8 rows
+            scales (np.ndarray): float32 scale per row, for int8 codes
+        """
+        self.codes = codes
+        self.scales = scales
+
+    @property
+    def precision(self):
+        return 'int8' if self.scales is not None else str(self.codes.dtype)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def __getitem__(self, index):
+        return QuantizedMatrix(self.codes[index], self.scales[index] if self.scales is not None else None)
+
+    def __matmul__(self, query):
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), BLOCK_ROWS):
+            end = start + BLOCK_ROWS
+            scores[start:end] = self.codes[start:end].astype(np.float32) @ query
+            if self.scales is not None:
+                scores[start:end] *= self.scales[start:end]
+        return scores
+
+def quantize_rows(vectors, precision, normalize=True):
+    """
+    Encodes rows in a precision, a block at a time.
+
+    Args:
+        vectors: array-like of shape (n, dim), e.g. a memory-mapped store
+        precision (str): One of PRECISIONS
+        normalize (bool): L2-normalize each row first (cosine search)
+
+    Returns:
+        np.ndarray | QuantizedMatrix: float32 rows for 'float32', else the
+            quantized rows
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}; choose from {', '.join(PRECISIONS)}")
+    vectors = vectors if hasattr(vectors, 'shape') else np.asarray(vectors, dtype=np.float32)
+    count = vectors.shape[0]
+    dim = vectors.shape[1] if vectors.ndim == 2 else 0
+    dtype = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}[precision]
+    codes = np.empty((count, dim), dtype=dtype)
+    scales = np.empty(count, dtype=np.float32) if precision == 'int8' else None
+    for start in range(0, count, BLOCK_ROWS):
+        block = np.array(vectors[start:start + BLOCK_ROWS], dtype=np.float32, copy=True)
+        if normalize:
+            normalize_rows(block)
+        if precision == 'int8':
+            scale = np.abs(block).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            codes[start:start + BLOCK_ROWS] = np.rint(block / scale[:, None])
+            scales[start:start + BLOCK_ROWS] = scale
+        else:
+            codes[start:start + BLOCK_ROWS] = block
+    if precision == 'float32':
+        return codes
+    return QuantizedMatrix(codes, scales)
+
+def matrix_precision(matrix):
+    """The precision of a search matrix (ndarray or QuantizedMatrix)."""
+    return getattr(matrix, 'precision', 'float32')
+
+def exact_rows(source, ids):
+    """float32 rows of a store matrix or list of vectors, for rescoring."""
+    if hasattr(source, 'shape'):
+        return np.asarray(source[ids], dtype=np.float32)
+    return np.asarray([source[i] for i in ids], dtype=np.float32)
+
+def rescore(candidate_ids, query, source, top_k):
+    """
+    Re-ranks candidates by exact float32 cosine similarity.
+
+    Args:
+        candidate_ids (np.ndarray): Row ids from an approximate search
+        query (np.ndarray): Normalized float32 query
+        source: Full-precision vectors, indexable by row id
+        top_k (int): Number of results to keep
+
+    Returns:
+        list[tuple[int, float]]: (row id, similarity) pairs, best first
+    """
+    candidate_ids = np.asarray(candidate_ids, dtype=np.int64)
+    if candidate_ids.size == 0:
+        return []
+    rows = exact_rows(source, candidate_ids)
+    norms = np.linalg.norm(rows, axis=1)
+    norms[norms == 0] = 1.0
+    scores = (rows @ query) / norms
+    best = top_k_indices(scores, top_k)
+    return [(int(candidate_ids[i]), float(scores[i])) for i in best]
+
+# --- Report ---
+
+def recall(results, truth):
+    hits = sum(len(expected & {i for i, _ in found}) for found, expected in zip(results, truth))
+    return hits / max(1, sum(len(expected) for expected in truth))
+
+def measure(search, queries):
+    """Runs search over every query; returns (results, p50 ms)."""
+    results = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, float(np.percentile(latencies, 50))
+
+def report(store_path, top_k=10, n_queries=200, rescore_factor=4, nprobe=None, seed=0):
+    """
+    Prints recall@k against float32 exact search and memory per precision,
+    for the exact engine and (if the store has one) the IVF index.
+
+    Returns:
+        list[dict]: One row per (structure, precision) with the figures printed
+    """
+    from ann_index import IVFIndex, INDEX_DIR, DEFAULT_NPROBE
+    from vector_store import VectorStore
+
+    store = VectorStore.open(store_path)
+    vectors = store.vectors
+    if not len(store):
+        print("Store is empty.")
+        return []
+    rng = np.random.default_rng(seed)
+    queries = np.asarray(vectors[rng.choice(len(store), min(n_queries, len(store)), replace=False)],
+                         dtype=np.float32)
+    print(f"{len(store)} vectors x {store.dim} dims, {len(queries)} queries, recall@{top_k} "
+          f"against float32 exact search; rescoring {top_k * rescore_factor} candidates")
+
+    baseline = VectorSearchEngine(vectors)
+    truth = [{i for i, _ in baseline.search(query, top_k)} for query in queries]
+    rows = []
+
+    def add_row(structure, precision, nbytes, full_bytes, searcher):
+        found, p50 = measure(lambda q: searcher(q, 0), queries)
+        row = {'structure': structure, 'precision': precision, 'bytes': int(nbytes),
+               'saved': 1 - nbytes / full_bytes, 'recall': recall(found, truth), 'p50_ms': p50}
+        if precision != 'float32' and rescore_factor:
+            found, row['rescored_p50_ms'] = measure(lambda q: searcher(q, rescore_factor), queries)
+            row['rescored_recall'] = recall(found, truth)
+        rows.append(row)
+        rescored = (f" rescored={row['rescored_recall']:.3f} ({row['rescored_p50_ms']:.2f}ms)"
+                    if 'rescored_recall' in row else '')
+        print(f"  {structure:<6} {precision:<8} {row['bytes'] / 2 ** 20:9.1f} MB "
+              f"saved={row['saved']:6.1%} recall={row['recall']:.3f} p50={p50:.2f}ms{rescored}")
+
+    full_bytes = baseline.matrix.nbytes
+    for precision in PRECISIONS:
+        engine = baseline if precision == 'float32' else VectorSearchEngine(vectors, precision=precision)
+        add_row('exact', precision, engine.matrix.nbytes, full_bytes,
+                lambda q, factor, engine=engine: engine.search(q, top_k, rescore=factor))
+
+    index_path = os.path.join(store_path, INDEX_DIR)
+    if os.path.isdir(index_path):
+        saved = IVFIndex.load(index_path)
+        list_vectors = saved.list_vectors
+        if matrix_precision(list_vectors) != 'float32':
+            # Start from the stored full-precision rows, in list order
+            list_vectors = normalize_rows(np.asarray(vectors[np.asarray(saved.list_ids)], dtype=np.float32))
+        nprobe = nprobe or DEFAULT_NPROBE
+        full_bytes = list_vectors.nbytes
+        for precision in PRECISIONS:
+            index = IVFIndex(saved.centroids, saved.list_offsets, saved.list_ids,
+                             quantize_rows(list_vectors, precision, normalize=False))
+            add_row(f"ivf{nprobe}", precision, index.list_vectors.nbytes, full_bytes,
+                    lambda q, factor, index=index: index.search(q, top_k, nprobe, vectors, factor))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Reduced-precision vector search utilities')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = subparsers.add_parser('report', help='Recall@k and memory per precision')
+    report_parser.add_argument('--store', required=True, help='Vector store directory')
+    report_parser.add_argument('--k', type=int, default=10)
+    report_parser.add_argument('--queries', type=int, default=200)
+    report_parser.add_argument('--rescore', type=int, default=4,
+                               help='Candidates rescored in float32, as a multiple of k (0: off)')
+    report_parser.add_argument('--nprobe', type=int, default=None, help='IVF lists scanned (default: ANN default)')
+
+    args = parser.parse_args()
+    if args.command == 'report':
+        report(args.store, args.k, args.queries, args.rescore, args.nprobe)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# --- Result caching for the API ---
+#
+# TTLCache is a thread-safe in-process LRU with per-entry expiry. ResultCache
+# layers an optional shared backend (e.g. Redis, so serverless instances share
+# entries) on top and folds a data version into every key, so entries computed
+# against an older embeddings table are never served.
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire `ttl` seconds after being set."""
+
+    def __init__(self, max_entries=1000, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the cached value, or None if missing or expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl
+        }
+
+class RedisBackend:
+    """Shared cache backend storing JSON values in Redis with a TTL."""
+
+    def __init__(self, url, prefix='search:'):
+        import redis  # Optional dependency, only needed for a shared cache
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl))
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a search query."""
+    return ' '.join(query.lower().split())
+
+class ResultCache:
+    """
+    Caches JSON-serializable results keyed on a normalized query, its
+    parameters, and the current data version.
+
+    Args:
+        local (TTLCache): In-process cache
+        shared: Optional backend with get(key) / set(key, value, ttl)
+        version_fn (callable): Returns a token that changes whenever the
+            underlying data changes; checked at most every
+            `version_check_interval` seconds
+    """
+
+    def __init__(self, local, shared=None, version_fn=None, version_check_interval=30):
+        self.local = local
+        self.shared = shared
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self.version = None
+        self.version_checked = 0.0
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def current_version(self):
+        """Refreshes the data version, dropping local entries when it changes."""
+        if self.version_fn is None:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            if now - self.version_checked < self.version_check_interval:
+                return self.version
+            self.version_checked = now
+        try:
+            version = self.version_fn()
+        except Exception as e:
+            print(f"Could not check data version: {e}")
+            return self.version
+        with self.lock:
+            if self.version is not None and version != self.version:
+                self.local.clear()
+                self.invalidations += 1
+            self.version = version
+        return version
+
+    def make_key(self, query, params):
+        payload = json.dumps({
+            'query': normalize_query(query),
+            'params': params,
+            'version': self.current_version()
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, query, params):
+        key = self.make_key(query, params)
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        try:
+            value = self.shared.get(key)
+        except Exception as e:
+            self.shared_errors += 1
+            print(f"Shared cache read failed: {e}")
+            return None
+        if value is not None:
+            self.shared_hits += 1
+            self.local.set(key, value)
+        return value
+
+    def set(self, query, params, value):
+        key = self.make_key(query, params)
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, self.local.ttl)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"Shared cache write failed: {e}")
+
+    def invalidate(self):
+        """Drops every local entry and forces a version re-check."""
+        self.local.clear()
+        with self.lock:
+            self.version_checked = 0.0
+            self.invalidations += 1
+
+    def stats(self):
+        stats = self.local.stats()
+        lookups = stats['hits'] + stats['misses']
+        # A local miss answered by the shared backend is still a hit overall
+        stats['shared_hits'] = self.shared_hits
+        stats['overall_hit_ratio'] = (stats['hits'] + self.shared_hits) / lookups if lookups else 0.0
+        stats['shared_backend'] = type(self.shared).__name__ if self.shared is not None else None
+        stats['shared_errors'] = self.shared_errors
+        stats['invalidations'] = self.invalidations
+        stats['data_version'] = self.version
+        return stats
@@ -1,17 +1,32 @@
-from flask import Flask, request, jsonify, send_from_directory
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS, cross_origin
-import google.generativeai as genai
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from embedding_cache import open_default_cache
+from search_common import (
+    EMBEDDING_MODEL, EXPLAIN_MODEL, MATCH_THRESHOLD, MATCH_COUNT, SNIPPET_LENGTH,
+    EXPLAIN_TEXT_COUNT, EXPLAIN_BATCH_MAX_AUTHORS, NO_TEXTS_EXPLANATION, FAILED_EXPLANATION,
+    search_options, create_search_cache, create_author_texts_cache, create_explanation_cache,
+    STATIC_MAX_AGE, AUTHOR_DETAILS_MAX_AGE, AUTHOR_DETAILS_BATCH_MAX, build_explain_prompt, explanation_key, precompressed_variant
+)
+from vector_backends import create_backend, configured_backend_name
+from author_details import open_default_store, batch_payload
+import gemini_rest
 
 # Load environment variables from config.env (for local development)
 # For Vercel, environment variables will be set in the Vercel dashboard
 if os.path.exists('config.env'):
     load_dotenv('config.env')
 
-app = Flask(__name__)
+# /static is served by serve_static below so precompressed variants can be used
+app = Flask(__name__, static_folder=None)
 CORS(app)  # Enable CORS for all routes
 
 # Configure Gemini API from environment
@@ -19,26 +34,88 @@ GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 if not GOOGLE_API_KEY:
     raise ValueError("GOOGLE_API_KEY not found in environment variables")
 
-genai.configure(api_key=GOOGLE_API_KEY)
-EMBEDDING_MODEL = 'embedding-001'
+# Query embeddings through the google-generativeai SDK ('sdk') or a direct
+# REST call ('rest') that keeps the SDK out of cold starts entirely
+EMBEDDING_TRANSPORT = os.getenv('EMBEDDING_TRANSPORT', 'sdk')
+
+# Cold-start budget for importing this module; /health reports the timings
+IMPORT_BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', '800'))
+startup_timings = {}  # phase -> milliseconds
+
+@contextmanager
+def timed(phase):
+    started = time.perf_counter()
+    yield
+    startup_timings[phase] = round((time.perf_counter() - started) * 1000, 1)
+
+# Heavy clients are created on first use rather than at import, so a cold
+# start only pays for what its first request needs
+_clients = {}
+_clients_lock = threading.RLock()
+
+def lazy_client(name, factory):
+    if name not in _clients:
+        with _clients_lock:
+            if name not in _clients:
+                with timed(f"init_{name}"):
+                    _clients[name] = factory()
+    return _clients[name]
+
+def get_genai():
+    """The configured google.generativeai module"""
+    def load():
+        import google.generativeai as genai
+        genai.configure(api_key=GOOGLE_API_KEY)
+        return genai
+    return lazy_client('genai', load)
+
+def get_explain_model():
+    """One client for every /explain_match request"""
+    return lazy_client('explain_model', lambda: get_genai().GenerativeModel(EXPLAIN_MODEL))
+
+def get_author_details():
+    """The author detail store behind /authors, or None if it has not been built"""
+    return lazy_client('author_details', open_default_store)
 
-# Configure Supabase
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Supabase credentials not found in environment variables")
+def get_vector_backend():
+    """The vector backend (see vector_backends.py): Supabase/pgvector by default,
+    or a local store / in-memory stand-in selected by VECTOR_BACKEND"""
+    def load():
+        backend = create_backend()
+        print(f"Using vector backend: {backend.name}")
+        return backend
+    return lazy_client('vector_backend', load)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Persistent embedding cache shared with embedding_database.py; None if disabled
+embedding_cache = open_default_cache()
+
+search_cache = create_search_cache(lambda: get_vector_backend().version())
+
+# Abstracts per author used in /explain_match prompts, and finished explanations
+author_texts_cache = create_author_texts_cache()
+explanation_cache = create_explanation_cache()
+
+# /explain_match/batch runs Gemini calls on a shared, bounded pool
+explain_executor = ThreadPoolExecutor(max_workers=int(os.getenv('EXPLAIN_BATCH_CONCURRENCY', '8')))
 
 def get_embedding(text):
-    """Generate embedding for text using Gemini API"""
+    """Generate embedding for text using Gemini API, reusing cached vectors"""
     try:
-        result = genai.embed_content(
-            model=f"models/{EMBEDDING_MODEL}",
-            content=text,
-            task_type="RETRIEVAL_QUERY"
-        )
-        return result['embedding']
+        if embedding_cache is not None:
+            cached = embedding_cache.get(EMBEDDING_MODEL, "RETRIEVAL_QUERY", text)
+            if cached is not None:
+                return cached
+        if EMBEDDING_TRANSPORT == 'rest':
+            embedding = gemini_rest.embed_content(GOOGLE_API_KEY, EMBEDDING_MODEL, text, "RETRIEVAL_QUERY")
+        else:
+            embedding = get_genai().embed_content(
+                model=f"models/{EMBEDDING_MODEL}",
+                content=text,
+                task_type="RETRIEVAL_QUERY"
+            )['embedding']
+        if embedding_cache is not None:
+            embedding_cache.put(EMBEDDING_MODEL, "RETRIEVAL_QUERY", text, embedding)
+        return embedding
     except Exception as e:
         print(f"Error getting embedding: {e}")
         return None
@@ -56,19 +133,35 @@ def cosine_similarity(vec_a, vec_b):
         return 0.0
     return dot_product / (norm_a * norm_b)
 
-# Add this helper function to collect all texts for an author
-def get_author_texts(author_id):
-    """Get all texts for an author from Supabase"""
-    try:
-        response = supabase.table('embeddings').select('text').contains('author_ids', [author_id]).execute()
-        return [item['text'] for item in response.data]
-    except Exception as e:
-        print(f"Error getting author texts: {e}")
-        return []
+def get_authors_texts(author_ids, limit=EXPLAIN_TEXT_COUNT):
+    """Get up to `limit` texts per author (cached); all misses are fetched in one backend query"""
+    texts = {}
+    missing = []
+    for author_id in author_ids:
+        cached = author_texts_cache.get((author_id, limit))
+        if cached is not None:
+            texts[author_id] = cached
+        else:
+            missing.append(author_id)
+    if missing:
+        try:
+            fetched = get_vector_backend().texts_for_authors(missing, limit)
+        except Exception as e:
+            print(f"Error getting author texts: {e}")
+            fetched = {}
+        for author_id in missing:
+            if author_id in fetched:
+                author_texts_cache.set((author_id, limit), fetched[author_id])
+            texts[author_id] = fetched.get(author_id, [])
+    return texts
+
+def get_author_texts(author_id, limit=EXPLAIN_TEXT_COUNT):
+    """Get up to `limit` texts for an author from the vector backend (cached)"""
+    return get_authors_texts([author_id], limit)[author_id]
 
 @app.route('/search', methods=['POST'])
 def search():
-    """Search endpoint that performs semantic search using Supabase"""
+    """Search endpoint that performs semantic search using the configured vector backend"""
     try:
         data = request.get_json()
         query = data.get('query', '').strip()
@@ -78,52 +171,39 @@ def search():
         
         print(f"Searching for: {query}")
         
+        # Backend options such as nprobe trade latency for recall per request
+        options = search_options(data)
+        search_params = dict(options, backend=configured_backend_name(),
+                             match_threshold=MATCH_THRESHOLD, match_count=MATCH_COUNT)
+        cached = search_cache.get(query, search_params)
+        if cached is not None:
+            return jsonify(dict(cached, query=query))
+        
         # Generate embedding for the query
         query_embedding = get_embedding(query)
         if not query_embedding:
             return jsonify({'error': 'Failed to generate query embedding'}), 500
         
-        # Search in Supabase using vector similarity
+        # Search using vector similarity
         try:
-            response = supabase.rpc(
-                'match_embeddings',
-                {
-                    'query_embedding': query_embedding,
-                    'match_threshold': 0.1,
-                    'match_count': 200
-                }
-            ).execute()
-            
-            results = []
-            for item in response.data:
-                for author_id in item['author_ids']:
-                    results.append({
-                        'author_id': author_id,
-                        'similarity': item['similarity'],
-                        'text': item['text'][:200] + '...' if len(item['text']) > 200 else item['text']
-                    })
-            
-            # Group by author_id and take the highest similarity for each author
-            author_results = {}
-            for result in results:
-                author_id = result['author_id']
-                if author_id not in author_results or result['similarity'] > author_results[author_id]['similarity']:
-                    author_results[author_id] = result
-            
-            # Convert back to list and sort by similarity
-            final_results = list(author_results.values())
-            final_results.sort(key=lambda x: x['similarity'], reverse=True)
+            # Best match per author among the top chunks; grouped server-side for pgvector
+            final_results = get_vector_backend().search_authors(
+                query_embedding, MATCH_COUNT, MATCH_THRESHOLD,
+                snippet_length=SNIPPET_LENGTH, **options
+            )
             
             print(f"Found {len(final_results)} results")
             
-            return jsonify({
+            payload = {
                 'query': query,
                 'results': final_results,
                 'total_found': len(final_results)
-            })
+            }
+            search_cache.set(query, search_params, payload)
+            return jsonify(payload)
             
         except Exception as e:
-            print(f"Error searching Supabase: {e}")
+            print(f"Error searching vectors: {e}")
             return jsonify({'error': 'Database search failed'}), 500
         
     except Exception as e:
@@ -134,65 +214,219 @@ def search():
 def health():
     """Health check endpoint"""
     try:
-        # Check if we can connect to Supabase
-        response = supabase.table('embeddings').select('id', count='exact').limit(1).execute()
-        count = response.count if response.count is not None else 0
+        # Check if we can reach the vector backend
+        vector_backend = get_vector_backend()
+        count = vector_backend.count()
         return jsonify({
             'status': 'healthy',
             'database_entries': count,
-            'database_type': 'supabase_pgvector'
+            'database_type': vector_backend.name,
+            'startup': startup_timings,
+            'embedding_cache': embedding_cache.stats() if embedding_cache is not None else None,
+            'search_cache': search_cache.stats()
         })
     except Exception as e:
         return jsonify({
             'status': 'unhealthy',
             'error': str(e),
-            'database_type': 'supabase_pgvector'
+            'database_type': configured_backend_name()
         }), 500
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit ratios of the search result, embedding, author text and explanation caches"""
+    return jsonify({
+        'search_cache': search_cache.stats(),
+        'embedding_cache': embedding_cache.stats() if embedding_cache is not None else None,
+        'author_texts_cache': author_texts_cache.stats(),
+        'explanation_cache': explanation_cache.stats()
+    })
+
+@app.route('/cache/invalidate', methods=['POST'])
+def invalidate_cache():
+    """Drop cached search results, author texts and explanations, e.g. right after a migration"""
+    search_cache.invalidate()
+    author_texts_cache.clear()
+    explanation_cache.clear()
+    return jsonify({'status': 'invalidated'})
+
+def author_details_response(body, etag):
+    """JSON response cacheable by browsers and CDNs; 304 when the ETag matches"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = AUTHOR_DETAILS_MAX_AGE
+    return response.make_conditional(request)
+
+@app.route('/authors/<author_id>', methods=['GET'])
+def author_details(author_id):
+    """Name, level, paper count and top papers for one author"""
+    store = get_author_details()
+    if store is None:
+        return jsonify({'error': 'Author details are not available'}), 503
+    found = store.get(author_id)
+    if found is None:
+        return jsonify({'error': 'Author not found'}), 404
+    return author_details_response(*found)
+
+@app.route('/authors', methods=['GET'])
+def author_details_batch():
+    """Details for ?ids=a,b,c in request order, plus the ids that were not found"""
+    author_ids = [author_id for author_id in request.args.get('ids', '').split(',') if author_id]
+    if not author_ids:
+        return jsonify({'error': 'ids is required'}), 400
+    if len(author_ids) > AUTHOR_DETAILS_BATCH_MAX:
+        return jsonify({'error': f'At most {AUTHOR_DETAILS_BATCH_MAX} ids per request'}), 400
+    store = get_author_details()
+    if store is None:
+        return jsonify({'error': 'Author details are not available'}), 503
+    return author_details_response(*batch_payload(store.get_many(author_ids), author_ids))
+
 @app.route('/')
 def serve_launch_page():
     return send_from_directory('static', 'force_graph.html')
 
+def generate_explanation(query, author_id, author_texts):
+    """Generate (and cache) one explanation; returns (explanation, succeeded)"""
+    if not author_texts:
+        return NO_TEXTS_EXPLANATION, True
+    try:
+        explanation = get_explain_model().generate_content(build_explain_prompt(query, author_texts)).text
+    except Exception as e:
+        print(f"Error calling Gemini: {e}")
+        return FAILED_EXPLANATION, False
+    explanation_cache.set(explanation_key(query, author_id), explanation)
+    return explanation, True
+
+def explain_request_args():
+    """(query, author_id) from a JSON body or, for EventSource clients, the query string"""
+    data = request.get_json(silent=True) or request.args
+    return data.get('query'), data.get('author_id')
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ''
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 @app.route('/explain_match', methods=['POST', 'OPTIONS'])
 @cross_origin(origins="*")
 def explain_match():
     if request.method == 'OPTIONS':
         return '', 200
-    data = request.json
-    query = data.get('query')
-    author_id = data.get('author_id')
+    query, author_id = explain_request_args()
 
-    # Gather all research texts for this author
-    author_texts = get_author_texts(author_id)
-    if not author_texts:
-        return jsonify({'explanation': "No research texts found for this professor."})
-
-    # Compose a prompt for Gemini
-    prompt = (
-        "You are an expert academic assistant. Your output will be shown on a card for a specific professor. "
-        "Always make an effort to connect the user's search query to the professor's research interests, even if the connection is not obvious. "
-        "Be creative and imaginative in finding possible links between the search and the research. "
-        "Do NOT simply say there is no similarity; instead, try to find any plausible or tangential connection. "
-        "Only explain why THIS professor matches the user's search, quoting or paraphrasing relevant research below. "
-        "Do NOT suggest searching for other professors or topics. "
-        "Be friendly, helpful, and use first or second person (e.g., 'You might be interested in this professor's work...'). "
-        f"\n\nUser's search: '{query}'\n"
-        f"Professor's research abstracts:\n"
-        + "\n---\n".join(author_texts[:5]) +
-        "\n\nIn 2-3 sentences, explain to the user why this professor matches their search, quoting or paraphrasing relevant research."
-    )
-
-    # Call Gemini
-    try:
-        model = genai.GenerativeModel('models/gemini-1.5-pro')
-        response = model.generate_content(prompt)
-        explanation = response.text
-    except Exception as e:
-        print(f"Error calling Gemini: {e}")
-        explanation = "Could not generate explanation at this time."
+    explanation = explanation_cache.get(explanation_key(query, author_id))
+    if explanation is not None:
+        return jsonify({'explanation': explanation, 'cached': True})
 
+    explanation, _ = generate_explanation(query, author_id, get_author_texts(author_id))
     return jsonify({'explanation': explanation})
 
+@app.route('/explain_match/batch', methods=['POST', 'OPTIONS'])
+@cross_origin(origins="*")
+def explain_match_batch():
+    """
+    Explain several authors at once: {"query", "author_ids": [...]}.
+
+    Streams NDJSON lines {"author_id", "explanation", "cached", "error"} as
+    each explanation completes; cached ones come first. Texts for every
+    author are fetched in one query and the Gemini calls run concurrently.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    data = request.get_json(silent=True) or {}
+    query = data.get('query')
+    author_ids = list(dict.fromkeys(data.get('author_ids') or []))[:EXPLAIN_BATCH_MAX_AUTHORS]
+
+    def line(author_id, explanation, cached, error=False):
+        return json.dumps({'author_id': author_id, 'explanation': explanation,
+                           'cached': cached, 'error': error}) + '\n'
+
+    def generate():
+        pending = []
+        for author_id in author_ids:
+            explanation = explanation_cache.get(explanation_key(query, author_id))
+            if explanation is not None:
+                yield line(author_id, explanation, True)
+            else:
+                pending.append(author_id)
+        if not pending:
+            return
+        author_texts = get_authors_texts(pending)
+        futures = {
+            explain_executor.submit(generate_explanation, query, author_id, author_texts.get(author_id, [])): author_id
+            for author_id in pending
+        }
+        for future in as_completed(futures):
+            explanation, succeeded = future.result()
+            yield line(futures[future], explanation, False, not succeeded)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/explain_match/stream', methods=['GET', 'POST', 'OPTIONS'])
+@cross_origin(origins="*")
+def explain_match_stream():
+    """
+    Stream an explanation as Server-Sent Events while Gemini generates it.
+
+    Emits `data: {"text": ...}` events for each chunk, then `event: done`
+    (with `cached`) or `event: error`. Cached explanations arrive as a single
+    chunk.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    query, author_id = explain_request_args()
+    cache_key = explanation_key(query, author_id)
+
+    def generate():
+        explanation = explanation_cache.get(cache_key)
+        if explanation is not None:
+            yield sse_event({'text': explanation})
+            yield sse_event({'cached': True}, 'done')
+            return
+        author_texts = get_author_texts(author_id)
+        if not author_texts:
+            yield sse_event({'text': NO_TEXTS_EXPLANATION})
+            yield sse_event({'cached': False}, 'done')
+            return
+        parts = []
+        try:
+            for chunk in get_explain_model().generate_content(build_explain_prompt(query, author_texts), stream=True):
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield sse_event({'text': chunk.text})
+        except Exception as e:
+            print(f"Error streaming from Gemini: {e}")
+            yield sse_event({'error': FAILED_EXPLANATION}, 'error')
+            return
+        explanation_cache.set(cache_key, ''.join(parts))
+        yield sse_event({'cached': False}, 'done')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Keep proxies from buffering the stream
+    })
+
 @app.route('/force_graph.html')
 def serve_force_graph():
-    return send_from_directory('static', 'force_graph.html') 
\ No newline at end of file
+    return send_from_directory('static', 'force_graph.html') 
+
+@app.route('/static/<path:filename>')
+def serve_static(filename):
+    """Static files, using a build-time .br/.gz variant when the client accepts one"""
+    static_dir = os.path.join(app.root_path, 'static')
+    variant, encoding, mimetype = precompressed_variant(
+        static_dir, filename, request.headers.get('Accept-Encoding'))
+    response = send_from_directory(static_dir, variant, mimetype=mimetype, max_age=STATIC_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+startup_timings['import'] = round((time.perf_counter() - _import_started) * 1000, 1)
+print(f"search_api imported in {startup_timings['import']:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)")
+if startup_timings['import'] > IMPORT_BUDGET_MS:
+    print(f"Warning: import exceeded the {IMPORT_BUDGET_MS:.0f}ms budget; run startup_report.py to see why")
@@ -0,0 +1,528 @@
+"""
+ASGI version of the search API (Quart + httpx).
+
+Serves the same endpoints as search_api.py, but upstream I/O is awaited
+instead of holding a worker: query embeddings and explanations go to the
+Gemini REST API, and with the pgvector backend searches and author lookups go
+straight to PostgREST, each over a pooled keep-alive connection. Local and
+in-memory backends are searched in a worker thread. The pgvector path
+expects the RPCs from the current supabase_schema.sql.
+
+Run with any ASGI server:
+  pip install -r requirements-async.txt
+  hypercorn search_api_async:app --bind 0.0.0.0:5000
+"""
+
+import asyncio
+import json
+import os
+
+import httpx
+from dotenv import load_dotenv
+from quart import Quart, Response, request, jsonify, send_from_directory
+from quart_cors import cors
+
+from embedding_cache import open_default_cache
+from search_common import (
+    EMBEDDING_MODEL, EXPLAIN_MODEL, MATCH_THRESHOLD, MATCH_COUNT, SNIPPET_LENGTH,
+    EXPLAIN_TEXT_COUNT, EXPLAIN_BATCH_MAX_AUTHORS, NO_TEXTS_EXPLANATION, FAILED_EXPLANATION,
+    search_options, create_search_cache, create_author_texts_cache, create_explanation_cache,
+    STATIC_MAX_AGE, AUTHOR_DETAILS_MAX_AGE, AUTHOR_DETAILS_BATCH_MAX, build_explain_prompt, explanation_key, precompressed_variant
+)
+from vector_backends import (
+    create_backend, configured_backend_name, two_stage_default, aggregate_by_author, is_missing_function
+)
+from author_index import DEFAULT_AUTHOR_COUNT
+from author_details import open_default_store, batch_payload
+
+if os.path.exists('config.env'):
+    load_dotenv('config.env')
+
+# /static is served by serve_static below so precompressed variants can be used
+app = cors(Quart(__name__, static_folder=None), allow_origin="*")
+
+GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+if not GOOGLE_API_KEY:
+    raise ValueError("GOOGLE_API_KEY not found in environment variables")
+
+GEMINI_URL = 'https://generativelanguage.googleapis.com/v1beta'
+UPSTREAM_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+UPSTREAM_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+EXPLAIN_BATCH_CONCURRENCY = int(os.getenv('EXPLAIN_BATCH_CONCURRENCY', '8'))
+PREFETCH_AUTHORS = 7  # Result cards shown by the frontend
+
+class GeminiClient:
+    """Gemini REST calls (embedContent, generateContent) over a pooled client."""
+
+    def __init__(self, http):
+        self.http = http
+
+    async def embed(self, text, task_type="RETRIEVAL_QUERY"):
+        response = await self.http.post(f"/models/{EMBEDDING_MODEL}:embedContent", json={
+            'model': f"models/{EMBEDDING_MODEL}",
+            'content': {'parts': [{'text': text}]},
+            'taskType': task_type
+        })
+        response.raise_for_status()
+        return response.json()['embedding']['values']
+
+    @staticmethod
+    def response_text(data):
+        candidates = data.get('candidates') or [{}]
+        parts = candidates[0].get('content', {}).get('parts', [])
+        return ''.join(part.get('text', '') for part in parts)
+
+    async def generate(self, prompt):
+        response = await self.http.post(f"/{EXPLAIN_MODEL}:generateContent", json={
+            'contents': [{'parts': [{'text': prompt}]}]
+        })
+        response.raise_for_status()
+        return self.response_text(response.json())
+
+    async def stream_generate(self, prompt):
+        """Yields text chunks as Gemini produces them"""
+        async with self.http.stream('POST', f"/{EXPLAIN_MODEL}:streamGenerateContent",
+                                    params={'alt': 'sse'},
+                                    json={'contents': [{'parts': [{'text': prompt}]}]}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith('data: '):
+                    text = self.response_text(json.loads(line[6:]))
+                    if text:
+                        yield text
+
+class PostgrestBackend:
+    """Async pgvector backend calling the Supabase RPCs through PostgREST."""
+
+    name = 'pgvector'
+
+    def __init__(self, http, probes=None, ef_search=None, two_stage=False, halfvec=False, rescore=0):
+        self.http = http
+        self.probes = probes
+        self.ef_search = ef_search
+        self.two_stage = two_stage
+        self.halfvec = halfvec
+        self.rescore = rescore
+        self.has_author_profiles = True
+
+    async def rpc(self, function, params):
+        response = await self.http.post(f"/rpc/{function}", json=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def search_authors(self, query_vector, top_k=200, threshold=None, author_count=None,
+                             snippet_length=200, probes=None, ef_search=None, two_stage=None,
+                             rerank=True, rescore=None, **options):
+        params = {
+            'query_embedding': list(query_vector),
+            'match_threshold': threshold if threshold is not None else -1.0,
+            'snippet_length': snippet_length,
+            'probes': probes if probes is not None else self.probes,
+            'ef_search': ef_search if ef_search is not None else self.ef_search
+        }
+        if self.has_author_profiles and (two_stage if two_stage is not None else self.two_stage):
+            try:
+                return await self.rpc('match_author_profiles', dict(
+                    params, author_count=author_count or DEFAULT_AUTHOR_COUNT, rerank=rerank))
+            except httpx.HTTPStatusError as e:
+                if not is_missing_function(e.response.text):
+                    raise
+                print(f"match_author_profiles RPC is not deployed, searching chunks instead: {e}")
+                self.has_author_profiles = False
+        if self.halfvec:
+            # match_authors orders by the full-precision column; group halfvec matches here
+            rescore = self.rescore if rescore is None else rescore
+            try:
+                matches = await self.rpc('match_embeddings_halfvec', {
+                    'query_embedding': list(query_vector),
+                    'match_threshold': threshold if threshold is not None else -1.0,
+                    'match_count': top_k,
+                    'rescore_count': top_k * rescore if rescore else None,
+                    'probes': params['probes'],
+                    'ef_search': params['ef_search']
+                })
+                return aggregate_by_author(matches, author_count, snippet_length)
+            except httpx.HTTPStatusError as e:
+                # pgvector before 0.7, or the updated schema has not been run
+                if not is_missing_function(e.response.text):
+                    raise
+                print(f"match_embeddings_halfvec RPC is not deployed, searching full precision instead: {e}")
+                self.halfvec = False
+        return await self.rpc('match_authors', dict(params, match_count=top_k, author_count=author_count))
+
+    async def texts_for_authors(self, author_ids, limit=None):
+        rows = await self.rpc('authors_texts', {'author_list': list(author_ids), 'max_texts': limit})
+        texts = {author_id: [] for author_id in author_ids}
+        for row in rows:
+            texts[row['author_id']].append(row['text'])
+        return texts
+
+    async def latest(self):
+        """(row count, latest updated_at) from one request using PostgREST's exact count"""
+        response = await self.http.get('/embeddings', params={'select': 'updated_at', 'order': 'updated_at.desc',
+                                                              'limit': 1},
+                                       headers={'Prefer': 'count=exact'})
+        response.raise_for_status()
+        rows = response.json()
+        count = int(response.headers.get('content-range', '*/0').split('/')[-1])
+        return count, rows[0]['updated_at'] if rows else ''
+
+    async def count(self):
+        return (await self.latest())[0]
+
+    async def version(self):
+        count, updated_at = await self.latest()
+        return f"{self.name}:{count}:{updated_at}"
+
+class ThreadedBackend:
+    """Runs a synchronous backend (local store, in-memory) in worker threads."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+
+    async def search_authors(self, *args, **kwargs):
+        return await asyncio.to_thread(self.backend.search_authors, *args, **kwargs)
+
+    async def texts_for_authors(self, author_ids, limit=None):
+        return await asyncio.to_thread(self.backend.texts_for_authors, author_ids, limit)
+
+    async def count(self):
+        return await asyncio.to_thread(self.backend.count)
+
+    async def version(self):
+        return await asyncio.to_thread(self.backend.version)
+
+def create_async_backend():
+    """The configured backend: PostgREST for pgvector, else the sync backend in threads"""
+    if configured_backend_name() != 'pgvector':
+        return ThreadedBackend(create_backend())
+    url = os.getenv('SUPABASE_URL')
+    key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    if not url or not key:
+        raise ValueError("Supabase credentials not found in environment variables")
+    http = httpx.AsyncClient(
+        base_url=f"{url.rstrip('/')}/rest/v1",
+        headers={'apikey': key, 'Authorization': f"Bearer {key}"},
+        timeout=UPSTREAM_TIMEOUT, limits=UPSTREAM_LIMITS
+    )
+    probes = os.getenv('PGVECTOR_PROBES')
+    ef_search = os.getenv('PGVECTOR_EF_SEARCH')
+    return PostgrestBackend(http, int(probes) if probes else None,
+                            int(ef_search) if ef_search else None, two_stage_default(),
+                            (os.getenv('VECTOR_PRECISION') or 'float32') != 'float32',
+                            int(os.getenv('VECTOR_RESCORE') or 0))
+
+# Created per event loop in startup()
+gemini = None
+vector_backend = None
+explain_semaphore = None
+background_tasks = set()
+
+# The data version is refreshed in the background so cache lookups never wait on it
+data_version = None
+embedding_cache = open_default_cache()
+search_cache = create_search_cache(lambda: data_version)
+author_texts_cache = create_author_texts_cache()
+explanation_cache = create_explanation_cache()
+author_details_store = open_default_store()
+
+async def refresh_data_version():
+    global data_version
+    interval = int(os.getenv('SEARCH_CACHE_VERSION_CHECK', '30'))
+    while True:
+        try:
+            data_version = await vector_backend.version()
+        except Exception as e:
+            print(f"Could not check data version: {e}")
+        await asyncio.sleep(interval)
+
+def run_in_background(coroutine):
+    task = asyncio.create_task(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+@app.before_serving
+async def startup():
+    global gemini, vector_backend, explain_semaphore
+    gemini = GeminiClient(httpx.AsyncClient(
+        base_url=GEMINI_URL, headers={'x-goog-api-key': GOOGLE_API_KEY},
+        timeout=UPSTREAM_TIMEOUT, limits=UPSTREAM_LIMITS
+    ))
+    vector_backend = create_async_backend()
+    explain_semaphore = asyncio.Semaphore(EXPLAIN_BATCH_CONCURRENCY)
+    print(f"Using vector backend: {vector_backend.name}")
+    run_in_background(refresh_data_version())
+
+@app.after_serving
+async def shutdown():
+    for task in list(background_tasks):
+        task.cancel()
+    await gemini.http.aclose()
+    if isinstance(vector_backend, PostgrestBackend):
+        await vector_backend.http.aclose()
+
+async def get_embedding(text):
+    """Query embedding from the Gemini REST API, reusing cached vectors"""
+    # SQLite calls can wait on fsync or another writer's lock, so they run in
+    # worker threads rather than stalling the event loop
+    if embedding_cache is not None:
+        cached = await asyncio.to_thread(embedding_cache.get, EMBEDDING_MODEL, "RETRIEVAL_QUERY", text)
+        if cached is not None:
+            return cached
+    embedding = await gemini.embed(text)
+    if embedding_cache is not None:
+        await asyncio.to_thread(embedding_cache.put, EMBEDDING_MODEL, "RETRIEVAL_QUERY", text, embedding)
+    return embedding
+
+async def get_authors_texts(author_ids, limit=EXPLAIN_TEXT_COUNT):
+    """Up to `limit` texts per author (cached); all misses are fetched in one backend call"""
+    texts = {}
+    missing = []
+    for author_id in author_ids:
+        cached = author_texts_cache.get((author_id, limit))
+        if cached is not None:
+            texts[author_id] = cached
+        else:
+            missing.append(author_id)
+    if missing:
+        try:
+            fetched = await vector_backend.texts_for_authors(missing, limit)
+        except Exception as e:
+            print(f"Error getting author texts: {e}")
+            fetched = {}
+        for author_id in missing:
+            if author_id in fetched:
+                author_texts_cache.set((author_id, limit), fetched[author_id])
+            texts[author_id] = fetched.get(author_id, [])
+    return texts
+
+async def generate_explanation(query, author_id, author_texts):
+    """Generate (and cache) one explanation; returns (explanation, succeeded)"""
+    if not author_texts:
+        return NO_TEXTS_EXPLANATION, True
+    try:
+        async with explain_semaphore:
+            explanation = await gemini.generate(build_explain_prompt(query, author_texts))
+    except Exception as e:
+        print(f"Error calling Gemini: {e}")
+        return FAILED_EXPLANATION, False
+    explanation_cache.set(explanation_key(query, author_id), explanation)
+    return explanation, True
+
+async def explain_request_args():
+    """(query, author_id) from a JSON body or, for EventSource clients, the query string"""
+    data = await request.get_json(silent=True) or request.args
+    return data.get('query'), data.get('author_id')
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ''
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+@app.route('/search', methods=['POST'])
+async def search():
+    """Semantic author search; see search_api.search"""
+    try:
+        data = await request.get_json() or {}
+        query = data.get('query', '').strip()
+        if not query:
+            return jsonify({'error': 'Query is required'}), 400
+
+        options = search_options(data)
+        search_params = dict(options, backend=vector_backend.name,
+                             match_threshold=MATCH_THRESHOLD, match_count=MATCH_COUNT)
+        cached = search_cache.get(query, search_params)
+        if cached is not None:
+            return jsonify(dict(cached, query=query))
+
+        try:
+            query_embedding = await get_embedding(query)
+        except Exception as e:
+            print(f"Error getting embedding: {e}")
+            return jsonify({'error': 'Failed to generate query embedding'}), 500
+
+        try:
+            final_results = await vector_backend.search_authors(
+                query_embedding, MATCH_COUNT, MATCH_THRESHOLD,
+                snippet_length=SNIPPET_LENGTH, **options
+            )
+        except Exception as e:
+            print(f"Error searching vectors: {e}")
+            return jsonify({'error': 'Database search failed'}), 500
+
+        # Warm the author text cache for the result cards while the client renders
+        run_in_background(get_authors_texts([item['author_id'] for item in final_results[:PREFETCH_AUTHORS]]))
+
+        payload = {
+            'query': query,
+            'results': final_results,
+            'total_found': len(final_results)
+        }
+        search_cache.set(query, search_params, payload)
+        return jsonify(payload)
+    except Exception as e:
+        print(f"Error in search: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/explain_match', methods=['POST'])
+async def explain_match():
+    query, author_id = await explain_request_args()
+    explanation = explanation_cache.get(explanation_key(query, author_id))
+    if explanation is not None:
+        return jsonify({'explanation': explanation, 'cached': True})
+    texts = await get_authors_texts([author_id])
+    explanation, _ = await generate_explanation(query, author_id, texts[author_id])
+    return jsonify({'explanation': explanation})
+
+@app.route('/explain_match/batch', methods=['POST'])
+async def explain_match_batch():
+    """NDJSON explanations for several authors; see search_api.explain_match_batch"""
+    data = await request.get_json(silent=True) or {}
+    query = data.get('query')
+    author_ids = list(dict.fromkeys(data.get('author_ids') or []))[:EXPLAIN_BATCH_MAX_AUTHORS]
+
+    def line(author_id, explanation, cached, error=False):
+        return json.dumps({'author_id': author_id, 'explanation': explanation,
+                           'cached': cached, 'error': error}) + '\n'
+
+    async def explain(author_id, author_texts):
+        return author_id, await generate_explanation(query, author_id, author_texts)
+
+    async def generate():
+        pending = []
+        for author_id in author_ids:
+            explanation = explanation_cache.get(explanation_key(query, author_id))
+            if explanation is not None:
+                yield line(author_id, explanation, True)
+            else:
+                pending.append(author_id)
+        if not pending:
+            return
+        author_texts = await get_authors_texts(pending)
+        for next_done in asyncio.as_completed([explain(a, author_texts.get(a, [])) for a in pending]):
+            author_id, (explanation, succeeded) = await next_done
+            yield line(author_id, explanation, False, not succeeded)
+
+    return Response(generate(), mimetype='application/x-ndjson', headers=STREAM_HEADERS)
+
+@app.route('/explain_match/stream', methods=['GET', 'POST'])
+async def explain_match_stream():
+    """SSE explanation; see search_api.explain_match_stream"""
+    query, author_id = await explain_request_args()
+    cache_key = explanation_key(query, author_id)
+
+    async def generate():
+        explanation = explanation_cache.get(cache_key)
+        if explanation is not None:
+            yield sse_event({'text': explanation})
+            yield sse_event({'cached': True}, 'done')
+            return
+        author_texts = (await get_authors_texts([author_id]))[author_id]
+        if not author_texts:
+            yield sse_event({'text': NO_TEXTS_EXPLANATION})
+            yield sse_event({'cached': False}, 'done')
+            return
+        parts = []
+        try:
+            async for text in gemini.stream_generate(build_explain_prompt(query, author_texts)):
+                parts.append(text)
+                yield sse_event({'text': text})
+        except Exception as e:
+            print(f"Error streaming from Gemini: {e}")
+            yield sse_event({'error': FAILED_EXPLANATION}, 'error')
+            return
+        explanation_cache.set(cache_key, ''.join(parts))
+        yield sse_event({'cached': False}, 'done')
+
+    return Response(generate(), mimetype='text/event-stream', headers=STREAM_HEADERS)
+
+@app.route('/health', methods=['GET'])
+async def health():
+    try:
+        count = await vector_backend.count()
+        return jsonify({
+            'status': 'healthy',
+            'database_entries': count,
+            'database_type': vector_backend.name,
+            'embedding_cache': embedding_cache.stats() if embedding_cache is not None else None,
+            'search_cache': search_cache.stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'unhealthy',
+            'error': str(e),
+            'database_type': vector_backend.name
+        }), 500
+
+@app.route('/cache/stats', methods=['GET'])
+async def cache_stats():
+    return jsonify({
+        'search_cache': search_cache.stats(),
+        'embedding_cache': embedding_cache.stats() if embedding_cache is not None else None,
+        'author_texts_cache': author_texts_cache.stats(),
+        'explanation_cache': explanation_cache.stats()
+    })
+
+@app.route('/cache/invalidate', methods=['POST'])
+async def invalidate_cache():
+    search_cache.invalidate()
+    author_texts_cache.clear()
+    explanation_cache.clear()
+    return jsonify({'status': 'invalidated'})
+
+async def author_details_response(body, etag):
+    """JSON response cacheable by browsers and CDNs; 304 when the ETag matches"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = AUTHOR_DETAILS_MAX_AGE
+    return await response.make_conditional(request)
+
+@app.route('/authors/<author_id>', methods=['GET'])
+async def author_details(author_id):
+    """Name, level, paper count and top papers for one author"""
+    if author_details_store is None:
+        return jsonify({'error': 'Author details are not available'}), 503
+    found = await asyncio.to_thread(author_details_store.get, author_id)
+    if found is None:
+        return jsonify({'error': 'Author not found'}), 404
+    return await author_details_response(*found)
+
+@app.route('/authors', methods=['GET'])
+async def author_details_batch():
+    """Details for ?ids=a,b,c in request order, plus the ids that were not found"""
+    author_ids = [author_id for author_id in request.args.get('ids', '').split(',') if author_id]
+    if not author_ids:
+        return jsonify({'error': 'ids is required'}), 400
+    if len(author_ids) > AUTHOR_DETAILS_BATCH_MAX:
+        return jsonify({'error': f'At most {AUTHOR_DETAILS_BATCH_MAX} ids per request'}), 400
+    if author_details_store is None:
+        return jsonify({'error': 'Author details are not available'}), 503
+    found = await asyncio.to_thread(author_details_store.get_many, author_ids)
+    return await author_details_response(*batch_payload(found, author_ids))
+
+@app.route('/')
+async def serve_launch_page():
+    return await send_from_directory('static', 'force_graph.html')
+
+@app.route('/force_graph.html')
+async def serve_force_graph():
+    return await send_from_directory('static', 'force_graph.html')
+
+@app.route('/static/<path:filename>')
+async def serve_static(filename):
+    """Static files, using a build-time .br/.gz variant when the client accepts one"""
+    static_dir = os.path.join(app.root_path, 'static')
+    variant, encoding, mimetype = precompressed_variant(
+        static_dir, filename, request.headers.get('Accept-Encoding'))
+    response = await send_from_directory(static_dir, variant, mimetype=mimetype)
+    response.cache_control.max_age = STATIC_MAX_AGE
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
@@ -0,0 +1,109 @@
+import mimetypes
+import os
+
+from result_cache import TTLCache, RedisBackend, ResultCache, normalize_query
+
+# --- Settings and helpers shared by the WSGI (search_api.py) and ASGI
+# (search_api_async.py) apps ---
+
+EMBEDDING_MODEL = 'embedding-001'
+EXPLAIN_MODEL = 'models/gemini-1.5-pro'
+
+# Search parameters
+MATCH_THRESHOLD = 0.1
+MATCH_COUNT = 200
+SNIPPET_LENGTH = 200
+
+# Search options a request may pass through to the backend, with their types
+SEARCH_OPTIONS = {'nprobe': int, 'exact': bool, 'probes': int, 'ef_search': int,
+                  'two_stage': bool, 'rerank': bool, 'rescore': int}
+
+# Abstracts per author used in /explain_match prompts
+EXPLAIN_TEXT_COUNT = 5
+EXPLAIN_BATCH_MAX_AUTHORS = 20
+NO_TEXTS_EXPLANATION = "No research texts found for this professor."
+FAILED_EXPLANATION = "Could not generate explanation at this time."
+
+def search_options(data):
+    """Backend options such as nprobe, taken from a /search request body"""
+    return {name: cast(data[name]) for name, cast in SEARCH_OPTIONS.items() if name in data}
+
+def create_search_cache(version_fn):
+    """Build the /search result cache; SEARCH_CACHE_URL enables a shared Redis backend"""
+    shared = None
+    shared_url = os.getenv('SEARCH_CACHE_URL')
+    if shared_url:
+        try:
+            shared = RedisBackend(shared_url)
+        except Exception as e:
+            print(f"Shared search cache disabled: {e}")
+    local = TTLCache(
+        max_entries=int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '1000')),
+        ttl=int(os.getenv('SEARCH_CACHE_TTL', '600'))
+    )
+    return ResultCache(local, shared, version_fn=version_fn,
+                       version_check_interval=int(os.getenv('SEARCH_CACHE_VERSION_CHECK', '30')))
+
+def create_author_texts_cache():
+    """Per-process cache of the texts used in explanation prompts"""
+    return TTLCache(
+        max_entries=int(os.getenv('AUTHOR_TEXTS_CACHE_MAX_ENTRIES', '2000')),
+        ttl=int(os.getenv('AUTHOR_TEXTS_CACHE_TTL', '3600'))
+    )
+
+def create_explanation_cache():
+    """Finished explanations keyed by (normalized query, author_id)"""
+    return TTLCache(
+        max_entries=int(os.getenv('EXPLANATION_CACHE_MAX_ENTRIES', '5000')),
+        ttl=int(os.getenv('EXPLANATION_CACHE_TTL', '86400'))
+    )
+
+def build_explain_prompt(query, author_texts):
+    """Compose the Gemini prompt explaining why an author matches a query"""
+    return (
+        "You are an expert academic assistant. Your output will be shown on a card for a specific professor. "
+        "Always make an effort to connect the user's search query to the professor's research interests, even if the connection is not obvious. "
+        "Be creative and imaginative in finding possible links between the search and the research. "
+        "Do NOT simply say there is no similarity; instead, try to find any plausible or tangential connection. "
+        "Only explain why THIS professor matches the user's search, quoting or paraphrasing relevant research below. "
+        "Do NOT suggest searching for other professors or topics. "
+        "Be friendly, helpful, and use first or second person (e.g., 'You might be interested in this professor's work...'). "
+        f"\n\nUser's search: '{query}'\n"
+        f"Professor's research abstracts:\n"
+        + "\n---\n".join(author_texts) +
+        "\n\nIn 2-3 sentences, explain to the user why this professor matches their search, quoting or paraphrasing relevant research."
+    )
+
+# /authors: detail records change only when the graph is rebuilt
+AUTHOR_DETAILS_MAX_AGE = int(os.getenv('AUTHOR_DETAILS_MAX_AGE', '3600'))
+AUTHOR_DETAILS_BATCH_MAX = 50
+
+# Build-time compressed variants of static files, in order of preference
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+STATIC_MAX_AGE = 3600
+
+def accepted_encodings(accept_encoding):
+    """Content codings an Accept-Encoding header allows (ignoring q-values other than 0)"""
+    accepted = set()
+    for part in (accept_encoding or '').lower().split(','):
+        coding, _, params = part.partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip())
+    return accepted
+
+def precompressed_variant(directory, filename, accept_encoding):
+    """
+    Pick the file to send for a static request.
+
+    Returns:
+        tuple: (filename to send, Content-Encoding or None, mimetype of the original)
+    """
+    mimetype = mimetypes.guess_type(filename)[0]
+    accepted = accepted_encodings(accept_encoding)
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        if encoding in accepted and os.path.isfile(os.path.join(directory, filename + suffix)):
+            return filename + suffix, encoding, mimetype
+    return filename, None, mimetype
+
+def explanation_key(query, author_id):
+    return (normalize_query(query or ''), author_id)
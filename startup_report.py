@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Cold-start report for the serverless entry point.
+
+Imports wsgi.py in a fresh interpreter under `python -X importtime`, which is
+what every new Vercel instance pays before serving its first request, and
+prints the slowest top-level imports and the total against a budget.
+
+Usage:
+  python startup_report.py [--budget-ms 800] [--top 15] [--depth 2]
+
+Exits with status 1 when the import exceeds the budget, so it can gate CI.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+def measure_imports(module='wsgi'):
+    """
+    Imports `module` in a subprocess with -X importtime.
+
+    Returns:
+        tuple: (wall-clock ms, [(depth, package, cumulative ms)], stdout)
+    """
+    env = dict(os.environ)
+    # search_api refuses to import without a key; no request is made here
+    env.setdefault('GOOGLE_API_KEY', 'startup-report')
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2  # nested imports are indented by two spaces
+        imports.append((depth, name.strip(), int(cumulative) / 1000))
+    return wall_ms, imports, result.stdout
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the cold-start import time of the API')
+    parser.add_argument('--module', default='wsgi')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', '800')))
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--depth', type=int, default=2,
+                        help='Break the time down to imports nested this deep below the entry point')
+    args = parser.parse_args()
+
+    wall_ms, imports, stdout = measure_imports(args.module)
+    total_ms = sum(ms for depth, _, ms in imports if depth == 0)
+    print(f"Slowest imports under `import {args.module}` (depth <= {args.depth}):")
+    nested = [(name, ms) for depth, name, ms in imports if 0 < depth <= args.depth]
+    for name, ms in sorted(nested, key=lambda item: -item[1])[:args.top]:
+        print(f"  {ms:8.1f}ms  {name}")
+    print(f"Imports: {total_ms:.0f}ms, process wall clock: {wall_ms:.0f}ms, budget: {args.budget_ms:.0f}ms")
+    for line in stdout.splitlines():
+        if line.startswith('search_api imported'):
+            print(line)
+    if total_ms > args.budget_ms:
+        print("Over budget")
+        sys.exit(1)
+    print("Within budget")
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,109 @@ CREATE TABLE IF NOT EXISTS embeddings (
     text TEXT NOT NULL,
     embedding vector(768), -- Adjust dimension based on your embedding model
     author_ids TEXT[] NOT NULL,
+    content_hash TEXT, -- sha256 of the normalized text, see vector_store.text_key
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
--- Create index for similarity search
+-- For tables created before content_hash existed
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Hashes rows inserted without content_hash, then merges chunks whose
+-- normalized text is equal: the oldest row keeps the union of their
+-- author_ids and the others are deleted. The hash matches text_key: NFC,
+-- whitespace runs (the characters str.split() splits on) collapsed to one
+-- space and trimmed, then sha256. Runs only while unhashed rows remain, so
+-- re-running the schema does not rebuild the unique index
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM embeddings WHERE content_hash IS NULL) THEN
+        DROP INDEX IF EXISTS embeddings_content_hash_idx;
+
+        UPDATE embeddings
+        SET content_hash = encode(sha256(convert_to(btrim(regexp_replace(
+            normalize(text, NFC),
+            '[\t\n\v\f\r \u001c-\u001f\u0085\u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+',
+            ' ', 'g'), ' '), 'UTF8')), 'hex')
+        WHERE content_hash IS NULL;
+
+        WITH duplicates AS (
+            SELECT content_hash, min(id) AS keep_id
+            FROM embeddings
+            GROUP BY content_hash
+            HAVING count(*) > 1
+        ),
+        first_seen AS (
+            SELECT DISTINCT ON (d.keep_id, a.author_id) d.keep_id, a.author_id, e.id, a.position
+            FROM duplicates d
+            JOIN embeddings e ON e.content_hash = d.content_hash
+            CROSS JOIN LATERAL unnest(e.author_ids) WITH ORDINALITY AS a(author_id, position)
+            ORDER BY d.keep_id, a.author_id, e.id, a.position
+        ),
+        merged AS (
+            SELECT keep_id, array_agg(author_id ORDER BY id, position) AS author_ids
+            FROM first_seen
+            GROUP BY keep_id
+        )
+        UPDATE embeddings e
+        SET author_ids = merged.author_ids
+        FROM merged
+        WHERE e.id = merged.keep_id;
+
+        DELETE FROM embeddings e
+        USING (
+            SELECT content_hash, min(id) AS keep_id
+            FROM embeddings
+            GROUP BY content_hash
+            HAVING count(*) > 1
+        ) duplicates
+        WHERE e.content_hash = duplicates.content_hash AND e.id <> duplicates.keep_id;
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS embeddings_content_hash_idx ON embeddings (content_hash);
+
+-- Last write to each row. Appending author_ids changes neither the row count
+-- nor the max id, so the search cache's data version reads max(updated_at)
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp();
+CREATE INDEX IF NOT EXISTS embeddings_updated_at_idx ON embeddings (updated_at);
+
+CREATE OR REPLACE FUNCTION touch_embeddings_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS embeddings_touch_updated_at ON embeddings;
+CREATE TRIGGER embeddings_touch_updated_at
+    BEFORE UPDATE ON embeddings
+    FOR EACH ROW EXECUTE FUNCTION touch_embeddings_updated_at();
+
+-- Author lookups (author_ids @> ARRAY[...]) for explanation cards
+CREATE INDEX IF NOT EXISTS embeddings_author_ids_idx ON embeddings USING gin (author_ids);
+
+-- Create index for similarity search. ivfflat picks its centroids when the
+-- index is built, so an index created on the empty table is of little use:
+-- rebuild it after bulk loads with `python pgvector_index.py rebuild`
 CREATE INDEX IF NOT EXISTS embeddings_embedding_idx ON embeddings USING ivfflat (embedding vector_cosine_ops);
 
--- Create function for similarity search
+-- Signatures before probes / ef_search were added
+DROP FUNCTION IF EXISTS match_embeddings(vector, float, int);
+DROP FUNCTION IF EXISTS match_authors(vector, float, int, int, int);
+
+-- Create function for similarity search. probes (ivfflat) and ef_search (hnsw)
+-- override the index search width for this call only; NULL keeps the default.
+-- ef_search is raised to match_count when it is smaller
 CREATE OR REPLACE FUNCTION match_embeddings(
     query_embedding vector(768),
     match_threshold float,
-    match_count int
+    match_count int,
+    probes int DEFAULT NULL,
+    ef_search int DEFAULT NULL
 )
 RETURNS TABLE (
     id bigint,
@@ -28,6 +120,13 @@ RETURNS TABLE (
 LANGUAGE plpgsql
 AS $$
 BEGIN
+    IF probes IS NOT NULL THEN
+        PERFORM set_config('ivfflat.probes', probes::text, true);
+    END IF;
+    -- HNSW returns at most ef_search rows, so never search narrower than match_count
+    PERFORM set_config('hnsw.ef_search', GREATEST(
+        COALESCE(ef_search, NULLIF(current_setting('hnsw.ef_search', true), '')::int, 40),
+        match_count)::text, true);
     RETURN QUERY
     SELECT
         embeddings.id,
@@ -41,6 +140,276 @@ BEGIN
 END;
 $$;
 
+-- Half-precision search (pgvector 0.7+). `python pgvector_index.py rebuild
+-- --precision half` indexes the expression embedding::halfvec(768) as
+-- embeddings_embedding_half_idx, half the size of the full index, while the
+-- table keeps full-precision vectors. With rescore_count, that many halfvec
+-- candidates are re-ranked at full precision
+CREATE OR REPLACE FUNCTION match_embeddings_halfvec(
+    query_embedding vector(768),
+    match_threshold float,
+    match_count int,
+    rescore_count int DEFAULT NULL,
+    probes int DEFAULT NULL,
+    ef_search int DEFAULT NULL
+)
+RETURNS TABLE (
+    id bigint,
+    text text,
+    author_ids text[],
+    similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF probes IS NOT NULL THEN
+        PERFORM set_config('ivfflat.probes', probes::text, true);
+    END IF;
+    -- HNSW returns at most ef_search rows, so search at least as wide as the
+    -- candidates to rescore
+    PERFORM set_config('hnsw.ef_search', GREATEST(
+        COALESCE(ef_search, NULLIF(current_setting('hnsw.ef_search', true), '')::int, 40),
+        match_count, COALESCE(rescore_count, 0))::text, true);
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT
+            embeddings.id,
+            embeddings.text,
+            embeddings.author_ids,
+            embeddings.embedding,
+            1 - (embeddings.embedding::halfvec(768) <=> query_embedding::halfvec(768)) AS approximate
+        FROM embeddings
+        ORDER BY embeddings.embedding::halfvec(768) <=> query_embedding::halfvec(768)
+        LIMIT GREATEST(match_count, COALESCE(rescore_count, 0))
+    ),
+    scored AS (
+        SELECT
+            c.id,
+            c.text,
+            c.author_ids,
+            CASE WHEN rescore_count IS NULL THEN c.approximate
+                 ELSE 1 - (c.embedding <=> query_embedding) END AS similarity
+        FROM candidates c
+    )
+    SELECT s.id, s.text, s.author_ids, s.similarity
+    FROM scored s
+    WHERE s.similarity > match_threshold
+    ORDER BY s.similarity DESC
+    LIMIT match_count;
+END;
+$$;
+
+-- Per-author search: groups the top chunk matches by author inside Postgres,
+-- keeping each author's best match and a truncated snippet of its text, so
+-- only the author rows the UI needs cross the wire
+CREATE OR REPLACE FUNCTION match_authors(
+    query_embedding vector(768),
+    match_threshold float,
+    match_count int,
+    author_count int DEFAULT NULL, -- NULL returns every matched author
+    snippet_length int DEFAULT 200,
+    probes int DEFAULT NULL,
+    ef_search int DEFAULT NULL
+)
+RETURNS TABLE (
+    author_id text,
+    similarity float,
+    text text
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF probes IS NOT NULL THEN
+        PERFORM set_config('ivfflat.probes', probes::text, true);
+    END IF;
+    -- HNSW returns at most ef_search rows, so never search narrower than match_count
+    PERFORM set_config('hnsw.ef_search', GREATEST(
+        COALESCE(ef_search, NULLIF(current_setting('hnsw.ef_search', true), '')::int, 40),
+        match_count)::text, true);
+    RETURN QUERY
+    WITH matches AS (
+        SELECT
+            embeddings.author_ids,
+            embeddings.text,
+            1 - (embeddings.embedding <=> query_embedding) AS similarity
+        FROM embeddings
+        WHERE 1 - (embeddings.embedding <=> query_embedding) > match_threshold
+        ORDER BY embeddings.embedding <=> query_embedding
+        LIMIT match_count
+    ),
+    best_per_author AS (
+        SELECT DISTINCT ON (a.author_id) a.author_id, m.similarity, m.text
+        FROM matches m
+        CROSS JOIN LATERAL unnest(m.author_ids) AS a(author_id)
+        ORDER BY a.author_id, m.similarity DESC
+    )
+    SELECT
+        b.author_id,
+        b.similarity,
+        CASE WHEN length(b.text) > snippet_length
+             THEN left(b.text, snippet_length) || '...'
+             ELSE b.text END
+    FROM best_per_author b
+    ORDER BY b.similarity DESC
+    LIMIT author_count;
+END;
+$$;
+
+-- Texts listing an author, oldest first, served by the GIN index on author_ids.
+-- max_texts NULL returns them all
+CREATE OR REPLACE FUNCTION author_texts(
+    author_id text,
+    max_texts int DEFAULT NULL
+)
+RETURNS TABLE (
+    text text
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT embeddings.text
+    FROM embeddings
+    WHERE embeddings.author_ids @> ARRAY[author_id]
+    ORDER BY embeddings.id
+    LIMIT max_texts;
+$$;
+
+-- Texts of several authors in one query (up to max_texts each, oldest first)
+CREATE OR REPLACE FUNCTION authors_texts(
+    author_list text[],
+    max_texts int DEFAULT NULL
+)
+RETURNS TABLE (
+    author_id text,
+    text text
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT ranked.author_id, ranked.text
+    FROM (
+        SELECT
+            a.author_id,
+            e.text,
+            row_number() OVER (PARTITION BY a.author_id ORDER BY e.id) AS position
+        FROM unnest(author_list) AS a(author_id)
+        JOIN embeddings e ON e.author_ids @> ARRAY[a.author_id]
+    ) ranked
+    WHERE max_texts IS NULL OR ranked.position <= max_texts
+    ORDER BY ranked.author_id, ranked.position;
+$$;
+
+-- Author profiles for two-stage author search: the mean chunk embedding of
+-- each author (cosine distance ignores scale, so the mean is not normalized)
+CREATE TABLE IF NOT EXISTS author_profiles (
+    author_id TEXT PRIMARY KEY,
+    embedding vector(768) NOT NULL,
+    chunk_count INT NOT NULL,
+    last_chunk_id BIGINT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS author_profiles_embedding_idx ON author_profiles USING hnsw (embedding vector_cosine_ops);
+
+-- Recomputes the profiles of authors with chunks added since the last refresh
+-- (of every author when full_refresh is true, e.g. after author ids were added
+-- to existing chunks). Returns the number of profiles written
+CREATE OR REPLACE FUNCTION refresh_author_profiles(full_refresh boolean DEFAULT false)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    since_id bigint := 0;
+    refreshed int;
+BEGIN
+    IF NOT full_refresh THEN
+        SELECT COALESCE(MAX(p.last_chunk_id), 0) INTO since_id FROM author_profiles p;
+    END IF;
+    INSERT INTO author_profiles (author_id, embedding, chunk_count, last_chunk_id, updated_at)
+    SELECT a.author_id, AVG(e.embedding), COUNT(*), MAX(e.id), NOW()
+    FROM embeddings e
+    CROSS JOIN LATERAL unnest(e.author_ids) AS a(author_id)
+    WHERE a.author_id IN (
+        SELECT DISTINCT unnest(n.author_ids) FROM embeddings n WHERE n.id > since_id
+    )
+    GROUP BY a.author_id
+    ON CONFLICT (author_id) DO UPDATE SET
+        embedding = EXCLUDED.embedding,
+        chunk_count = EXCLUDED.chunk_count,
+        last_chunk_id = EXCLUDED.last_chunk_id,
+        updated_at = EXCLUDED.updated_at;
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END;
+$$;
+
+-- Two-stage author search: nearest author profiles first, then (with rerank)
+-- each candidate's best chunk, found through the GIN index on author_ids,
+-- supplies the similarity and the snippet
+CREATE OR REPLACE FUNCTION match_author_profiles(
+    query_embedding vector(768),
+    match_threshold float,
+    author_count int,
+    rerank boolean DEFAULT true,
+    candidate_factor int DEFAULT 3,
+    snippet_length int DEFAULT 200,
+    probes int DEFAULT NULL,
+    ef_search int DEFAULT NULL
+)
+RETURNS TABLE (
+    author_id text,
+    similarity float,
+    text text
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    candidate_limit int := CASE WHEN rerank THEN author_count * candidate_factor ELSE author_count END;
+BEGIN
+    IF probes IS NOT NULL THEN
+        PERFORM set_config('ivfflat.probes', probes::text, true);
+    END IF;
+    -- The HNSW index on author_profiles returns at most ef_search rows, so
+    -- search at least as wide as the candidate list the rerank expects
+    PERFORM set_config('hnsw.ef_search', GREATEST(
+        COALESCE(ef_search, NULLIF(current_setting('hnsw.ef_search', true), '')::int, 40),
+        candidate_limit)::text, true);
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT
+            p.author_id,
+            1 - (p.embedding <=> query_embedding) AS profile_similarity
+        FROM author_profiles p
+        ORDER BY p.embedding <=> query_embedding
+        LIMIT candidate_limit
+    ),
+    best_chunk AS (
+        SELECT DISTINCT ON (c.author_id)
+            c.author_id,
+            c.profile_similarity,
+            1 - (e.embedding <=> query_embedding) AS chunk_similarity,
+            e.text
+        FROM candidates c
+        JOIN embeddings e ON e.author_ids @> ARRAY[c.author_id]
+        ORDER BY c.author_id, e.embedding <=> query_embedding
+    ),
+    ranked AS (
+        SELECT
+            b.author_id,
+            CASE WHEN rerank THEN b.chunk_similarity ELSE b.profile_similarity END AS score,
+            b.text
+        FROM best_chunk b
+    )
+    SELECT
+        r.author_id,
+        r.score,
+        CASE WHEN length(r.text) > snippet_length
+             THEN left(r.text, snippet_length) || '...'
+             ELSE r.text END
+    FROM ranked r
+    WHERE r.score > match_threshold
+    ORDER BY r.score DESC
+    LIMIT author_count;
+END;
+$$;
+
 -- Enable Row Level Security (RLS) - optional but recommended
 ALTER TABLE embeddings ENABLE ROW LEVEL SECURITY;
 
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+Pluggable vector-store backends shared by the CLI and the API.
+
+Every backend supports the same operations:
+  - add(text, vector, author_ids)    store a new chunk, returns its id
+  - find(text)                       id of an existing chunk with this text, or None
+  - add_author_id(chunk_id, author)  associate another author with a chunk
+  - search(query_vector, top_k, threshold, **options)
+                                     top-k chunks as {'id', 'text', 'author_ids', 'similarity'}
+  - search_authors(query_vector, top_k, threshold, author_count, snippet_length, **options)
+                                     best match per author among the top-k chunks, as
+                                     {'author_id', 'similarity', 'text'} (text truncated);
+                                     with two_stage=True, searches author profiles
+                                     (author_index.py) instead where the backend has them
+  - texts_for_author(author_id, limit)
+  - texts_for_authors(author_ids, limit)
+                                     {author_id: texts} for several authors in one query
+  - count() / version()              size, and a token that changes with the data
+
+Implementations:
+  - memory   : records held in a Python list, exact NumPy search
+  - local    : memory-mapped vector store (vector_store.py), searched through
+               its IVF index when one has been built (ann_index.py), else exactly
+  - pgvector : Supabase embeddings table; match_embeddings / match_authors RPCs
+               (per-query probes / ef_search, defaults PGVECTOR_PROBES / PGVECTOR_EF_SEARCH)
+
+`create_backend()` picks one from VECTOR_BACKEND (default 'pgvector', or
+'local' when only ANN_INDEX_PATH is set) and VECTOR_STORE_PATH.
+AUTHOR_TWO_STAGE=1 makes two-stage author search the default.
+VECTOR_PRECISION=float16|int8 keeps the in-process search matrix in reduced
+precision (quantization.py); for pgvector it searches the halfvec index
+instead (`pgvector_index.py rebuild --precision half`). VECTOR_RESCORE=N
+rescores the best top_k * N candidates at full precision (default 0: off).
+
+Usage:
+  python vector_backends.py bench --backends memory,local --store static/vectorstore
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from quantization import PRECISIONS
+from vector_search import VectorSearchEngine
+from vector_store import VectorStore, is_store, text_key
+from ann_index import StoreANNSearcher, DEFAULT_NPROBE
+from author_index import AuthorIndex, AuthorSearcher, DEFAULT_AUTHOR_COUNT
+
+# PostgREST "function not found in the schema cache" and Postgres undefined_function
+MISSING_FUNCTION_CODES = ('PGRST202', '42883')
+
+def is_missing_function(error):
+    """
+    True if an RPC failed because the function is not deployed, as opposed
+    to a timeout or server error that the next call may not hit.
+
+    Args:
+        error: The client's exception, or the body of an error response
+    """
+    code = getattr(error, 'code', None)
+    if code in MISSING_FUNCTION_CODES:
+        return True
+    return any(missing in str(error) for missing in MISSING_FUNCTION_CODES)
+
+def snippet(text, length=200):
+    """Truncates text for display, marking the cut with '...'."""
+    return text[:length] + '...' if len(text) > length else text
+
+def aggregate_by_author(matches, author_count=None, snippet_length=200):
+    """
+    Expands chunk matches to authors, keeping each author's best match.
+
+    Args:
+        matches (list[dict]): Chunk matches with author_ids, text, similarity
+        author_count (int): Keep only this many authors (None keeps all)
+        snippet_length (int): Truncate each author's matched text to this length
+
+    Returns:
+        list[dict]: {'author_id', 'similarity', 'text'} sorted by similarity
+    """
+    author_results = {}
+    for item in matches:
+        for author_id in item['author_ids']:
+            best = author_results.get(author_id)
+            if best is None or item['similarity'] > best['similarity']:
+                author_results[author_id] = {
+                    'author_id': author_id,
+                    'similarity': item['similarity'],
+                    'text': item['text']
+                }
+    final_results = sorted(author_results.values(), key=lambda x: x['similarity'], reverse=True)
+    if author_count is not None:
+        final_results = final_results[:author_count]
+    for result in final_results:
+        result['text'] = snippet(result['text'], snippet_length)
+    return final_results
+
+class VectorBackend:
+    """Interface implemented by every backend."""
+
+    name = 'base'
+
+    def add(self, text, vector, author_ids):
+        raise NotImplementedError
+
+    def find(self, text):
+        raise NotImplementedError
+
+    def add_author_id(self, chunk_id, author_id):
+        raise NotImplementedError
+
+    def search(self, query_vector, top_k=10, threshold=None, **options):
+        raise NotImplementedError
+
+    def search_authors(self, query_vector, top_k=200, threshold=None, author_count=None,
+                       snippet_length=200, **options):
+        """Top-k chunk search grouped by author (done in Python unless overridden)."""
+        matches = self.search(query_vector, top_k, threshold, **options)
+        return aggregate_by_author(matches, author_count, snippet_length)
+
+    def texts_for_author(self, author_id, limit=None):
+        raise NotImplementedError
+
+    def texts_for_authors(self, author_ids, limit=None):
+        """Texts per author; backends with a batch query override this."""
+        return {author_id: self.texts_for_author(author_id, limit) for author_id in author_ids}
+
+    def count(self):
+        raise NotImplementedError
+
+    def version(self):
+        """Changes whenever chunks are added or removed."""
+        return f"{self.name}:{self.count()}"
+
+class InMemoryBackend(VectorBackend):
+    """Records in a Python list with exact search; handy as an offline stand-in."""
+
+    name = 'memory'
+
+    def __init__(self, records=None, precision='float32', rescore=0):
+        self.records = list(records or [])
+        self.precision = precision
+        self.rescore = rescore
+        self.keys = {text_key(item['text']): i for i, item in enumerate(self.records)}
+        self.authors = {}  # author_id -> row indices
+        for i, item in enumerate(self.records):
+            for author_id in item['author_ids']:
+                self.authors.setdefault(author_id, []).append(i)
+        self._engine = None
+
+    @classmethod
+    def load(cls, path, precision='float32', rescore=0):
+        """Loads every record of a store directory or legacy JSON file into memory."""
+        if is_store(path):
+            store = VectorStore.open(path)
+            return cls(({'text': item['text'], 'vector': item['vector'], 'author_ids': list(item['author_ids'])}
+                        for item in store.iter_records()), precision, rescore)
+        with open(path, 'r') as f:
+            return cls(json.load(f), precision, rescore)
+
+    def engine(self):
+        if self._engine is None or len(self._engine) != len(self.records):
+            self._engine = VectorSearchEngine.from_db(self.records, self.precision)
+        return self._engine
+
+    def add(self, text, vector, author_ids):
+        self.records.append({'text': text, 'vector': list(vector), 'author_ids': list(author_ids)})
+        self.keys[text_key(text)] = len(self.records) - 1
+        for author_id in author_ids:
+            self.authors.setdefault(author_id, []).append(len(self.records) - 1)
+        return len(self.records) - 1
+
+    def find(self, text):
+        return self.keys.get(text_key(text))
+
+    def add_author_id(self, chunk_id, author_id):
+        if author_id not in self.records[chunk_id]['author_ids']:
+            self.records[chunk_id]['author_ids'].append(author_id)
+            self.authors.setdefault(author_id, []).append(chunk_id)
+            self.authors[author_id].sort()
+
+    def search(self, query_vector, top_k=10, threshold=None, rescore=None, **options):
+        return self.engine().search_records(query_vector, top_k, threshold,
+                                            self.rescore if rescore is None else rescore)
+
+    def texts_for_author(self, author_id, limit=None):
+        rows = self.authors.get(author_id, [])
+        return [self.records[i]['text'] for i in (rows[:limit] if limit else rows)]
+
+    def count(self):
+        return len(self.records)
+
+class LocalStoreBackend(VectorBackend):
+    """Memory-mapped vector store, with IVF search when an index exists."""
+
+    name = 'local'
+
+    def __init__(self, store, ann_searcher=None, default_nprobe=DEFAULT_NPROBE,
+                 author_index=None, two_stage=False, precision='float32', rescore=0):
+        self.store = store
+        self.ann_searcher = ann_searcher
+        self.default_nprobe = default_nprobe
+        self.two_stage = two_stage
+        self.precision = precision  # Of the exact engine; an IVF index keeps its build precision
+        self.rescore = rescore
+        self._engine = None
+        self._author_rows = None  # author_id -> row indices, built on first use
+        self.author_searcher = AuthorSearcher(store, author_index, self.author_rows) if author_index else None
+
+    @classmethod
+    def open(cls, path, default_nprobe=DEFAULT_NPROBE, two_stage=False, precision='float32', rescore=0):
+        return cls.from_store(VectorStore.open(path), default_nprobe, two_stage, precision, rescore)
+
+    @classmethod
+    def from_store(cls, store, default_nprobe=DEFAULT_NPROBE, two_stage=False, precision='float32', rescore=0):
+        """Wraps an already open store, picking up its IVF and author indexes if it has them."""
+        return cls(store, StoreANNSearcher.for_store(store, rescore), default_nprobe,
+                   AuthorIndex.for_store(store), two_stage, precision, rescore)
+
+    def engine(self):
+        if self._engine is None or len(self._engine) != len(self.store):
+            self._engine = VectorSearchEngine.from_db(self.store, self.precision)
+        return self._engine
+
+    def author_rows(self):
+        if self._author_rows is None:
+            self._author_rows = self.store.author_rows()
+        return self._author_rows
+
+    def add(self, text, vector, author_ids):
+        self.store.append({'text': text, 'vector': vector, 'author_ids': list(author_ids)})
+        self.store.save()
+        if self._author_rows is not None:
+            for author_id in author_ids:
+                self._author_rows.setdefault(author_id, []).append(len(self.store) - 1)
+        return len(self.store) - 1
+
+    def find(self, text):
+        index = self.store.find(text)
+        return index if index >= 0 else None
+
+    def add_author_id(self, chunk_id, author_id):
+        if author_id not in self.store[chunk_id]['author_ids']:
+            self.store.add_author_id(chunk_id, author_id)
+            self.store.save()
+            if self._author_rows is not None:
+                self._author_rows.setdefault(author_id, []).append(chunk_id)
+                self._author_rows[author_id].sort()
+
+    def search(self, query_vector, top_k=10, threshold=None, nprobe=None, exact=False, rescore=None, **options):
+        """Searches with the IVF index if present; `exact=True` forces a full scan."""
+        rescore = self.rescore if rescore is None else rescore
+        if self.ann_searcher is not None and not exact:
+            return self.ann_searcher.search_records(query_vector, top_k, nprobe or self.default_nprobe,
+                                                    threshold, rescore)
+        return self.engine().search_records(query_vector, top_k, threshold, rescore)
+
+    def search_authors(self, query_vector, top_k=200, threshold=None, author_count=None,
+                       snippet_length=200, two_stage=None, rerank=True, **options):
+        """Searches author profiles when asked to and an author index exists."""
+        if two_stage is None:
+            two_stage = self.two_stage
+        if not two_stage or self.author_searcher is None:
+            return super().search_authors(query_vector, top_k, threshold, author_count, snippet_length, **options)
+        results = self.author_searcher.search(query_vector, author_count or DEFAULT_AUTHOR_COUNT, threshold, rerank)
+        for result in results:
+            result['text'] = snippet(result['text'], snippet_length)
+        return results
+
+    def texts_for_author(self, author_id, limit=None):
+        rows = self.author_rows().get(author_id, [])
+        return [self.store.text(i) for i in (rows[:limit] if limit else rows)]
+
+    def count(self):
+        return len(self.store)
+
+    def version(self):
+        """Store generation plus its log size, which author additions grow too."""
+        return f"{self.name}:{self.store.version()}"
+
+class PgVectorBackend(VectorBackend):
+    """Supabase/pgvector embeddings table."""
+
+    name = 'pgvector'
+
+    def __init__(self, client, probes=None, ef_search=None, two_stage=False, precision='float32', rescore=0):
+        self.client = client
+        self.probes = probes
+        self.ef_search = ef_search
+        self.two_stage = two_stage
+        # Any reduced precision searches the halfvec index; pgvector has no int8 type
+        self.halfvec = precision != 'float32'
+        self.rescore = rescore
+        self.has_author_profiles = True
+        self.has_match_authors = True
+        self.has_author_texts = True
+        self.has_authors_texts = True
+
+    def index_params(self, probes=None, ef_search=None):
+        """Per-query index search width (see pgvector_index.py bench)."""
+        return {
+            'probes': probes if probes is not None else self.probes,
+            'ef_search': ef_search if ef_search is not None else self.ef_search
+        }
+
+    def add(self, text, vector, author_ids):
+        response = self.client.table('embeddings').insert({
+            'text': text,
+            'embedding': list(vector),
+            'author_ids': list(author_ids),
+            'content_hash': text_key(text)
+        }).execute()
+        return response.data[0]['id']
+
+    def find(self, text):
+        response = self.client.table('embeddings').select('id').eq('content_hash', text_key(text)).limit(1).execute()
+        return response.data[0]['id'] if response.data else None
+
+    def add_author_id(self, chunk_id, author_id):
+        response = self.client.table('embeddings').select('author_ids').eq('id', chunk_id).execute()
+        author_ids = response.data[0]['author_ids']
+        if author_id not in author_ids:
+            self.client.table('embeddings').update({'author_ids': author_ids + [author_id]}).eq('id', chunk_id).execute()
+
+    def search(self, query_vector, top_k=10, threshold=None, probes=None, ef_search=None, rescore=None, **options):
+        if self.halfvec:
+            rescore = self.rescore if rescore is None else rescore
+            try:
+                return self.client.rpc(
+                    'match_embeddings_halfvec',
+                    {
+                        'query_embedding': list(query_vector),
+                        'match_threshold': threshold if threshold is not None else -1.0,
+                        'match_count': top_k,
+                        'rescore_count': top_k * rescore if rescore else None,
+                        **self.index_params(probes, ef_search)
+                    }
+                ).execute().data
+            except Exception as e:
+                # pgvector before 0.7, or the updated schema has not been run
+                if not is_missing_function(e):
+                    raise
+                print(f"match_embeddings_halfvec RPC is not deployed, searching full precision instead: {e}")
+                self.halfvec = False
+        return self.client.rpc(
+            'match_embeddings',
+            {
+                'query_embedding': list(query_vector),
+                'match_threshold': threshold if threshold is not None else -1.0,
+                'match_count': top_k,
+                **self.index_params(probes, ef_search)
+            }
+        ).execute().data
+
+    def search_authors(self, query_vector, top_k=200, threshold=None, author_count=None,
+                       snippet_length=200, probes=None, ef_search=None, two_stage=None,
+                       rerank=True, **options):
+        """Groups by author inside Postgres with the match_authors RPC."""
+        if self.has_author_profiles and (two_stage if two_stage is not None else self.two_stage):
+            try:
+                # Author profiles maintained by refresh_author_profiles()
+                return self.client.rpc(
+                    'match_author_profiles',
+                    {
+                        'query_embedding': list(query_vector),
+                        'match_threshold': threshold if threshold is not None else -1.0,
+                        'author_count': author_count or DEFAULT_AUTHOR_COUNT,
+                        'rerank': rerank,
+                        'snippet_length': snippet_length,
+                        **self.index_params(probes, ef_search)
+                    }
+                ).execute().data
+            except Exception as e:
+                if not is_missing_function(e):
+                    raise
+                print(f"match_author_profiles RPC is not deployed, searching chunks instead: {e}")
+                self.has_author_profiles = False
+        # match_authors orders by the full-precision column, which a halfvec
+        # index does not serve; group the halfvec matches in Python instead
+        if self.has_match_authors and not self.halfvec:
+            try:
+                return self.client.rpc(
+                    'match_authors',
+                    {
+                        'query_embedding': list(query_vector),
+                        'match_threshold': threshold if threshold is not None else -1.0,
+                        'match_count': top_k,
+                        'author_count': author_count,
+                        'snippet_length': snippet_length,
+                        **self.index_params(probes, ef_search)
+                    }
+                ).execute().data
+            except Exception as e:
+                # Databases that have not run the updated schema yet; anything
+                # else (timeouts, 5xx) may not recur, so it is not remembered
+                if not is_missing_function(e):
+                    raise
+                print(f"match_authors RPC is not deployed, grouping in Python instead: {e}")
+                self.has_match_authors = False
+        return super().search_authors(query_vector, top_k, threshold, author_count, snippet_length,
+                                      probes=probes, ef_search=ef_search)
+
+    def texts_for_author(self, author_id, limit=None):
+        """Uses the author_texts RPC (GIN index on author_ids) when deployed."""
+        if self.has_author_texts:
+            try:
+                response = self.client.rpc('author_texts', {'author_id': author_id, 'max_texts': limit}).execute()
+                return [item['text'] for item in response.data]
+            except Exception as e:
+                if not is_missing_function(e):
+                    raise
+                print(f"author_texts RPC is not deployed, filtering the table instead: {e}")
+                self.has_author_texts = False
+        query = self.client.table('embeddings').select('text').contains('author_ids', [author_id])
+        if limit:
+            query = query.limit(limit)
+        return [item['text'] for item in query.execute().data]
+
+    def texts_for_authors(self, author_ids, limit=None):
+        """Fetches every author's texts with one authors_texts RPC when deployed."""
+        if self.has_authors_texts:
+            try:
+                response = self.client.rpc('authors_texts', {'author_list': list(author_ids), 'max_texts': limit}).execute()
+                texts = {author_id: [] for author_id in author_ids}
+                for item in response.data:
+                    texts[item['author_id']].append(item['text'])
+                return texts
+            except Exception as e:
+                if not is_missing_function(e):
+                    raise
+                print(f"authors_texts RPC is not deployed, querying authors one by one: {e}")
+                self.has_authors_texts = False
+        return super().texts_for_authors(author_ids, limit)
+
+    def count(self):
+        response = self.client.table('embeddings').select('id', count='exact').limit(1).execute()
+        return response.count if response.count is not None else 0
+
+    def version(self):
+        """
+        Row count plus the latest updated_at, which a trigger bumps on every
+        update, so appended author_ids change the version too.
+        """
+        response = (self.client.table('embeddings').select('updated_at', count='exact')
+                    .order('updated_at', desc=True).limit(1).execute())
+        updated_at = response.data[0]['updated_at'] if response.data else ''
+        return f"{self.name}:{response.count}:{updated_at}"
+
+def create_supabase_client():
+    """Creates a Supabase client from SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY."""
+    from supabase import create_client
+
+    url = os.getenv('SUPABASE_URL')
+    key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    if not url or not key:
+        raise ValueError("Supabase credentials not found in environment variables")
+    return create_client(url, key)
+
+def configured_backend_name():
+    """VECTOR_BACKEND, or 'local' when only ANN_INDEX_PATH is set, else 'pgvector'."""
+    return os.getenv('VECTOR_BACKEND') or ('local' if os.getenv('ANN_INDEX_PATH') else 'pgvector')
+
+def two_stage_default():
+    """Whether AUTHOR_TWO_STAGE makes two-stage author search the default."""
+    return os.getenv('AUTHOR_TWO_STAGE', '').lower() in ('1', 'true', 'yes')
+
+def create_backend(name=None, store_path=None):
+    """
+    Creates the configured backend.
+
+    Args:
+        name (str): 'memory', 'local' or 'pgvector' (default: VECTOR_BACKEND,
+            or 'local' when only ANN_INDEX_PATH is set, else 'pgvector')
+        store_path (str): Store directory or JSON file for the local backends
+            (default: VECTOR_STORE_PATH, then ANN_INDEX_PATH)
+
+    Returns:
+        VectorBackend: The backend
+    """
+    store_path = store_path or os.getenv('VECTOR_STORE_PATH') or os.getenv('ANN_INDEX_PATH')
+    two_stage = two_stage_default()
+    precision = os.getenv('VECTOR_PRECISION') or 'float32'
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown VECTOR_PRECISION {precision!r}; choose from {', '.join(PRECISIONS)}")
+    rescore = int(os.getenv('VECTOR_RESCORE') or 0)
+    name = name or configured_backend_name()
+    if name == 'memory':
+        return InMemoryBackend.load(store_path, precision, rescore) if store_path else InMemoryBackend(None, precision, rescore)
+    if name == 'local':
+        if not store_path:
+            raise ValueError("VECTOR_STORE_PATH must be set for the local backend")
+        return LocalStoreBackend.open(store_path, int(os.getenv('ANN_NPROBE', DEFAULT_NPROBE)), two_stage,
+                                      precision, rescore)
+    if name == 'pgvector':
+        probes = os.getenv('PGVECTOR_PROBES')
+        ef_search = os.getenv('PGVECTOR_EF_SEARCH')
+        return PgVectorBackend(create_supabase_client(),
+                               int(probes) if probes else None,
+                               int(ef_search) if ef_search else None,
+                               two_stage, precision, rescore)
+    raise ValueError(f"Unknown vector backend: {name}")
+
+def benchmark(backends, store_path, n_queries=100, top_k=200, seed=0):
+    """Runs the same sampled queries against each backend and prints latencies."""
+    store = VectorStore.open(store_path)
+    rng = np.random.default_rng(seed)
+    queries = store.vectors[rng.choice(len(store), min(n_queries, len(store)), replace=False)]
+    reference = None
+    for name in backends:
+        backend = create_backend(name, store_path)
+        latencies = []
+        results = []
+        for query in queries:
+            started = time.perf_counter()
+            matches = backend.search(query.tolist(), top_k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            results.append({text_key(item['text']) for item in matches})
+        if reference is None:
+            reference = results
+        overlap = np.mean([len(a & b) / max(len(a), 1) for a, b in zip(reference, results)])
+        print(f"{name:<10} p50={np.percentile(latencies, 50):7.2f}ms "
+              f"p99={np.percentile(latencies, 99):7.2f}ms overlap with {backends[0]}={overlap:.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Vector backend utilities')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    bench_parser = subparsers.add_parser('bench', help='Compare search latency across backends')
+    bench_parser.add_argument('--backends', default='memory,local')
+    bench_parser.add_argument('--store', required=True, help='Store used for queries and local backends')
+    bench_parser.add_argument('--queries', type=int, default=100)
+    bench_parser.add_argument('--k', type=int, default=200)
+
+    args = parser.parse_args()
+    if args.command == 'bench':
+        if os.path.exists('config.env'):
+            from dotenv import load_dotenv
+            load_dotenv('config.env')
+        benchmark(args.backends.split(','), args.store, args.queries, args.k)
+
+if __name__ == "__main__":
+    main()
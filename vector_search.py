@@ -0,0 +1,134 @@
+import numpy as np
+
+# --- In-process vector search engine ---
+#
+# Builds a pre-normalized float32 matrix once from the database so that each
+# query is a single matrix-vector product followed by an argpartition top-k.
+# The matrix can also be kept in float16 or int8 (quantization.py), with the
+# best candidates optionally rescored against the full-precision vectors.
+
+def normalize_rows(matrix):
+    """
+    L2-normalizes every row of a 2D array in place (zero rows stay zero).
+
+    Args:
+        matrix (np.ndarray): float32 array of shape (n, dim)
+
+    Returns:
+        np.ndarray: The same array, normalized
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+def top_k_indices(scores, k):
+    """
+    Returns the indices of the k highest scores, sorted by score descending.
+
+    Uses argpartition so only the k winners are fully sorted.
+    """
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind='stable')
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+class VectorSearchEngine:
+    """
+    Cosine-similarity search over a pre-normalized matrix.
+
+    The engine keeps a reference to the records it was built from so that
+    results can carry `text` and `author_ids` without copying them. In
+    float32 the search is exact; in float16 or int8 it is approximate unless
+    the candidates are rescored.
+    """
+
+    def __init__(self, vectors, records=None, precision='float32'):
+        """
+        Args:
+            vectors: array-like of shape (n, dim)
+            records: Optional sequence of dicts aligned with `vectors`
+            precision (str): 'float32', 'float16' or 'int8'
+        """
+        self.records = records
+        self.precision = precision
+        self.source = None
+        if precision != 'float32':
+            from quantization import quantize_rows
+
+            self.matrix = quantize_rows(vectors, precision)
+            # Full-precision rows for rescoring (memory-mapped for stores)
+            self.source = vectors
+            return
+        matrix = np.array(vectors, dtype=np.float32, copy=True)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(0, 0) if matrix.size == 0 else matrix.reshape(1, -1)
+        self.matrix = normalize_rows(matrix)
+
+    @classmethod
+    def from_db(cls, db, precision='float32'):
+        """
+        Builds an engine from a list of {'text', 'vector', 'author_ids'} dicts,
+        or from any store exposing a `vectors` matrix.
+        """
+        if not db:
+            return cls(np.zeros((0, 0), dtype=np.float32), db)
+        if hasattr(db, 'vectors'):
+            return cls(db.vectors, db, precision)
+        return cls([item['vector'] for item in db], db, precision)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def scores(self, query_vector):
+        """Returns the cosine similarity of `query_vector` to every row."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or len(self) == 0:
+            return np.zeros(len(self), dtype=np.float32)
+        return self.matrix @ (query / norm)
+
+    def search(self, query_vector, top_k=3, threshold=None, rescore=0):
+        """
+        Finds the rows most similar to `query_vector`.
+
+        Args:
+            query_vector: The query embedding
+            top_k (int): Number of results to return
+            threshold (float): Optional minimum similarity
+            rescore (int): For a reduced-precision matrix, rescore
+                `top_k * rescore` candidates in float32 (0 keeps the
+                approximate scores)
+
+        Returns:
+            list[tuple[int, float]]: (row index, similarity) pairs, best first
+        """
+        scores = self.scores(query_vector)
+        if rescore and self.source is not None and len(self):
+            from quantization import rescore as rescore_candidates
+
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            results = rescore_candidates(top_k_indices(scores, top_k * rescore), query, self.source, top_k)
+        else:
+            indices = top_k_indices(scores, top_k)
+            results = [(int(i), float(scores[i])) for i in indices]
+        if threshold is not None:
+            results = [(i, s) for i, s in results if s > threshold]
+        return results
+
+    def search_records(self, query_vector, top_k=3, threshold=None, rescore=0):
+        """Like `search`, but returns result dicts with text and author_ids."""
+        results = []
+        for index, similarity in self.search(query_vector, top_k, threshold, rescore):
+            item = self.records[index]
+            results.append({
+                'id': index,
+                'text': item['text'],
+                'similarity': similarity,
+                'author_ids': item['author_ids']
+            })
+        return results
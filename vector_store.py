@@ -0,0 +1,790 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped, append-only binary vector store.
+
+A store is a directory holding:
+  - CURRENT        : JSON manifest naming the live base segment and how far
+                     each append log has already been folded into it
+  - base-NNNNNN/   : immutable base segment (the previous one is kept until
+                     the next compaction, for readers still opening it)
+      meta.json     : {"version", "count", "dim", "dtype"}
+      vectors.f32   : contiguous float32 matrix of shape (count, dim)
+      records.jsonl : one {"text", "author_ids"} object per line
+      offsets.i64   : count + 1 int64 byte offsets into records.jsonl
+      keys.bin      : count sha256 digests of the normalized text
+      key_prefix.u64: sorted 8-byte digest prefixes  } persisted hash index,
+      key_rows.i64  : row id for each sorted prefix  } digest -> row id
+  - logs/          : one append-only JSONL log per writer process
+  - LOCK           : held while compacting
+
+Opening a store maps the base segment and replays only the unfolded tail of
+the logs, so startup does not depend on corpus size. Duplicate detection goes
+through the digest index (`find`), never through a scan of the texts. New chunks and author-id
+additions are appended to the writer's own log, never rewriting the base.
+`compact()` folds all logs into a new base segment and commits it by
+atomically replacing CURRENT. The legacy vectorbig.json format can be
+imported/exported.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import threading
+import unicodedata
+import uuid
+
+import numpy as np
+
+STORE_VERSION = 1
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'LOCK'
+LOGS_DIR = 'logs'
+META_FILE = 'meta.json'
+VECTORS_FILE = 'vectors.f32'
+RECORDS_FILE = 'records.jsonl'
+OFFSETS_FILE = 'offsets.i64'
+KEYS_FILE = 'keys.bin'
+KEY_PREFIX_FILE = 'key_prefix.u64'
+KEY_ROWS_FILE = 'key_rows.i64'
+KEY_BYTES = 32
+KEY_FORMAT = 'sha256-nfc-ws'  # Bump when normalize_text changes
+KEEP_SEGMENTS = 2  # Base segments kept on disk, including the live one
+
+def is_store(path):
+    """Returns True if `path` is a vector store directory."""
+    return (os.path.isfile(os.path.join(path, CURRENT_FILE))
+            or os.path.isfile(os.path.join(path, META_FILE)))
+
+def normalize_text(text):
+    """Canonical form used for dedup: NFC unicode with collapsed whitespace."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+def text_key(text):
+    """Hex digest of the normalized text; chunks with equal keys are duplicates."""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+def _key_prefix(key_bytes):
+    return int.from_bytes(key_bytes[:8], 'big')
+
+def _write_key_index(segment_path, prefixes):
+    """Writes the sorted prefix -> row index for a segment's keys."""
+    prefixes = np.asarray(prefixes, dtype=np.uint64)
+    rows = np.argsort(prefixes, kind='stable').astype(np.int64)
+    for name, array in ((KEY_PREFIX_FILE, prefixes[rows]), (KEY_ROWS_FILE, rows)):
+        tmp_file = os.path.join(segment_path, f"{name}.tmp-{os.getpid()}")
+        array.tofile(tmp_file)
+        os.replace(tmp_file, os.path.join(segment_path, name))
+
+def _map_array(path, dtype, shape):
+    """Memory-maps a raw binary file read-only, tolerating empty files."""
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+def _map_bytes(path):
+    """Memory-maps a file read-only as bytes; None if it is empty."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _fsync_dir(path):
+    """Flushes a directory entry so a rename survives a crash."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_segment(segment_path, records, dim=None):
+    """
+    Writes records into a new immutable segment directory.
+
+    Args:
+        segment_path (str): Directory to create
+        records: Iterable of {'text', 'vector', 'author_ids'} dicts
+        dim (int): Vector dimension, required only if `records` is empty
+
+    Returns:
+        int: Number of records written
+    """
+    os.makedirs(segment_path)
+    count = 0
+    offset = 0
+    prefixes = []
+    with open(os.path.join(segment_path, VECTORS_FILE), 'wb') as vectors_file, \
+            open(os.path.join(segment_path, RECORDS_FILE), 'wb') as records_file, \
+            open(os.path.join(segment_path, OFFSETS_FILE), 'wb') as offsets_file, \
+            open(os.path.join(segment_path, KEYS_FILE), 'wb') as keys_file:
+        offsets_file.write(np.int64(0).tobytes())
+        for item in records:
+            vector = np.asarray(item['vector'], dtype=np.float32)
+            if not dim:
+                dim = vector.shape[0]
+            elif vector.shape[0] != dim:
+                raise ValueError(f"Record {count} has dimension {vector.shape[0]}, expected {dim}")
+            vectors_file.write(vector.tobytes())
+
+            line = json.dumps({'text': item['text'], 'author_ids': list(item['author_ids'])},
+                              ensure_ascii=False).encode('utf-8') + b'\n'
+            records_file.write(line)
+            offset += len(line)
+            offsets_file.write(np.int64(offset).tobytes())
+            key_bytes = bytes.fromhex(text_key(item['text']))
+            keys_file.write(key_bytes)
+            prefixes.append(_key_prefix(key_bytes))
+            count += 1
+        for f in (vectors_file, records_file, offsets_file, keys_file):
+            f.flush()
+            os.fsync(f.fileno())
+    _write_key_index(segment_path, prefixes)
+
+    with open(os.path.join(segment_path, META_FILE), 'w') as f:
+        json.dump({'version': STORE_VERSION, 'count': count, 'dim': dim or 0, 'dtype': 'float32',
+                   'key_format': KEY_FORMAT}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    return count
+
+def _read_manifest(path):
+    with open(os.path.join(path, CURRENT_FILE), 'r') as f:
+        return json.load(f)
+
+def _write_manifest(path, manifest):
+    """Atomically replaces CURRENT; this is the commit point of every compaction."""
+    tmp_file = os.path.join(path, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, os.path.join(path, CURRENT_FILE))
+    _fsync_dir(path)
+
+def _segment_name(generation):
+    return f"base-{generation:06d}"
+
+def _prune_segments(path, generation, keep=KEEP_SEGMENTS):
+    """
+    Removes base segments more than `keep - 1` generations older than
+    `generation`. The previous base is kept because a process may have read
+    CURRENT just before it was replaced and not have mapped the segment yet;
+    once mapped, a segment stays readable after it is deleted.
+    """
+    for name in os.listdir(path):
+        if name.startswith('base-') and name[5:].isdigit() and int(name[5:]) <= generation - keep:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+def _upgrade_single_segment(path):
+    """Moves a store written before segmenting (meta.json at the root) into base-000000."""
+    segment = os.path.join(path, _segment_name(0))
+    os.makedirs(segment, exist_ok=True)
+    for name in (VECTORS_FILE, RECORDS_FILE, OFFSETS_FILE, META_FILE):
+        if os.path.exists(os.path.join(path, name)):
+            os.rename(os.path.join(path, name), os.path.join(segment, name))
+    os.makedirs(os.path.join(path, LOGS_DIR), exist_ok=True)
+    _write_manifest(path, {'generation': 0, 'base': _segment_name(0), 'consumed': {}})
+
+def write_store(path, records, dim=None):
+    """
+    Writes records to a new store directory, streaming one record at a time.
+
+    The store is written to a temporary directory next to `path` and moved
+    into place once complete, so a crash never leaves a half-written store.
+
+    Args:
+        path (str): Destination directory
+        records: Iterable of {'text', 'vector', 'author_ids'} dicts
+        dim (int): Vector dimension, required only if `records` is empty
+
+    Returns:
+        int: Number of records written
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(os.path.join(tmp_path, LOGS_DIR))
+    count = _write_segment(os.path.join(tmp_path, _segment_name(1)), records, dim)
+    _write_manifest(tmp_path, {'generation': 1, 'base': _segment_name(1), 'consumed': {}})
+
+    # Swap the finished directory into place
+    if os.path.exists(path):
+        old_path = f"{path}.old-{os.getpid()}"
+        os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path)
+    else:
+        os.rename(tmp_path, path)
+    return count
+
+def _log_names(logs_dir):
+    """Published logs, sorted; logs still being created are skipped."""
+    return sorted(name for name in os.listdir(logs_dir) if name.endswith('.jsonl'))
+
+def read_log(log_path, start=0):
+    """
+    Yields (entry, end_offset) for each complete entry in a log after `start`.
+
+    A trailing line without a newline is an interrupted (or in-progress)
+    write and is not returned.
+    """
+    with open(log_path, 'rb') as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            yield entry, offset
+
+class VectorStore:
+    """
+    List-like view over a store directory.
+
+    Indexing returns {'text', 'vector', 'author_ids'} dicts like the legacy
+    JSON database, so existing callers keep working. Base rows are decoded on
+    every access and carry a memory-mapped vector row; change them through
+    `add_author_id`, not by editing the returned dict. `append` and
+    `add_author_id` are written to this process's log immediately; several
+    processes may write to the same store at once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isfile(os.path.join(path, CURRENT_FILE)):
+            _upgrade_single_segment(path)
+        self._log_file = None
+        self._log_name = None
+        self._records = None
+        self._lock = threading.Lock()  # Guards logged author additions across threads
+        self._load()
+
+    def _load(self, until=None):
+        """
+        Maps the current base segment and replays unfolded log entries.
+
+        Args:
+            until (dict): Optional per-log byte offsets to stop replay at
+        """
+        while True:
+            manifest = _read_manifest(self.path)
+            try:
+                complete = self._load_manifest(manifest, until)
+            except FileNotFoundError:
+                # The segment was pruned by two compactions since CURRENT was read
+                if until is not None or _read_manifest(self.path)['generation'] == manifest['generation']:
+                    raise
+                self.close()
+                continue
+            # A log vanishes only when a compaction has folded it in. If that
+            # compaction wrote this manifest, the entries are in the base;
+            # otherwise reload from the newer manifest.
+            if complete or _read_manifest(self.path)['generation'] == manifest['generation']:
+                return manifest
+            self.close()
+
+    def _load_manifest(self, manifest, until=None):
+        """Loads one manifest's base and logs; False if a log vanished meanwhile."""
+        self.generation = manifest['generation']
+        self.base_name = manifest['base']
+        segment = os.path.join(self.path, self.base_name)
+        with open(os.path.join(segment, META_FILE), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported store version in {segment}: {meta.get('version')}")
+        self.dim = meta['dim']
+        self.base_count = meta['count']
+        self.base_vectors = _map_array(os.path.join(segment, VECTORS_FILE), np.float32,
+                                       (self.base_count, self.dim))
+        self.offsets = _map_array(os.path.join(segment, OFFSETS_FILE), np.int64,
+                                  (self.base_count + 1,))
+        # Mapped rather than read through a shared file position, so threads
+        # can decode records concurrently
+        self._records = _map_bytes(os.path.join(segment, RECORDS_FILE))
+        if meta.get('key_format') != KEY_FORMAT:
+            self._rebuild_key_index(segment, meta)
+        self.base_keys = _map_array(os.path.join(segment, KEYS_FILE), np.uint8,
+                                    (self.base_count, KEY_BYTES))
+        self.key_prefixes = _map_array(os.path.join(segment, KEY_PREFIX_FILE), np.uint64,
+                                       (self.base_count,))
+        self.key_rows = _map_array(os.path.join(segment, KEY_ROWS_FILE), np.int64,
+                                   (self.base_count,))
+        self._extra_authors = {}  # Logged author additions for base rows
+        self._pending = []        # Rows added through the logs
+        self._pending_keys = {}   # text_key -> pending row index
+        self._vectors = None      # Cached base + pending matrix
+        return self._replay_logs(manifest.get('consumed', {}), until)
+
+    def _replay_logs(self, consumed, until=None):
+        """Replays the logs; returns False if one was removed before it was read."""
+        logs_dir = os.path.join(self.path, LOGS_DIR)
+        if not os.path.isdir(logs_dir):
+            return True
+        names = sorted(until) if until is not None else _log_names(logs_dir)
+        complete = True
+        for name in names:
+            try:
+                for entry, end in read_log(os.path.join(logs_dir, name), consumed.get(name, 0)):
+                    if until is not None and end > until[name]:
+                        break
+                    self._apply(entry)
+            except FileNotFoundError:
+                if until is not None:
+                    raise
+                complete = False
+        return complete
+
+    def _rebuild_key_index(self, segment, meta):
+        """Recomputes a segment's digest index from its texts (older layouts)."""
+        print(f"Rebuilding content-hash index for {segment}...")
+        keys = bytearray()
+        prefixes = []
+        for i in range(self.base_count):
+            key_bytes = bytes.fromhex(text_key(self._read_record(i)['text']))
+            keys += key_bytes
+            prefixes.append(_key_prefix(key_bytes))
+        tmp_file = os.path.join(segment, f"{KEYS_FILE}.tmp-{os.getpid()}")
+        with open(tmp_file, 'wb') as f:
+            f.write(keys)
+        os.replace(tmp_file, os.path.join(segment, KEYS_FILE))
+        _write_key_index(segment, prefixes)
+        meta['key_format'] = KEY_FORMAT
+        tmp_file = os.path.join(segment, f"{META_FILE}.tmp-{os.getpid()}")
+        with open(tmp_file, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, os.path.join(segment, META_FILE))
+
+    def find_key(self, key):
+        """
+        Looks up a row by text_key.
+
+        Args:
+            key (str): Hex digest from `text_key`
+
+        Returns:
+            int: Row index, or -1 if no row has this key
+        """
+        pending = self._pending_keys.get(key)
+        if pending is not None:
+            return self.base_count + pending
+        key_bytes = bytes.fromhex(key)
+        prefix = np.uint64(_key_prefix(key_bytes))
+        lo = int(np.searchsorted(self.key_prefixes, prefix, side='left'))
+        hi = int(np.searchsorted(self.key_prefixes, prefix, side='right'))
+        for j in range(lo, hi):
+            row = int(self.key_rows[j])
+            if self.base_keys[row].tobytes() == key_bytes:
+                return row
+        return -1
+
+    def find(self, text):
+        """Returns the row holding `text` (after normalization), or -1."""
+        return self.find_key(text_key(text))
+
+    def _apply(self, entry):
+        """Applies one log entry to the in-memory view."""
+        if entry['op'] == 'add':
+            existing = self.find_key(entry['key'])
+            if existing >= 0:
+                # Two writers added the same text; merge instead of duplicating
+                for author_id in entry['author_ids']:
+                    self._add_author_in_memory(existing, author_id)
+                return
+            if self.dim == 0:
+                self.dim = len(entry['vector'])
+            self._pending_keys[entry['key']] = len(self._pending)
+            self._pending.append({
+                'text': entry['text'],
+                'vector': entry['vector'],
+                'author_ids': list(entry['author_ids'])
+            })
+        elif entry['op'] == 'author':
+            self._add_author_in_memory(entry['row'], entry['author_id'])
+
+    def _add_author_in_memory(self, index, author_id):
+        with self._lock:
+            if index < self.base_count:
+                author_ids = self._extra_authors.setdefault(index, [])
+            else:
+                author_ids = self._pending[index - self.base_count]['author_ids']
+            if author_id not in author_ids:
+                author_ids.append(author_id)
+
+    @classmethod
+    def open(cls, path):
+        """Opens an existing store."""
+        return cls(path)
+
+    @classmethod
+    def create(cls, path, dim=0):
+        """Creates an empty store and opens it."""
+        write_store(path, [], dim=dim)
+        return cls(path)
+
+    def __len__(self):
+        return self.base_count + len(self._pending)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('vector store index out of range')
+        if index >= self.base_count:
+            return self._pending[index - self.base_count]
+        return self._base_row(index)
+
+    def _base_row(self, index):
+        """
+        Decodes a base row. Nothing is cached, so memory does not grow with
+        the rows read; the vector is a read-only view of the mapped matrix.
+        """
+        row = self._read_record(index)
+        row['author_ids'] = self._merge_extra_authors(index, row['author_ids'])
+        row['vector'] = self.base_vectors[index]
+        return row
+
+    def _merge_extra_authors(self, index, author_ids):
+        extra = self._extra_authors.get(index)
+        if not extra:
+            return author_ids
+        return author_ids + [author_id for author_id in extra if author_id not in author_ids]
+
+    def _read_record(self, index):
+        """Decodes the text/author_ids sidecar entry for a base row."""
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return json.loads(self._records[start:end])
+
+    def text(self, index):
+        """Returns a row's text without decoding its vector."""
+        if index >= self.base_count:
+            return self._pending[index - self.base_count]['text']
+        return self._read_record(index)['text']
+
+    def author_ids(self, index):
+        """Returns a row's author ids without decoding its vector."""
+        if index >= self.base_count:
+            return self._pending[index - self.base_count]['author_ids']
+        return self._merge_extra_authors(index, self._read_record(index)['author_ids'])
+
+    def author_rows(self):
+        """
+        Maps every author id to the rows that list it.
+
+        Reads the mapped records sidecar rather than decoding rows, so
+        building the map loads no vectors.
+
+        Returns:
+            dict: author_id -> list of row indices, in row order
+        """
+        authors = {}
+        for index in range(self.base_count):
+            for author_id in self.author_ids(index):
+                rows = authors.setdefault(author_id, [])
+                if not rows or rows[-1] != index:
+                    rows.append(index)
+        for offset, item in enumerate(self._pending):
+            for author_id in item['author_ids']:
+                authors.setdefault(author_id, []).append(self.base_count + offset)
+        return authors
+
+    def iter_records(self):
+        """
+        Yields every row as a {'text', 'vector', 'author_ids'} dict without
+        caching it; base rows carry their memory-mapped float32 vector, so
+        walking the store holds one row at a time.
+        """
+        for index in range(self.base_count):
+            yield self._base_row(index)
+        yield from self._pending
+
+    def vectors_for(self, rows):
+        """
+        Gathers the vectors of the given rows into a float32 matrix.
+
+        Base rows are read from the mapped matrix and pending rows from their
+        log entries, so only the requested rows are copied; search paths use
+        this instead of `vectors`, which concatenates the whole store while
+        log entries are pending.
+        """
+        rows = np.asarray(rows, dtype=np.int64).reshape(-1)
+        in_base = rows < self.base_count
+        if in_base.all():
+            return self.base_vectors[rows]
+        out = np.empty((rows.shape[0], self.dim), dtype=np.float32)
+        out[in_base] = self.base_vectors[rows[in_base]]
+        for position in np.flatnonzero(~in_base):
+            out[position] = self._pending[rows[position] - self.base_count]['vector']
+        return out
+
+    @property
+    def vectors(self):
+        """float32 matrix of every vector; memory-mapped when nothing is pending."""
+        if not self._pending:
+            return self.base_vectors
+        if self._vectors is None or self._vectors.shape[0] != len(self):
+            pending = np.asarray([item['vector'] for item in self._pending], dtype=np.float32)
+            self._vectors = np.concatenate([self.base_vectors.reshape(-1, pending.shape[1]), pending])
+        return self._vectors
+
+    # --- Writes ---
+
+    def _write_log(self, entry):
+        """Appends one entry to this process's log with a single write call."""
+        if self._log_file is None:
+            os.makedirs(os.path.join(self.path, LOGS_DIR), exist_ok=True)
+            self._log_name = f"log-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl"
+            log_path = os.path.join(self.path, LOGS_DIR, self._log_name)
+            # Shared lock tells compaction this log still has a live writer;
+            # it is taken before the log is published under its real name,
+            # so compaction never sees the log unlocked while it is in use
+            self._log_file = open(f"{log_path}.tmp", 'ab')
+            fcntl.flock(self._log_file.fileno(), fcntl.LOCK_SH)
+            os.rename(f"{log_path}.tmp", log_path)
+        line = json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n'
+        self._log_file.write(line)
+        self._log_file.flush()
+
+    def append(self, item):
+        """Appends a {'text', 'vector', 'author_ids'} dict."""
+        entry = {
+            'op': 'add',
+            'key': text_key(item['text']),
+            'text': item['text'],
+            'author_ids': list(item['author_ids']),
+            'vector': [float(x) for x in item['vector']]
+        }
+        self._write_log(entry)
+        self._apply(entry)
+
+    def add_author_id(self, index, author_id):
+        """Associates an extra author with an existing row."""
+        if index < 0:
+            index += len(self)
+        if index < self.base_count:
+            # Base rows keep their index across compactions
+            entry = {'op': 'author', 'row': index, 'author_id': author_id}
+        else:
+            # Logged rows may live in another writer's log, so re-log the
+            # whole chunk; replay and compaction merge it by key
+            item = self[index]
+            entry = {
+                'op': 'add',
+                'key': text_key(item['text']),
+                'text': item['text'],
+                'author_ids': [author_id],
+                'vector': [float(x) for x in item['vector']]
+            }
+        self._write_log(entry)
+        self._apply(entry)
+
+    def save(self):
+        """Makes all logged writes durable."""
+        if self._log_file is not None:
+            self._log_file.flush()
+            os.fsync(self._log_file.fileno())
+
+    def log_bytes(self, manifest=None):
+        """Total size of log data not yet folded into the base segment."""
+        manifest = manifest or _read_manifest(self.path)
+        logs_dir = os.path.join(self.path, LOGS_DIR)
+        total = 0
+        for name in _log_names(logs_dir):
+            try:
+                size = os.path.getsize(os.path.join(logs_dir, name))
+            except FileNotFoundError:
+                continue  # Folded and removed by a concurrent compaction
+            total += size - manifest['consumed'].get(name, 0)
+        return total
+
+    def version(self):
+        """
+        Token that changes on every write to the store on disk, by any
+        process: appends and author additions grow the logs, and compaction
+        bumps the generation.
+        """
+        manifest = _read_manifest(self.path)
+        return f"{manifest['generation']}:{self.log_bytes(manifest)}"
+
+    def compact(self):
+        """
+        Folds every log into a new immutable base segment.
+
+        Base rows keep their indices, so concurrent writers that reference
+        base rows by index stay valid. Logs whose writer has exited are
+        deleted; logs still being written are folded up to their current
+        length and replay resumes from there.
+
+        Returns:
+            int: Number of rows in the new base segment
+        """
+        self._close_log()
+        with open(os.path.join(self.path, LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            self.close()
+            manifest = _read_manifest(self.path)
+            logs_dir = os.path.join(self.path, LOGS_DIR)
+            consumed = dict(manifest.get('consumed', {}))
+
+            # Snapshot how far each log gets folded, and which logs are finished.
+            # A log whose exclusive lock we get has no writer, and none can
+            # return (writers never reopen a log), so reading it to EOF while
+            # holding the lock sees every entry it will ever have.
+            finished = {}
+            try:
+                for name in _log_names(logs_dir):
+                    log_path = os.path.join(logs_dir, name)
+                    log_file = open(log_path, 'rb')
+                    try:
+                        fcntl.flock(log_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        finished[name] = log_file
+                    except BlockingIOError:
+                        log_file.close()
+                    end = consumed.get(name, 0)
+                    for _, end in read_log(log_path, end):
+                        pass
+                    consumed[name] = end
+
+                # Reload so the view contains exactly the snapshotted entries
+                self._load(until=consumed)
+
+                # Replay already merged duplicate adds, so pending rows are all new
+                generation = manifest['generation'] + 1
+                new_base = _segment_name(generation)
+                count = _write_segment(os.path.join(self.path, new_base), self.iter_records(), self.dim)
+                _fsync_dir(self.path)
+
+                for name in finished:
+                    consumed.pop(name)
+                _write_manifest(self.path, {'generation': generation, 'base': new_base, 'consumed': consumed})
+
+                for name in finished:
+                    os.remove(os.path.join(logs_dir, name))
+            finally:
+                for log_file in finished.values():
+                    log_file.close()
+            _prune_segments(self.path, generation)
+            self.close()
+            self._load()
+        return count
+
+    def _close_log(self):
+        """Closes this process's log; the next write starts a new one."""
+        if self._log_file is not None:
+            self.save()
+            self._log_file.close()
+            self._log_file = None
+            self._log_name = None
+
+    def close(self):
+        """Releases the sidecar mapping."""
+        if self._records is not None:
+            self._records.close()
+            self._records = None
+
+def load_records(path):
+    """
+    Opens a database that may be either a store directory or legacy JSON.
+
+    Args:
+        path (str): Store directory or vectorbig.json-style file
+
+    Returns:
+        VectorStore | list: The records
+    """
+    if is_store(path):
+        return VectorStore.open(path)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def import_json(json_path, store_path):
+    """Converts a legacy JSON database into a store directory."""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    return write_store(store_path, data)
+
+def export_json(store_path, json_path):
+    """Writes a store directory back out in the legacy JSON format."""
+    store = VectorStore.open(store_path)
+    with open(json_path, 'w') as f:
+        f.write('[')
+        for i, item in enumerate(store.iter_records()):
+            if i:
+                f.write(',')
+            f.write('\n')
+            json.dump({'text': item['text'], 'vector': [float(x) for x in item['vector']],
+                       'author_ids': item['author_ids']}, f)
+        f.write('\n]\n')
+    store.close()
+    return len(store)
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the binary vector store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Convert a JSON database into a store')
+    import_parser.add_argument('json_path')
+    import_parser.add_argument('store_path')
+
+    export_parser = subparsers.add_parser('export', help='Convert a store into a JSON database')
+    export_parser.add_argument('store_path')
+    export_parser.add_argument('json_path')
+
+    compact_parser = subparsers.add_parser('compact', help='Fold append logs into a new base segment')
+    compact_parser.add_argument('store_path')
+
+    lookup_parser = subparsers.add_parser('lookup', help='Check whether a text is already stored')
+    lookup_parser.add_argument('store_path')
+    lookup_parser.add_argument('text', nargs='?', help='Text to look up (reads stdin if omitted)')
+
+    info_parser = subparsers.add_parser('info', help='Show store statistics')
+    info_parser.add_argument('store_path')
+
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        count = import_json(args.json_path, args.store_path)
+        print(f"Imported {count} records from {args.json_path} into {args.store_path}")
+    elif args.command == 'export':
+        count = export_json(args.store_path, args.json_path)
+        print(f"Exported {count} records from {args.store_path} to {args.json_path}")
+    elif args.command == 'compact':
+        store = VectorStore.open(args.store_path)
+        count = store.compact()
+        print(f"Compacted {args.store_path} into {store.base_name} ({count} records)")
+    elif args.command == 'lookup':
+        store = VectorStore.open(args.store_path)
+        text = args.text if args.text is not None else sys.stdin.read()
+        index = store.find(text)
+        if index < 0:
+            print(f"Not found (key {text_key(text)})")
+        else:
+            print(f"Found at row {index}, author IDs: {', '.join(store[index]['author_ids'])}")
+    elif args.command == 'info':
+        store = VectorStore.open(args.store_path)
+        print(f"Store: {args.store_path}")
+        print(f"Base segment: {store.base_name}")
+        print(f"Records: {len(store)} ({store.base_count} in base, {len(store) - store.base_count} in logs)")
+        print(f"Dimension: {store.dim}")
+        print(f"Index key format: {KEY_FORMAT}")
+        print(f"Vector bytes: {store.base_vectors.nbytes}")
+        print(f"Unfolded log bytes: {store.log_bytes()}")
+
+if __name__ == "__main__":
+    main()